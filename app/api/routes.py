@@ -1,9 +1,13 @@
+import io
 import os
+import time
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -20,16 +24,21 @@ from app.schemas import (
     PostDetailResponse,
     RenderImageRequest,
     RenderImageResponse,
+    RenderBatchRequest,
+    RenderBatchResponse,
+    RenderVariantResponse,
 )
 from app.models import PostStatus, PostType
 from app.services.trend_radar import get_trending_topics
+from app.services import content_ai
 from app.services.content_ai import (
     generate_caption,
     generate_hashtags,
     format_post_text,
     generate_image_prompt,
+    generate_draft_content,
 )
-from app.services.image_backend import generate_image_url, generate_image_bytes, render_from_bytes
+from app.services.image_backend import generate_image_url
 import tempfile
 from app.services.storage_service import (
     save_png_bytes_to_generated,
@@ -37,8 +46,8 @@ from app.services.storage_service import (
 )
 from app.utils import normalize_image_url
 from app.services.storage_service import delete_remote_file
-from app.services.image_render import render_image
-from app.config import BASE_URL
+from app.services import background_library, hashtag_index, image_dedup, llm_cache, post_render, rate_limiter, render_pool
+from app.config import BASE_URL, IMAGE_DEDUP_ENABLED, LAZY_FINAL_RENDER, RENDER_JOB_TIMEOUT
 from app.services.monetization import attach_affiliate
 from app.services.instagram import publish_image
 from app.services.scheduler import next_post_time
@@ -68,6 +77,15 @@ def _public_image_url(u: str | None, expires: int = 300) -> str | None:
         return u
 
 
+def _post_image_url(post: Post) -> str | None:
+    """Final görsel varsa onun URL'si; lazy render bekleyen taslaklar için ucuz önizleme URL'si."""
+    if post.image_url and not post_render.needs_render(post):
+        return _public_image_url(post.image_url)
+    if post_render.has_render_inputs(post):
+        return post_render.preview_url(post)
+    return _public_image_url(post.image_url)
+
+
 @router.get("/automation/settings")
 def get_automation_settings(account_id: int | None = None):
     from app.database import SessionLocal
@@ -216,6 +234,8 @@ def generate_post():
     """
     # 1) Konu seç
     topic = get_trending_topics()[0]
+    # Görsel URL'si caption/hashtag zinciriyle paralel üretilir (bkz. adım 6)
+    image_future = content_ai.submit(generate_image_url, topic)
 
     # 2) OpenAI ile caption üret
     try:
@@ -238,7 +258,7 @@ def generate_post():
     formatted_post = format_post_text(caption_with_affiliate, hashtags)
 
     # 6) Görsel URL'si (OpenAI ile üretilmeye çalışılır, fallback varsa kullanılır)
-    image_url = generate_image_url(topic)
+    image_url = image_future.result()
 
     # 7) Önerilen yayın zamanı
     schedule = next_post_time()
@@ -387,33 +407,21 @@ def run_pipeline(
     # 2) Konu secimi
     topic = body.topic or get_trending_topics()[0]
 
-    # 3) Caption uret (OpenAI + affiliate)
-    caption = None
+    # 3-6) Gorsel URL, caption -> hashtag ve image prompt paralel uretilir
+    image_future = content_ai.submit(generate_image_url, topic)
+    draft = generate_draft_content(topic, with_image=False, caption_fallback=f"Test post: {topic} #AI #Automation #Test")
     error_message: str | None = None
-    try:
-        caption = generate_caption(topic)
-        caption = attach_affiliate(caption)
-    except Exception as exc:  # noqa: BLE001
-        error_message = f"caption_error: {exc}"
-        # Basarisiz olsa da fallback caption ile devam edebiliriz
-        caption = f"Test post: {topic} #AI #Automation #Test"
-
-    # 4) Gorsel URL uret
-    image_url = generate_image(topic)
-
-    # 5) Hashtag üret (opsiyonel, eğer yoksa)
-    hashtags_list = []
-    try:
-        hashtags_list = generate_hashtags(topic, caption=caption, count=10)
-    except Exception:
-        hashtags_list = ["#AI", "#Technology", "#Innovation"]
-
-    # 6) Image prompt üret (opsiyonel)
-    image_prompt = None
-    try:
-        image_prompt = generate_image_prompt(topic)
-    except Exception:
-        image_prompt = f"Square 1:1 Instagram post image, high quality, {topic}"
+    caption = draft.caption
+    if "caption" in draft.errors:
+        error_message = f"caption_error: {draft.errors['caption']}"
+    else:
+        try:
+            caption = attach_affiliate(caption)
+        except Exception as exc:  # noqa: BLE001
+            error_message = f"caption_error: {exc}"
+    hashtags_list = draft.hashtags or ["#AI", "#Technology", "#Innovation"]
+    image_prompt = draft.image_prompt
+    image_url = image_future.result()
 
     # 7) Post'u DRAFT olarak kaydet (PUBLISH ETMEZ!)
     post = Post(
@@ -451,17 +459,20 @@ def generate_content(
     - Caption üretir (OpenAI)
     - Hashtag üretir (OpenAI)
     - Image prompt üretir (OpenAI)
-    - Görsel üretir (OpenAI gpt-image-1 / dall-e-3)
-    - Görseli local storage'a kaydeder
+    - Görsel üretir (OpenAI gpt-image-1 / dall-e-3) ya da arka plan kütüphanesinden seçer
+    - Arka planı içerik adresli saklar + render parametrelerini post'a yazar
+      (LAZY_FINAL_RENDER=false ise final görseli hemen render edip upload eder)
     - Post'u DRAFT olarak DB'ye kaydeder
 
+    Final görsel approve/schedule/publish'te üretilir; taslakta image_url önizleme URL'sidir.
+
     Returns:
         GenerateResponse: {
             "post_id": int,
             "caption": str,
             "hashtags": list[str],
             "image_prompt": str,
-            "image_url": str,  # /static/generated/{filename}
+            "image_url": str,  # final URL veya /api/posts/{id}/preview
             "status": "draft",
             "created_at": datetime
         }
@@ -469,135 +480,243 @@ def generate_content(
     # 1) Konu seçimi
     topic = body.topic or get_trending_topics()[0]
 
-    # 2) Caption üret
-    try:
-        caption = generate_caption(topic)
-    except Exception as e:
-        caption = f"Test post about {topic}. #AI #Automation"
-        print(f"Warning: Caption generation failed: {e}")
-
-    # 3) Hashtag üret
-    try:
-        hashtags = generate_hashtags(topic, caption=caption, count=10)
-    except Exception as e:
-        hashtags = ["#AI", "#Technology", "#Innovation", "#Motivation", "#Success"]
-        print(f"Warning: Hashtag generation failed: {e}")
-
-    # 4) Image prompt üret
-    try:
-        image_prompt = generate_image_prompt(topic)
-    except Exception as e:
-        image_prompt = (
-            f"Square 1:1 Instagram post image, high quality, modern style, {topic}"
-        )
-        print(f"Warning: Image prompt generation failed: {e}")
-
-    # 5) Arka plan görseli üret (background image). 
-    # Do NOT save the text-less background to persistent storage/R2; render text on a temporary file
-    try:
-        png_bytes = generate_image_bytes(image_prompt)
-        # write to a temporary file via render_from_bytes
-        relative_path_bg = None
-        public_url_bg = None
-    except Exception as e:
-        print(f"Warning: Image generation failed: {e}")
-        relative_path_bg = None
+    # 2-5) Caption -> hashtag ve image prompt -> arka plan görseli paralel üretilir
+    # (toplam süre ~ en uzun zincir). The text-less background is not uploaded to R2;
+    # it is kept in the local content-addressed store.
+    # Arka plan kütüphanesi: hesapsız taslaklarda henüz kullanılmamış bir arka plan varsa görsel üretilmez
+    draft = background_library.draft_content(
+        db,
+        topic,
+        None,
+        reuse=body.reuse_background,
+        signature=(body.signature or "ince düşlerim").strip(),
+        style=body.render_style or "minimal_dark",
+        target="story" if body.post_type == "story" else "square",
+        caption_fallback=f"Test post about {topic}. #AI #Automation",
+    )
+    caption = draft.caption
+    hashtags = draft.hashtags or ["#AI", "#Technology", "#Innovation", "#Motivation", "#Success"]
+    image_prompt = draft.image_prompt
+    png_bytes = draft.image_bytes
+    public_url_bg = None
+    if png_bytes is None:
+        print(f"Warning: Image generation failed: {draft.errors.get('image')}")
         public_url_bg = "https://images.pexels.com/photos/1032650/pexels-photo-1032650.jpeg"
+    print(f"[GENERATE] content timings (ms): { {k: round(v) for k, v in draft.timings_ms.items()} }")
 
-    # 6) Arka plan üzerine metin bas (render-image); final görsel media/ içinde
-    relative_path = relative_path_bg
-    public_url = public_url_bg
-    # Determine the background file path (temp file if generated above, else storage path)
-    if relative_path_bg:
-        background_full = BASE_DIR / "storage" / relative_path_bg
-    else:
-        # use temp file path if exists
-        background_full = Path(tmp_path) if 'tmp_path' in locals() and tmp_path else None
-
-    if background_full and background_full.exists():
-        try:
-            signature = (body.signature or "ince düşlerim").strip()
-            # If user requested story format, render a vertical story-sized image
-            target = "story" if getattr(body, "post_type", None) == "story" else "square"
-            # If we have png_bytes (generated above), use render_from_bytes, else render from path
-            if 'png_bytes' in locals() and png_bytes:
-                rel_path_final, abs_path_final = render_from_bytes(png_bytes, caption, signature, body.render_style or "minimal_dark", target)
-            else:
-                rel_path_final, abs_path_final = render_image(
-                    background_path=str(background_full),
-                    text=caption,
-                    signature=signature,
-                    style=body.render_style or "minimal_dark",
-                    target=target,
-                )
-            with open(abs_path_final, "rb") as f:
-                final_bytes = f.read()
-            # Final görsel media/ klasöründe kaydedildi; şimdi remote server'a yükleyip public URL al
-            filename_final = os.path.basename(abs_path_final)
-            try:
-                prefix = "ig/story" if target == "story" else "ig/post"
-                public_url = upload_to_remote_server(final_bytes, filename_final, prefix=prefix)
-            except Exception as e:
-                print(f"[WARNING] Final image upload failed: {e}")
-                public_url = f"/media/{filename_final}"
-            relative_path = rel_path_final
-        except Exception as e:
-            print(f"Warning: Render image failed, using background only: {e}")
-
-    # 7) Post type
+    # 6) Post type
     post_type = PostType.POST
     if body.post_type == "story":
         post_type = PostType.STORY
     elif body.post_type == "reels":
         post_type = PostType.REELS
 
-    # 8) DB'ye DRAFT olarak kaydet (kullanıcı onaylamadan paylaşım yapılmaz)
+    # 7) DB'ye DRAFT olarak kaydet (kullanıcı onaylamadan paylaşım yapılmaz)
     post = Post(
         topic=topic,
         caption=caption,
         hashtags=json.dumps(hashtags),  # JSON string olarak sakla
         image_prompt=image_prompt,
-        image_path=relative_path,
-        image_url=normalize_image_url(public_url),
+        image_url=normalize_image_url(public_url_bg),
         type=post_type,
         status=PostStatus.DRAFT,
         created_at=datetime.utcnow(),
     )
+    # 8) Render girdilerini sakla; final görsel onayda üretilir (media/ + upload)
+    if png_bytes:
+        post_render.attach_render_inputs(
+            post,
+            png_bytes,
+            caption,
+            (body.signature or "ince düşlerim").strip(),
+            body.render_style or "minimal_dark",
+            "story" if body.post_type == "story" else "square",
+            body.encoder_profile,
+        )
+    # 9) Near-duplicate guard hesap bazında: bu taslağın hesabı yok (yayında seçilir), bu yüzden
+    # burada kontrol edilmez; publish sırasında hedef hesabın yayınlanmış görselleriyle karşılaştırılır.
     db.add(post)
     db.commit()
     db.refresh(post)
+    hashtag_index.add_post(post)
+
+    if not LAZY_FINAL_RENDER and post_render.needs_render(post):
+        try:
+            post_render.materialize(post, db)
+        except Exception as e:
+            print(f"Warning: Render image failed, using preview only: {e}")
+
+    image_url = _public_image_url(post.image_url) if post.image_url else post_render.preview_url(post)
 
-    # 9) Response döndür
+    # 10) Response döndür
     return GenerateResponse(
         post_id=post.id,
         caption=caption,
         hashtags=hashtags,
         image_prompt=image_prompt,
-        image_url=_public_image_url(public_url),
+        image_url=image_url,
         status="draft",
         created_at=post.created_at,
     )
 
 
+@router.get("/llm-cache/stats")
+def llm_cache_stats():
+    """OpenAI cevap cache'i sayaçları: hits / misses / hit_rate / bypass / entries."""
+    return llm_cache.stats()
+
+
+@router.get("/rate-limit/stats")
+def rate_limit_stats():
+    """OpenAI rate limiter: limitler, bekleme kuyruğu, aktif lease'ler ve bekleme sayaçları."""
+    return rate_limiter.stats()
+
+
+@router.get("/hashtags/index/stats")
+def hashtag_index_stats():
+    """Hashtag index: hashtag sayısı, tema başına kullanım, son indekslenen post id."""
+    return hashtag_index.stats()
+
+
+@router.get("/backgrounds/stats")
+def background_library_stats(db: Session = Depends(get_db)):
+    """Arka plan kütüphanesi: konu başına arka plan ve kullanım sayıları."""
+    return background_library.stats(db)
+
+
 @router.post("/render-image", response_model=RenderImageResponse)
 def api_render_image(body: RenderImageRequest):
     """
     1080x1080 arka plan üzerine ortalanmış metin + altta imza basar.
     Görsel media/ klasörüne kaydedilir.
 
-    Input: background_path, text, signature, style (minimal_dark | pastel_soft | neon_city)
+    Input: background_path, text, signature, style (minimal_dark | pastel_soft | neon_city),
+           encoder_profile (opsiyonel: archival_png | fast_png | ig_jpeg | webp_preview)
     Output: final_image_path (örn: media/{uuid}.png)
     """
     try:
-        rel_path, _ = render_image(
+        rel_path, _ = render_pool.call(
+            "render_image",
             background_path=body.background_path,
             text=body.text,
             signature=body.signature,
             style=body.style or "minimal_dark",
+            profile=body.encoder_profile,
         )
         return RenderImageResponse(final_image_path=rel_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except render_pool.RenderPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except render_pool.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        # unknown encoder profile
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Render failed: {e}")
+
+
+@router.get("/render-image/preview")
+def api_render_image_preview(
+    request: Request,
+    background_path: str,
+    text: str,
+    signature: str = "ince düşlerim",
+    style: str = "minimal_dark",
+    target: str = "square",
+    width: Optional[int] = None,
+    encoder_profile: Optional[str] = None,
+):
+    """
+    Caption/stil önizlemesi: görseli doğrudan stream eder (varsayılan 540px, WebP), media/'ya yazmaz.
+
+    Strong ETag (metin, imza, stil, hedef, genişlik, profil, arka plan özeti) döner;
+    If-None-Match eşleşirse render yapılmadan 304 döner.
+    """
+    return _preview_response(request, background_path, text, signature, style, target, width, encoder_profile)
+
+
+def _preview_response(
+    request: Request,
+    background_path: str,
+    text: str,
+    signature: str,
+    style: str,
+    target: str,
+    width: Optional[int],
+    encoder_profile: Optional[str],
+):
+    """ETag kontrolü + önizleme render'ı (render-image/preview ve posts/{id}/preview ortak)."""
+    from app.services.image_render import preview_etag
+
+    try:
+        etag = preview_etag(background_path, text, signature, style, target, width, encoder_profile)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        # unknown encoder profile
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    try:
+        preview = render_pool.call(
+            "render_preview_bytes", background_path, text, signature, style, target, width, encoder_profile
+        )
+    except render_pool.RenderPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except render_pool.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Render failed: {e}")
+    return StreamingResponse(io.BytesIO(preview.data), media_type=preview.content_type, headers=headers)
+
+
+@router.post("/render-image/batch", response_model=RenderBatchResponse)
+def api_render_image_batch(body: RenderBatchRequest):
+    """
+    Tek arka plan üzerinde çok varyant render eder (caption x tema x square/story).
+    Arka plan bir kez decode edilir, hedef başına bir kez resize edilir.
+    Görseller media/ klasörüne kaydedilir; her varyant için süreler döner.
+    """
+    if not body.variants:
+        raise HTTPException(status_code=400, detail="variants must not be empty")
+    try:
+        started = time.perf_counter()
+        batch = render_pool.render_batch(
+            body.background_path,
+            [v.model_dump() for v in body.variants],
+            persist=True,
+            profile=body.encoder_profile,
+        )
+        for r in batch.variants:
+            r.persisted.result()
+        total_ms = (time.perf_counter() - started) * 1000
+        return RenderBatchResponse(
+            variants=[
+                RenderVariantResponse(
+                    final_image_path=r.rel_path,
+                    style=v.style,
+                    target=v.target,
+                    timings_ms=r.timings_ms,
+                )
+                for v, r in zip(body.variants, batch.variants)
+            ],
+            decode_ms=batch.decode_ms,
+            prepare_ms=batch.prepare_ms,
+            total_ms=total_ms,
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except render_pool.RenderPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except render_pool.RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ValueError as e:
+        # unknown encoder profile
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Render failed: {e}")
 
@@ -627,6 +746,13 @@ def approve_post(
     db.add(post)
     db.commit()
 
+    # Final görsel onayda üretilir (lazy render); başarısız olursa publish sırasında tekrar denenir
+    try:
+        post_render.materialize(post, db)
+    except Exception as e:
+        print(f"[WARNING] Final render on approve failed for post {post_id}: {e}")
+        return {"success": True, "message": f"Post {post_id} approved; final image will be rendered on publish ({e})"}
+
     return {"success": True, "message": f"Post {post_id} approved successfully"}
 
 
@@ -720,6 +846,22 @@ def publish_post_by_id(
             )
 
     # 4) Instagram'a post at
+    # Lazy render: final görsel henüz yoksa (veya girdiler değiştiyse) şimdi üret
+    try:
+        post_render.materialize(post, db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Final image render failed: {e}")
+    # Aynı hesapta daha önce yayınlanmış neredeyse aynı görsel varsa yeniden paylaşma
+    try:
+        image_dedup.check(
+            db,
+            body.account_id or post.account_id,
+            image_dedup.ensure_hash(db, post) if IMAGE_DEDUP_ENABLED else None,
+            exclude_post_id=post.id,
+            published_only=True,
+        )
+    except image_dedup.DuplicateImageError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     # Post'un kendi image_url ve caption'ını kullan
     # Eğer local storage'dan geliyorsa, full URL'e çevir
     image_url = post.image_url or body.image_url
@@ -814,11 +956,17 @@ def publish_post_by_id(
             # If still no image_url, attempt to generate a story image server-side
             if not image_url:
                 try:
-                    from app.services.image_render import render_story_image
                     # Use caption or image_prompt to generate background/context
                     prompt_text = caption or post.image_prompt or post.topic or "Square background"
                     filename = f"{uuid4()}.png"
-                    public_url = render_story_image(prompt_text, filename, style=body.render_style or "minimal_dark")
+                    # includes AI background generation, so allow longer than a plain render
+                    public_url = render_pool.call(
+                        "render_story_image",
+                        prompt_text,
+                        filename,
+                        style=body.render_style or "minimal_dark",
+                        timeout=max(RENDER_JOB_TIMEOUT, 180),
+                    )
                     image_url = public_url
                     # persist to post.image_url_story
                     post.image_url_story = image_url
@@ -868,9 +1016,7 @@ def publish_post_by_id(
                 if abs_candidate and abs_candidate.exists():
                     # Use centralized make_story_from_post to create a story canvas from the local image.
                     try:
-                        from app.services.image_render import make_story_from_post
-
-                        public_url_story = make_story_from_post(str(abs_candidate))
+                        public_url_story = render_pool.call("make_story_from_post", str(abs_candidate))
                         image_url = public_url_story
                     except Exception as e_inner:
                         print(f"[WARN] Failed to generate story canvas from existing image via make_story_from_post: {e_inner}")
@@ -1020,7 +1166,7 @@ def list_posts(
                 caption=post.caption,
                 hashtags=hashtags_str,
                 image_prompt=post.image_prompt,
-                image_url=_public_image_url(post.image_url),
+                image_url=_post_image_url(post),
                 type=post.type.value if post.type else "post",
                 status=post.status.value if post.status else "draft",
                 created_at=post.created_at,
@@ -1098,6 +1244,8 @@ def delete_post(
             f"[DELETE] Error while attempting remote/local deletion for post {post_id}: {e}"
         )
 
+    post_render.release_background(db, post)
+    image_dedup.forget(db, post.id)
     db.delete(post)
     db.commit()
     return {"success": True, "message": f"Post {post_id} deleted"}
@@ -1162,6 +1310,35 @@ def republish_post(
         raise
 
 
+@router.get("/posts/{post_id}/preview")
+def get_post_preview(
+    post_id: int,
+    request: Request,
+    width: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Taslak önizlemesi: saklanan arka plan + render parametrelerinden küçük boy görsel stream eder.
+    Final görsel üretmez/upload etmez; ETag ile 304 destekler.
+    """
+    post = db.query(Post).filter(Post.id == post_id).first()
+    if not post:
+        raise HTTPException(status_code=404, detail=f"Post with id {post_id} not found")
+    if not post_render.has_render_inputs(post):
+        raise HTTPException(status_code=404, detail=f"Post {post_id} has no stored render inputs")
+    params = post_render.render_params(post)
+    return _preview_response(
+        request,
+        post.background_path,
+        params["text"],
+        params["signature"],
+        params["style"],
+        params["target"],
+        width,
+        None,
+    )
+
+
 @router.get("/posts/{post_id}", response_model=PostDetailResponse)
 def get_post(
     post_id: int,
@@ -1200,7 +1377,7 @@ def get_post(
         caption=post.caption,
         hashtags=hashtags_str,
         image_prompt=post.image_prompt,
-        image_url=_public_image_url(post.image_url),
+        image_url=_post_image_url(post),
         type=post.type.value if post.type else "post",
         status=post.status.value if post.status else "draft",
         created_at=post.created_at,
@@ -52,3 +52,105 @@ R2_ACCESS_KEY_ID = os.getenv("R2_ACCESS_KEY_ID", "")
 R2_SECRET_ACCESS_KEY = os.getenv("R2_SECRET_ACCESS_KEY", "")
 R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME", "")
 R2_PUBLIC_BASE_URL = os.getenv("R2_PUBLIC_BASE_URL", "")  # e.g. https://cdn.umittopuz.com/ig
+
+# Rendering: max number of (font path, size) entries kept in the process-wide font cache
+FONT_CACHE_SIZE = int(os.getenv("FONT_CACHE_SIZE", "256"))
+
+# Rendering: layout cache (chosen font size + wrapped lines per caption/style/target)
+LAYOUT_CACHE_SIZE = int(os.getenv("LAYOUT_CACHE_SIZE", "512"))
+# Optional shared on-disk tier (SQLite file path); empty disables it
+LAYOUT_CACHE_DB = os.getenv("LAYOUT_CACHE_DB", "")
+LAYOUT_CACHE_DISK_MAX = int(os.getenv("LAYOUT_CACHE_DISK_MAX", "20000"))
+
+# Rendering: default output encoder profile (archival_png | fast_png | ig_jpeg | webp_preview)
+RENDER_ENCODER_PROFILE = os.getenv("RENDER_ENCODER_PROFILE", "archival_png")
+
+# Rendering: process pool for Pillow work (0 = render in the calling process, default).
+# A job that times out keeps its worker and queue slot until it finishes; size the queue accordingly.
+RENDER_POOL_SIZE = int(os.getenv("RENDER_POOL_SIZE", "0"))
+# Max render jobs accepted at once (running + queued); callers wait RENDER_POOL_QUEUE_WAIT seconds for a slot
+RENDER_POOL_MAX_QUEUE = int(os.getenv("RENDER_POOL_MAX_QUEUE", "16"))
+RENDER_POOL_QUEUE_WAIT = float(os.getenv("RENDER_POOL_QUEUE_WAIT", "5"))
+# Per-job result timeout in seconds
+RENDER_JOB_TIMEOUT = float(os.getenv("RENDER_JOB_TIMEOUT", "60"))
+
+# Story background blur: quality (full-resolution Gaussian) | fast (blur at 1/STORY_BLUR_SCALE, upscale) | numpy (fast + NumPy box blur)
+STORY_BLUR_MODE = os.getenv("STORY_BLUR_MODE", "quality")
+STORY_BLUR_SCALE = int(os.getenv("STORY_BLUR_SCALE", "8"))
+
+# Story conversion: decoded post images kept per process (retries/fallbacks skip download + decode)
+SOURCE_IMAGE_CACHE_SIZE = int(os.getenv("SOURCE_IMAGE_CACHE_SIZE", "8"))
+# Seconds a URL without ETag/Last-Modified is reused without revalidation
+SOURCE_IMAGE_CACHE_TTL = float(os.getenv("SOURCE_IMAGE_CACHE_TTL", "120"))
+
+# Dashboard preview endpoint: output width in px and encoder profile (nothing is written to media/)
+RENDER_PREVIEW_WIDTH = int(os.getenv("RENDER_PREVIEW_WIDTH", "540"))
+RENDER_PREVIEW_PROFILE = os.getenv("RENDER_PREVIEW_PROFILE", "webp_preview")
+
+# Lazy render-on-approve: drafts keep a content-addressed background + render params;
+# the final image is rendered/uploaded on approve, schedule or publish (false = render at generation)
+LAZY_FINAL_RENDER = os.getenv("LAZY_FINAL_RENDER", "true").lower() in ("1", "true", "yes")
+# Content-addressed background store (relative to the project root)
+BACKGROUND_STORE_DIR = os.getenv("BACKGROUND_STORE_DIR", "storage/backgrounds")
+
+# Near-duplicate guard: perceptual hash (dHash) index per post image; max Hamming distance treated as duplicate
+IMAGE_DEDUP_ENABLED = os.getenv("IMAGE_DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+IMAGE_DEDUP_MAX_DISTANCE = int(os.getenv("IMAGE_DEDUP_MAX_DISTANCE", "3"))
+
+# OpenAI content generation: threads for concurrent caption / hashtag / image-prompt / image calls
+CONTENT_AI_WORKERS = int(os.getenv("CONTENT_AI_WORKERS", "8"))
+# Draft generation: one structured-output JSON call for caption + hashtags + image prompt (per-field fallback)
+CONTENT_AI_COMBINED = os.getenv("CONTENT_AI_COMBINED", "true").lower() in ("1", "true", "yes")
+# Image generation: model and response format (b64_json = bytes in the API response, url = extra download)
+OPENAI_IMAGE_MODEL = os.getenv("OPENAI_IMAGE_MODEL", "dall-e-3")
+OPENAI_IMAGE_RESPONSE_FORMAT = os.getenv("OPENAI_IMAGE_RESPONSE_FORMAT", "b64_json")
+
+# Single-flight: concurrent identical OpenAI chat / image calls share one request (threads, and across
+# processes / Celery workers via the inflight_calls table). Waiters give up after WAIT and run the call
+# themselves; a crashed leader's lock expires after LEASE. Only callers that were already waiting get the
+# result; a call that arrives after the leader finished runs on its own (no result retention).
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+SINGLE_FLIGHT_DB = os.getenv("SINGLE_FLIGHT_DB", "true").lower() in ("1", "true", "yes")
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", "180"))
+SINGLE_FLIGHT_LEASE_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "240"))
+
+# OpenAI rate limiter shared by API, automation and Celery workers (SQLite file under the project root,
+# git-ignored; empty path disables).
+# RATE_LIMITS: per-model budgets "model:rpm=N,tpm=N;..." (unlisted models are not paced).
+# Waiting calls queue by priority (manual > automation > background), at most MAX_QUEUE waiting,
+# each for at most MAX_WAIT seconds; MAX_CONCURRENT in-flight calls per model (0 = no cap).
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", "rate_limits.db")
+RATE_LIMITS = os.getenv("RATE_LIMITS", "gpt-4o-mini:rpm=500,tpm=200000;dall-e-3:rpm=5")
+RATE_LIMIT_MAX_CONCURRENT = int(os.getenv("RATE_LIMIT_MAX_CONCURRENT", "8"))
+RATE_LIMIT_MAX_QUEUE = int(os.getenv("RATE_LIMIT_MAX_QUEUE", "50"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "120"))
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "180"))
+
+# Hashtags: "index" ranks from post history first (hashtag_index) and calls the LLM only when coverage
+# is low; "llm" always asks the model. Min support = times a tag must have been seen for the topic.
+HASHTAG_MODE = os.getenv("HASHTAG_MODE", "index")
+HASHTAG_INDEX_MIN_SUPPORT = int(os.getenv("HASHTAG_INDEX_MIN_SUPPORT", "2"))
+HASHTAG_INDEX_MAX_TAGS = int(os.getenv("HASHTAG_INDEX_MAX_TAGS", "2048"))
+HASHTAG_INDEX_REFRESH_SECONDS = float(os.getenv("HASHTAG_INDEX_REFRESH_SECONDS", "60"))
+
+# OpenAI chat response cache (SQLite, relative paths under the project root and git-ignored; empty path disables).
+# Captions and image prompts are not cached by default (variety); hashtags and other calls are.
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Warm draft buffer (off by default): ready drafts kept per account (0 disables), filled when the next
+# automation slot is within the lead time; unused drafts expire after the TTL.
+DRAFT_BUFFER_SIZE = int(os.getenv("DRAFT_BUFFER_SIZE", "0"))
+DRAFT_BUFFER_LEAD_MINUTES = int(os.getenv("DRAFT_BUFFER_LEAD_MINUTES", "120"))
+DRAFT_BUFFER_TTL_HOURS = float(os.getenv("DRAFT_BUFFER_TTL_HOURS", "12"))
+# drafts generated per refill pass (keeps each background pass short)
+DRAFT_BUFFER_MAX_FILLS = int(os.getenv("DRAFT_BUFFER_MAX_FILLS", "2"))
+
+# Background library (off by default): reuse text-free backgrounds per topic instead of generating a new image per draft.
+# An account never gets the same background twice (same background + new text is still a near-duplicate).
+BACKGROUND_LIBRARY_ENABLED = os.getenv("BACKGROUND_LIBRARY_ENABLED", "false").lower() in ("1", "true", "yes")
+BACKGROUND_LIBRARY_TARGET_PER_TOPIC = int(os.getenv("BACKGROUND_LIBRARY_TARGET_PER_TOPIC", "20"))
+# Off-peak bulk prefill window (local hours "start-end", end exclusive) and images per background pass
+BACKGROUND_PREFILL_HOURS = os.getenv("BACKGROUND_PREFILL_HOURS", "2-6")
+BACKGROUND_PREFILL_BATCH = int(os.getenv("BACKGROUND_PREFILL_BATCH", "3"))
@@ -139,6 +139,14 @@ def start_scheduler():
                         print("[MIGRATE] Added column posts.image_url_story")
                     except Exception as e:
                         print(f"[MIGRATE] Failed to add image_url_story: {e}")
+                # Lazy render inputs (background + params) on posts
+                for col, typ in (("background_path", "VARCHAR"), ("render_params", "TEXT"), ("render_key", "VARCHAR")):
+                    if col not in cols:
+                        try:
+                            conn.execute(text(f"ALTER TABLE posts ADD COLUMN {col} {typ}"))
+                            print(f"[MIGRATE] Added column posts.{col}")
+                        except Exception as e:
+                            print(f"[MIGRATE] Failed to add {col}: {e}")
                 # Create automation_runs table if missing
                 try:
                     conn.execute(
@@ -205,6 +213,20 @@ def start_scheduler():
                 run_automation_check()
             except Exception as e:
                 print(f"[SCHEDULED][AUTOMATION] Error: {e}")
+            # Idle time: top up the warm draft buffer for upcoming automation slots (background thread).
+            try:
+                from app.services import draft_buffer
+
+                draft_buffer.refill_async()
+            except Exception as e:
+                print(f"[SCHEDULED][DRAFT_BUFFER] Error: {e}")
+            # Off-peak hours (BACKGROUND_PREFILL_HOURS): bulk-fill the background library in small batches.
+            try:
+                from app.services import background_library
+
+                background_library.prefill_async()
+            except Exception as e:
+                print(f"[SCHEDULED][BG_LIBRARY] Error: {e}")
             # NOTE: Do NOT call run_scheduled_publish() here to avoid duplicate publishing paths.
         except Exception as e:
             import traceback
@@ -223,6 +245,18 @@ def start_scheduler():
         print("[SCHEDULED] Background task started (checks every 30 seconds)")
     else:
         print("[SCHEDULED] Background task not started (lock not acquired).")
+    # Render worker process'lerini arka planda ayağa kaldır (fontlar yüklü bekler)
+    try:
+        from app.services import render_pool
+
+        threading.Thread(target=render_pool.start, daemon=True).start()
+
+        @app.on_event("shutdown")
+        def _stop_render_pool():
+            render_pool.shutdown(wait=False)
+    except Exception as e:
+        print(f"[RENDER_POOL] not started: {e}")
+
     # ensure lock removal on shutdown
     @app.on_event("shutdown")
     def _remove_scheduler_lock():
@@ -5,6 +5,8 @@ from sqlalchemy import (
     Text,
     DateTime,
     ForeignKey,
+    Index,
+    LargeBinary,
     Enum as SQLEnum,
 )
 from datetime import datetime
@@ -56,6 +58,11 @@ class Post(Base):
     )  # Public URL (örn: /static/generated/abc.png)
     image_url_post = Column(String, nullable=True)
     image_url_story = Column(String, nullable=True)
+    # Lazy render: içerik adresli arka plan (storage/backgrounds/<sha256>.png) + render parametreleri (JSON).
+    # Final görsel approve/schedule/publish'te üretilir; render_key girdilerin özeti (cache).
+    background_path = Column(String, nullable=True)
+    render_params = Column(Text, nullable=True)
+    render_key = Column(String, nullable=True)
 
     # Post türü
     type = Column(SQLEnum(PostType), default=PostType.POST, nullable=False)
@@ -135,3 +142,99 @@ class AutomationRun(Base):
     run_date = Column(String, nullable=False)  # ISO date YYYY-MM-DD
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+
+class ImageHash(Base):
+    """
+    Perceptual hash (64-bit dHash) of a post's image, for near-duplicate lookup.
+
+    dhash is stored as a signed 64-bit integer; band0..band3 are its four 16-bit
+    slices. Two hashes within Hamming distance <= 3 share at least one band, so
+    candidates come from the band indexes instead of a table scan.
+    kind: "preview" (draft, from the preview render) | "final" (rendered final image)
+    """
+
+    __tablename__ = "image_hashes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False, unique=True)
+    dhash = Column(Integer, nullable=False)
+    band0 = Column(Integer, nullable=False)
+    band1 = Column(Integer, nullable=False)
+    band2 = Column(Integer, nullable=False)
+    band3 = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False, default="final")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = tuple(Index(f"ix_image_hashes_band{i}", f"band{i}") for i in range(4))
+
+
+class DraftBuffer(Base):
+    """
+    Pre-generated draft content kept ready per account (warm buffer).
+
+    Filled ahead of scheduled automation times; at fire time run_automation_check
+    claims one (claimed_at) and turns it into a Post instead of calling OpenAI.
+    Rows past expires_at are dropped unclaimed.
+    """
+
+    __tablename__ = "draft_buffer"
+
+    id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False, index=True)
+    setting_id = Column(Integer, ForeignKey("automation_settings.id"), nullable=True)
+    topic = Column(String, nullable=True)
+    caption = Column(Text, nullable=True)
+    hashtags = Column(Text, nullable=True)  # JSON array
+    image_prompt = Column(Text, nullable=True)
+    background_path = Column(String, nullable=False)  # storage/backgrounds/<sha256>.png
+    render_params = Column(Text, nullable=True)  # JSON, same format as Post.render_params
+    dhash = Column(Integer, nullable=True)  # perceptual hash of the preview (see image_dedup)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    claimed_at = Column(DateTime, nullable=True)
+
+
+class BackgroundAsset(Base):
+    """
+    Text-free background library (content-addressed, reusable across drafts).
+
+    path is the content-addressed file in the background store
+    (storage/backgrounds/<sha256>.png); posts reference it via Post.background_path.
+    topic is the normalized ALLOWED_TOPICS theme, palette a coarse colour class
+    (warm / cool / neutral / dark / light), prompt_fp a fingerprint of the image prompt.
+    """
+
+    __tablename__ = "background_assets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String, nullable=False, unique=True)
+    path = Column(String, nullable=False)
+    topic = Column(String, nullable=False, index=True)
+    palette = Column(String, nullable=True, index=True)
+    prompt = Column(Text, nullable=True)
+    prompt_fp = Column(String, nullable=True, index=True)
+    use_count = Column(Integer, nullable=False, default=0)
+    last_used_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class InflightCall(Base):
+    """
+    Single-flight lock/result row shared by API processes and Celery workers.
+
+    The first caller for a key inserts the row (status "running") and runs the call;
+    others poll until status is "done" and reuse the stored result. Rows are dropped
+    after expires_at (lease for running calls, short retention for finished ones).
+    result_kind: "bytes" (raw) | "json"
+    """
+
+    __tablename__ = "inflight_calls"
+
+    key = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="running")
+    result_kind = Column(String, nullable=True)
+    result = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -118,12 +118,47 @@ class RenderImageRequest(BaseModel):
     text: str  # Ana metin
     signature: str  # En altta küçük imza metni
     style: str = "minimal_dark"  # minimal_dark | pastel_soft | neon_city
+    encoder_profile: Optional[str] = None  # archival_png | fast_png | ig_jpeg | webp_preview (boşsa varsayılan)
 
 
 class RenderImageResponse(BaseModel):
     """Render sonucu"""
 
-    final_image_path: str  # media/{uuid}.png (relative path)
+    final_image_path: str  # media/{uuid}.png (relative path; uzantı encoder profile göre)
+
+
+class RenderVariantRequest(BaseModel):
+    """Batch render'da tek varyant"""
+
+    text: str
+    signature: str = "ince düşlerim"
+    style: str = "minimal_dark"  # minimal_dark | pastel_soft | neon_city
+    target: str = "square"  # square | story
+    full_height: bool = True
+
+
+class RenderBatchRequest(BaseModel):
+    """Tek arka plan + çok varyant (A/B stil denemeleri)"""
+
+    background_path: str
+    variants: list[RenderVariantRequest]
+    encoder_profile: Optional[str] = None
+
+
+class RenderVariantResponse(BaseModel):
+    final_image_path: str
+    style: str
+    target: str
+    timings_ms: dict[str, float]  # layout / draw / composite / encode / total
+
+
+class RenderBatchResponse(BaseModel):
+    """Batch render sonucu (varyantlar istek sırasıyla)"""
+
+    variants: list[RenderVariantResponse]
+    decode_ms: float
+    prepare_ms: dict[str, float]  # hedef (square/story) başına resize süresi
+    total_ms: float
 
 
 class GenerateRequest(BaseModel):
@@ -135,6 +170,8 @@ class GenerateRequest(BaseModel):
         "minimal_dark"  # minimal_dark | pastel_soft | neon_city
     )
     signature: Optional[str] = None  # İmza metni (yoksa varsayılan kullanılır)
+    encoder_profile: Optional[str] = None  # Çıktı formatı: archival_png | fast_png | ig_jpeg | webp_preview
+    reuse_background: Optional[bool] = None  # Arka plan kütüphanesinden seç (None -> BACKGROUND_LIBRARY_ENABLED)
 
 
 class GenerateResponse(BaseModel):
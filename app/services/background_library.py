@@ -0,0 +1,294 @@
+"""Reusable library of text-free backgrounds.
+
+Konular ALLOWED_TOPICS ile sınırlı ve arka planlar yazısız olduğu için her taslakta
+yeni bir DALL-E görseli üretmek gerekmez. Arka planlar içerik adresli store'da
+(post_render.store_background) tutulur ve background_assets tablosunda konu,
+renk paleti ve prompt parmak iziyle indekslenir.
+
+- draft_content(): kütüphanede bu hesabın hiç kullanmadığı ve taslağın metniyle
+  near-duplicate sayılmayan (image_dedup) bir arka plan varsa görsel API'si
+  çağrılmaz; yoksa görsel üretilir ve kütüphaneye eklenir. Aynı arka plan farklı
+  metinle de near-duplicate olduğundan bir hesapta ikinci kez kullanılmaz.
+- prefill(): konu başına BACKGROUND_LIBRARY_TARGET_PER_TOPIC arka plana kadar toplu
+  üretim (aynı prompt parmak izi tekrar üretilmez); prefill_async() sadece
+  BACKGROUND_PREFILL_HOURS (yerel saat) içinde çalışır, tools/prefill_backgrounds.py cron için.
+
+Provides:
+- topic_key(topic) -> str (ALLOWED_TOPICS teması)
+- prompt_fingerprint(prompt) -> str
+- palette_of(data) -> str (warm / cool / neutral / dark / light)
+- add(db, data, topic, prompt=None) -> BackgroundAsset
+- candidates(db, topic, account_id, palette=None, limit=5) -> list[BackgroundAsset]
+- pick(db, topic, account_id, palette=None) -> BackgroundAsset | None
+- mark_used(db, asset) -> None
+- draft_content(db, topic, account_id, reuse=None, signature=..., style=..., target=..., **kwargs) -> DraftContent
+- prefill(per_topic=None, max_new=None) -> int, prefill_async() -> None
+- stats(db) -> dict
+"""
+from __future__ import annotations
+
+import colorsys
+import hashlib
+import io
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+from sqlalchemy import func, select
+
+from app.config import (
+    BACKGROUND_LIBRARY_ENABLED,
+    BACKGROUND_LIBRARY_TARGET_PER_TOPIC,
+    BACKGROUND_PREFILL_BATCH,
+    BACKGROUND_PREFILL_HOURS,
+    IMAGE_DEDUP_ENABLED,
+)
+from app.database import SessionLocal
+from app.models import BackgroundAsset, DraftBuffer, Post
+from app.services import content_ai, image_dedup, post_render, rate_limiter, render_pool
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+_prefill_lock = threading.Lock()
+
+
+def topic_key(topic: Optional[str]) -> str:
+    return content_ai.topic_key(topic)
+
+
+def prompt_fingerprint(prompt: Optional[str]) -> Optional[str]:
+    if not prompt:
+        return None
+    normalized = " ".join(prompt.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def palette_of(data: bytes) -> str:
+    """Ortalama renkten kaba palet sınıfı."""
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (64, 64))
+    r, g, b = img.convert("RGB").resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    h, s, v = colorsys.rgb_to_hsv(r / 255, g / 255, b / 255)
+    if v < 0.25:
+        return "dark"
+    if s < 0.15:
+        return "light" if v > 0.8 else "neutral"
+    return "warm" if h < 1 / 6 or h >= 5 / 6 else "cool"
+
+
+def add(db, data: bytes, topic: str, prompt: Optional[str] = None) -> BackgroundAsset:
+    """Arka planı store'a yazar ve indekse ekler (aynı içerik zaten varsa mevcut kaydı döner)."""
+    rel = post_render.store_background(data)
+    digest = Path(rel).stem
+    asset = db.query(BackgroundAsset).filter(BackgroundAsset.sha256 == digest).first()
+    if asset is not None:
+        return asset
+    try:
+        palette = palette_of(data)
+    except Exception:
+        palette = None
+    asset = BackgroundAsset(
+        sha256=digest,
+        path=rel,
+        topic=topic_key(topic),
+        palette=palette,
+        prompt=prompt,
+        prompt_fp=prompt_fingerprint(prompt),
+        use_count=0,
+        created_at=datetime.utcnow(),
+    )
+    db.add(asset)
+    db.commit()
+    return asset
+
+
+def candidates(
+    db, topic: str, account_id: Optional[int], palette: Optional[str] = None, limit: int = 5
+) -> list[BackgroundAsset]:
+    """
+    Konu (ve istenirse palet) için bu hesabın hiç kullanmadığı (post veya draft buffer) arka planlar;
+    en az kullanılan önce. Dosyası kaybolmuş kayıtlar silinir.
+    """
+    account_filter = Post.account_id == account_id if account_id is not None else Post.account_id.is_(None)
+    used = select(Post.background_path).where(account_filter, Post.background_path.isnot(None))
+    buffered = select(DraftBuffer.background_path).where(DraftBuffer.account_id == account_id)
+    q = db.query(BackgroundAsset).filter(
+        BackgroundAsset.topic == topic_key(topic),
+        BackgroundAsset.path.notin_(used),
+        BackgroundAsset.path.notin_(buffered),
+    )
+    if palette:
+        q = q.filter(BackgroundAsset.palette == palette)
+    found = []
+    for asset in q.order_by(BackgroundAsset.use_count.asc(), func.random()).limit(limit).all():
+        if not (BASE_DIR / asset.path).exists():
+            db.delete(asset)
+            db.commit()
+            continue
+        found.append(asset)
+    return found
+
+
+def pick(db, topic: str, account_id: Optional[int], palette: Optional[str] = None) -> Optional[BackgroundAsset]:
+    """candidates() içinden ilki (kullanım sayacı değişmez; kullanılırsa mark_used)."""
+    found = candidates(db, topic, account_id, palette, limit=1)
+    return found[0] if found else None
+
+
+def mark_used(db, asset: BackgroundAsset) -> None:
+    asset.use_count = (asset.use_count or 0) + 1  # type: ignore[assignment]
+    asset.last_used_at = datetime.utcnow()  # type: ignore[assignment]
+    db.add(asset)
+    db.commit()
+
+
+def _is_duplicate(db, asset: BackgroundAsset, account_id: Optional[int], text: str, signature: str, style: str, target: str) -> bool:
+    """
+    Arka plan bu metinle render edilince hesabın mevcut bir görseline çok yakın mı (image_dedup).
+    Hesapsız taslaklar (/api/generate) kontrol edilmez; near-duplicate kontrolü hesap bazındadır.
+    """
+    if not IMAGE_DEDUP_ENABLED or account_id is None:
+        return False
+    try:
+        small = render_pool.call("render_hash_image", asset.path, text, signature, style, target)
+        image_dedup.check(db, account_id, image_dedup.dhash(small))
+    except image_dedup.DuplicateImageError as e:
+        print(f"[BG_LIBRARY] Skipping background {asset.sha256[:12]} for account={account_id}: {e}")
+        return True
+    except Exception as e:
+        print(f"[BG_LIBRARY] Duplicate check failed for background {asset.sha256[:12]}: {e}")
+    return False
+
+
+def draft_content(
+    db,
+    topic: str,
+    account_id: Optional[int],
+    reuse: Optional[bool] = None,
+    signature: str = "ince düşlerim",
+    style: str = "minimal_dark",
+    target: str = "square",
+    **kwargs,
+):
+    """
+    generate_draft_content ile aynı sonuç; arka plan mümkünse kütüphaneden gelir (görsel API'si
+    çağrılmaz), değilse üretilen görsel kütüphaneye eklenir. signature / style / target taslağın
+    render ayarları: kütüphane arka planı bu ayarlarla near-duplicate ise yeni görsel üretilir.
+    kwargs generate_draft_content'e geçer.
+    """
+    reuse = BACKGROUND_LIBRARY_ENABLED if reuse is None else reuse
+    found = []
+    if reuse:
+        try:
+            found = candidates(db, topic, account_id)
+        except Exception as e:
+            print(f"[BG_LIBRARY] Lookup failed for topic={topic}: {e}")
+    if found:
+        draft = content_ai.generate_draft_content(topic, with_image=False, **kwargs)
+        for asset in found:
+            if _is_duplicate(db, asset, account_id, draft.caption, signature, style, target):
+                continue
+            try:
+                data = (BASE_DIR / asset.path).read_bytes()
+            except Exception as e:
+                print(f"[BG_LIBRARY] Could not read background {asset.path}: {e}")
+                continue
+            mark_used(db, asset)
+            draft.image_bytes = data
+            draft.image_prompt = asset.prompt or draft.image_prompt
+            print(f"[BG_LIBRARY] Reusing background {asset.sha256[:12]} for topic={topic} account={account_id}")
+            return draft
+        # hiçbir aday kullanılamadı: bu taslağın prompt'uyla yeni görsel
+        try:
+            draft.image_bytes = content_ai.generate_image_png_bytes(draft.image_prompt, timings=draft.timings_ms)
+        except Exception as e:
+            draft.errors["image"] = e
+    else:
+        draft = content_ai.generate_draft_content(topic, **kwargs)
+    if draft.image_bytes and reuse:
+        try:
+            add(db, draft.image_bytes, topic, draft.image_prompt)
+        except Exception as e:
+            print(f"[BG_LIBRARY] Failed to index background for topic={topic}: {e}")
+    return draft
+
+
+@rate_limiter.with_priority("background")
+def prefill(per_topic: Optional[int] = None, max_new: Optional[int] = None) -> int:
+    """
+    Konuları sırayla dolaşıp her birini per_topic (None -> BACKGROUND_LIBRARY_TARGET_PER_TOPIC)
+    arka plana tamamlar; en fazla max_new görsel üretir. Üretilen sayıyı döner.
+    """
+    per_topic = BACKGROUND_LIBRARY_TARGET_PER_TOPIC if per_topic is None else per_topic
+    db = SessionLocal()
+    created = 0
+    try:
+        counts = dict(
+            db.query(BackgroundAsset.topic, func.count(BackgroundAsset.id)).group_by(BackgroundAsset.topic).all()
+        )
+        pending = [t for t in content_ai.ALLOWED_TOPICS if counts.get(t, 0) < per_topic]
+        attempts = 0
+        while pending and (max_new is None or created < max_new):
+            topic = pending.pop(0)
+            attempts += 1
+            if attempts > 4 * per_topic * len(content_ai.ALLOWED_TOPICS):
+                break
+            try:
+                # cache'siz (varsayılan): aynı konu için farklı prompt (çeşitlilik)
+                prompt = content_ai.generate_image_prompt(topic)
+                fp = prompt_fingerprint(prompt)
+                if fp and db.query(BackgroundAsset.id).filter(BackgroundAsset.prompt_fp == fp).first():
+                    pending.append(topic)
+                    continue
+                add(db, content_ai.generate_image_png_bytes(prompt), topic, prompt)
+                created += 1
+                counts[topic] = counts.get(topic, 0) + 1
+            except Exception as e:
+                print(f"[BG_LIBRARY] Prefill failed for topic={topic}: {e}")
+                continue
+            if counts[topic] < per_topic:
+                pending.append(topic)
+        if created:
+            print(f"[BG_LIBRARY] Prefilled {created} background(s)")
+    finally:
+        db.close()
+    return created
+
+
+def _in_prefill_window(hour: int) -> bool:
+    """BACKGROUND_PREFILL_HOURS 'başlangıç-bitiş' (yerel saat, bitiş hariç; gece yarısını geçebilir)."""
+    try:
+        start, end = (int(x) for x in BACKGROUND_PREFILL_HOURS.split("-"))
+    except Exception:
+        return False
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def prefill_async() -> None:
+    """Yoğun olmayan saatlerde prefill'i arka plan thread'inde küçük partiler halinde çalıştırır."""
+    if not BACKGROUND_LIBRARY_ENABLED or not _in_prefill_window(datetime.now().hour):
+        return
+    if not _prefill_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            prefill(max_new=BACKGROUND_PREFILL_BATCH)
+        except Exception as e:
+            print(f"[BG_LIBRARY] Prefill error: {e}")
+        finally:
+            _prefill_lock.release()
+
+    threading.Thread(target=run, name="background-prefill", daemon=True).start()
+
+
+def stats(db) -> dict:
+    rows = db.query(BackgroundAsset.topic, func.count(BackgroundAsset.id), func.sum(BackgroundAsset.use_count))
+    per_topic = {t: {"assets": n, "uses": int(u or 0)} for t, n, u in rows.group_by(BackgroundAsset.topic).all()}
+    return {
+        "enabled": BACKGROUND_LIBRARY_ENABLED,
+        "target_per_topic": BACKGROUND_LIBRARY_TARGET_PER_TOPIC,
+        "topics": per_topic,
+    }
@@ -1,7 +1,27 @@
+import base64
+import contextvars
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
 from openai import OpenAI
-from app.config import OPENAI_API_KEY
+from app.services import llm_cache, rate_limiter, single_flight
+from app.config import (
+    CONTENT_AI_COMBINED,
+    CONTENT_AI_WORKERS,
+    HASHTAG_MODE,
+    OPENAI_API_KEY,
+    OPENAI_IMAGE_MODEL,
+    OPENAI_IMAGE_RESPONSE_FORMAT,
+)
 
 _client = None
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_http = None
 
 
 def get_client():
@@ -14,28 +34,52 @@ def get_client():
     return _client
 
 
-def generate_caption(topic):
-    # Enforce allowed topics only
-    ALLOWED_TOPICS = [
-        "duygusal",
-        "ikili ilişkiler",
-        "aşk",
-        "arkadaşlık",
-        "platonik aşk",
-        "komedi",
-        "dram",
-    ]
-
-    def _choose_topic(t):
-        if not t:
-            return "duygusal"
-        tl = t.lower()
-        for a in ALLOWED_TOPICS:
-            if a in tl or tl in a:
-                return a
-        # fallback
+# Enforce allowed topics only (caption / hashtag / image prompt / combined prompts share this)
+# LLM'e ulaşılamazsa dönen genel hashtag'ler (/api/generate'in varsayılanları da bunlardan)
+FALLBACK_HASHTAGS = [
+    "#AI",
+    "#Technology",
+    "#Innovation",
+    "#Motivation",
+    "#Inspiration",
+    "#Success",
+    "#Growth",
+    "#Tips",
+    "#Life",
+    "#Daily",
+]
+
+ALLOWED_TOPICS = [
+    "duygusal",
+    "ikili ilişkiler",
+    "aşk",
+    "arkadaşlık",
+    "platonik aşk",
+    "komedi",
+    "dram",
+]
+
+
+def _choose_topic(t):
+    if not t:
         return "duygusal"
+    tl = t.lower()
+    for a in ALLOWED_TOPICS:
+        if a in tl or tl in a:
+            return a
+    # fallback
+    return "duygusal"
+
+
+def topic_key(topic):
+    """Index anahtarı olarak tema: tam eşleşme önce ("platonik aşk" -> "aşk" olmasın), sonra _choose_topic."""
+    if topic and topic.lower() in ALLOWED_TOPICS:
+        return topic.lower()
+    return _choose_topic(topic)
+
 
+def generate_caption(topic, cache=False):
+    # cache=False: caption'da çeşitlilik istiyoruz (aynı konu -> farklı metin)
     topic_choice = _choose_topic(topic)
 
     # Generate short, Instagram-appropriate caption constrained to allowed themes.
@@ -47,17 +91,16 @@ def generate_caption(topic):
         f"- Emoji kullanmak isterseniz 1-2 ile sınırlayın. CTA ya da 'yorumlarda paylaşın' gibi yönlendirmeler eklemeyin.\n"
         f"- Sonunda hashtag eklemeyin (hashtag ayrı fonksiyonda üretilir).\n"
     )
-    client = get_client()
-    resp = client.chat.completions.create(
+    return llm_cache.chat(
+        [{"role": "user", "content": prompt}],
         # gpt-4 yerine daha yaygın erişilebilen bir model kullan
         # Hesabında açık olan modele göre burayı değiştirebilirsin.
         model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
+        cache=cache,
     )
-    return resp.choices[0].message.content
 
 
-def generate_hashtags(topic, caption=None, count=10):
+def generate_hashtags(topic, caption=None, count=10, cache=True, mode=None):
     """
     Verilen konu ve caption'a göre Instagram hashtag'leri üretir.
 
@@ -65,31 +108,24 @@ def generate_hashtags(topic, caption=None, count=10):
         topic: Post konusu
         caption: Post caption'ı (opsiyonel, daha iyi hashtag için)
         count: Kaç hashtag üretilecek (default: 10)
+        cache: Aynı konu + caption için LLM cevabını cache'ten kullan (bkz. llm_cache)
+        mode: "index" -> önce post geçmişinden hashtag index'i (hashtag_index), yeterli
+              kapsam yoksa LLM ile tamamlanır; "llm" -> doğrudan LLM (None -> HASHTAG_MODE)
 
     Returns:
         List[str]: Hashtag listesi (örn: ["#AI", "#Technology", ...])
     """
+    indexed = []
+    if (HASHTAG_MODE if mode is None else mode) == "index":
+        from app.services import hashtag_index
+
+        try:
+            indexed = hashtag_index.rank(topic, caption, count)
+        except Exception as e:
+            print(f"Warning: Hashtag index lookup failed: {e}")
+        if len(indexed) >= count:
+            return indexed[:count]
     try:
-        ALLOWED_TOPICS = [
-            "duygusal",
-            "ikili ilişkiler",
-            "aşk",
-            "arkadaşlık",
-            "platonik aşk",
-            "komedi",
-            "dram",
-        ]
-
-        def _choose_topic(t):
-            if not t:
-                return "duygusal"
-            tl = t.lower()
-            for a in ALLOWED_TOPICS:
-                if a in tl or tl in a:
-                    return a
-            return "duygusal"
-
-        client = get_client()
         topic_choice = _choose_topic(topic)
         context = f"Konuyu Türkçe olarak ele al. Topic: {topic_choice}"
         if caption:
@@ -99,43 +135,47 @@ def generate_hashtags(topic, caption=None, count=10):
 
 Sadece hashtag'leri döndürün, her satırda bir tane, '#' ile başlayacak şekilde. Açıklama yazmayın."""
 
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}]
-        )
-
-        hashtags_text = resp.choices[0].message.content.strip()
+        hashtags_text = llm_cache.chat(
+            [{"role": "user", "content": prompt}], model="gpt-4o-mini", cache=cache
+        ).strip()
         # Satırlara böl ve # ile başlamayanları filtrele
         hashtags = [
             line.strip()
             for line in hashtags_text.split("\n")
             if line.strip().startswith("#")
         ]
+        # index'ten gelenler önce, LLM'in önerdikleri eksikleri tamamlar
+        seen = {h.lower() for h in indexed}
+        hashtags = indexed + [h for h in hashtags if h.lower() not in seen]
 
-        # Eğer yeterli hashtag yoksa, topic'ten bazı genel ekle
-        if len(hashtags) < count:
-            topic_words = topic.lower().split()
-            for word in topic_words[: count - len(hashtags)]:
-                if len(word) > 3:  # Çok kısa kelimeleri atla
-                    hashtags.append(f"#{word.capitalize()}")
-
-        return hashtags[:count]  # İstenen sayıya kadar sınırla
+        return _pad_hashtags(hashtags, topic, count)
 
     except Exception as e:
-        # Fallback: Basit hashtag'ler
+        # Fallback: index'ten bulunanlar, yoksa basit hashtag'ler
         print(f"Warning: Hashtag generation failed: {e}")
-        fallback = [
-            "#AI",
-            "#Technology",
-            "#Innovation",
-            "#Motivation",
-            "#Inspiration",
-            "#Success",
-            "#Growth",
-            "#Tips",
-            "#Life",
-            "#Daily",
-        ]
-        return fallback[:count]
+        if indexed:
+            return _pad_hashtags(indexed, topic, count)
+        return FALLBACK_HASHTAGS[:count]
+
+
+def _pad_hashtags(hashtags, topic, count):
+    # Eğer yeterli hashtag yoksa, topic'ten bazı genel ekle
+    if len(hashtags) < count:
+        topic_words = (topic or "").lower().split()
+        for word in topic_words[: count - len(hashtags)]:
+            if len(word) > 3:  # Çok kısa kelimeleri atla
+                hashtags.append(f"#{word.capitalize()}")
+
+    return hashtags[:count]  # İstenen sayıya kadar sınırla
+
+
+def filler_hashtags(topic) -> set:
+    """
+    LLM'den gelmeyen dolgu hashtag'leri (küçük harf, '#' olmadan): FALLBACK_HASHTAGS ve
+    _pad_hashtags'in konu kelimelerinden ürettikleri. hashtag_index bunları indekslemez.
+    """
+    words = {w for w in (topic or "").lower().split() if len(w) > 3}
+    return words | {h.lstrip("#").casefold() for h in FALLBACK_HASHTAGS}
 
 
 def format_post_text(caption, hashtags):
@@ -172,34 +212,16 @@ def format_post_text(caption, hashtags):
     return formatted_post
 
 
-def generate_image_prompt(topic: str) -> str:
+def generate_image_prompt(topic: str, cache: bool = False) -> str:
     """
     Create a compact image generation prompt optimized for quote overlay on Instagram.
     The returned prompt should describe a square (1:1) background with negative space/area
     for readable text, a clear mood/style and color palette. Do NOT include any readable text
     in the image itself.
+    Not cached by default: a cached prompt would pin every background of a topic to one prompt
+    for the whole LLM_CACHE_TTL (cache=True opts in, see llm_cache).
     """
-    ALLOWED_TOPICS = [
-        "duygusal",
-        "ikili ilişkiler",
-        "aşk",
-        "arkadaşlık",
-        "platonik aşk",
-        "komedi",
-        "dram",
-    ]
-
-    def _choose_topic(t):
-        if not t:
-            return "duygusal"
-        tl = t.lower()
-        for a in ALLOWED_TOPICS:
-            if a in tl or tl in a:
-                return a
-        return "duygusal"
-
     try:
-        client = get_client()
         topic_choice = _choose_topic(topic)
         prompt = (
             f"Create a concise image generation prompt for a square Instagram background about: {topic_choice}\n\n"
@@ -209,19 +231,48 @@ def generate_image_prompt(topic: str) -> str:
             "- Composition: minimal distractions in center, subtle texture, natural lighting or soft vignette.\n"
             "Return ONLY the image prompt as a single paragraph."
         )
-        resp = client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}])
-        return resp.choices[0].message.content.strip()
+        return llm_cache.chat([{"role": "user", "content": prompt}], model="gpt-4o-mini", cache=cache).strip()
     except Exception as e:
         print(f"Warning: Image prompt generation failed: {e}")
         return f"Square 1:1 soft background with centered negative space for text, warm pastel palette, high quality, {topic}"
 
 
-def generate_image_png_bytes(image_prompt: str) -> bytes:
+def _http_session():
+    """Görsel indirmeleri için paylaşılan keep-alive session (bağlantı havuzu, thread'ler arası)."""
+    global _http
+    if _http is None:
+        with _executor_lock:
+            if _http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(2, CONTENT_AI_WORKERS))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http = session
+    return _http
+
+
+def _download_image(url: str) -> bytes:
+    """URL'den görseli havuzlanmış session ile parça parça (stream) indirir."""
+    with _http_session().get(url, timeout=(5, 30), stream=True) as resp:
+        resp.raise_for_status()
+        return b"".join(resp.iter_content(chunk_size=64 * 1024))
+
+
+def generate_image_png_bytes(image_prompt: str, timings: Optional[dict] = None) -> bytes:
     """
-    OpenAI gpt-image-1 modeli ile görsel üretir ve PNG bytes döndürür.
+    OpenAI ile görsel üretir (OPENAI_IMAGE_MODEL) ve PNG bytes döndürür.
+
+    OPENAI_IMAGE_RESPONSE_FORMAT=b64_json (varsayılan): görsel API cevabında gelir, bellekte
+    decode edilir (CDN'den ikinci indirme yok). "url" ise görsel paylaşılan keep-alive
+    session ile indirilir. gpt-image-* modelleri her zaman base64 döner.
+    Aynı prompt için eşzamanlı çağrılar (thread / process) tek üretimi paylaşır (single_flight).
 
     Args:
         image_prompt: Görsel üretimi için prompt
+        timings: verilirse faz süreleri (ms) yazılır: image_generate + image_decode / image_download
 
     Returns:
         bytes: PNG formatında görsel bytes'ı
@@ -229,29 +280,43 @@ def generate_image_png_bytes(image_prompt: str) -> bytes:
     Raises:
         Exception: OpenAI API hatası veya görsel üretilemezse
     """
+    key = single_flight.make_key(OPENAI_IMAGE_MODEL, OPENAI_IMAGE_RESPONSE_FORMAT, "1024x1024", image_prompt)
+    return single_flight.do("image", key, _generate_image_png_bytes, image_prompt, timings)
+
+
+def _generate_image_png_bytes(image_prompt: str, timings: Optional[dict] = None) -> bytes:
     client = get_client()
+    timings = {} if timings is None else timings
 
     try:
-        # DALL-E 3 sadece URL formatını destekler, b64_json desteklemez
-        # URL'den görseli indirip bytes'a çeviriyoruz
-        resp = client.images.generate(
-            model="dall-e-3",
-            prompt=image_prompt,
-            size="1024x1024",
-            n=1,
-            response_format="url",  # DALL-E 3 için tek desteklenen format
+        params = {"model": OPENAI_IMAGE_MODEL, "prompt": image_prompt, "size": "1024x1024", "n": 1}
+        if not OPENAI_IMAGE_MODEL.startswith("gpt-image"):
+            params["response_format"] = OPENAI_IMAGE_RESPONSE_FORMAT
+        t = time.perf_counter()
+        with rate_limiter.limit(OPENAI_IMAGE_MODEL):
+            timings["image_queue"] = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            resp = client.images.generate(**params)
+            timings["image_generate"] = (time.perf_counter() - t) * 1000
+
+        item = resp.data[0]
+        b64 = getattr(item, "b64_json", None)
+        t = time.perf_counter()
+        if b64:
+            data = base64.b64decode(b64)
+            timings["image_decode"] = (time.perf_counter() - t) * 1000
+        else:
+            url = getattr(item, "url", None)
+            if not url:
+                raise ValueError("Empty image data from OpenAI")
+            data = _download_image(url)
+            timings["image_download"] = (time.perf_counter() - t) * 1000
+        print(
+            f"[IMAGE] {OPENAI_IMAGE_MODEL}: generate {timings['image_generate']:.0f} ms, "
+            + (f"decode {timings['image_decode']:.0f} ms" if b64 else f"download {timings['image_download']:.0f} ms")
+            + f", {len(data)} bytes"
         )
-
-        url = resp.data[0].url  # type: ignore[attr-defined]
-        if not url:
-            raise ValueError("Empty image URL from OpenAI")
-
-        # URL'den görseli indir
-        import requests
-
-        img_resp = requests.get(url, timeout=30)
-        img_resp.raise_for_status()
-        return img_resp.content
+        return data
 
     except Exception as e:
         # Hata durumunda detaylı log
@@ -260,3 +325,236 @@ def generate_image_png_bytes(image_prompt: str) -> bytes:
         print(f"[ERROR] OpenAI image generation failed: {e}")
         print(f"[ERROR] Traceback: {traceback.format_exc()}")
         raise Exception(f"Failed to generate image: {e}") from e
+
+
+# Structured output şeması (combined mod); strict: model tam olarak bu alanları döndürür
+_BUNDLE_SCHEMA = {
+    "name": "post_content",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "caption": {"type": "string"},
+            "hashtags": {"type": "array", "items": {"type": "string"}},
+            "image_prompt": {"type": "string"},
+        },
+        "required": ["caption", "hashtags", "image_prompt"],
+        "additionalProperties": False,
+    },
+}
+# HASHTAG_MODE=index: hashtag'ler ayrıca generate_hashtags ile (önce index) üretilir
+_BUNDLE_SCHEMA_NO_HASHTAGS = {
+    "name": "post_content",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "caption": {"type": "string"},
+            "image_prompt": {"type": "string"},
+        },
+        "required": ["caption", "image_prompt"],
+        "additionalProperties": False,
+    },
+}
+
+
+def _valid_text(value, max_len: int = 2000) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value if value and len(value) <= max_len else None
+
+
+def _valid_hashtags(value, topic, count) -> Optional[list]:
+    if not isinstance(value, list):
+        return None
+    hashtags = []
+    for tag in value:
+        if not isinstance(tag, str):
+            continue
+        tag = "".join(tag.split())
+        if not tag:
+            continue
+        tag = tag if tag.startswith("#") else f"#{tag}"
+        if len(tag) > 1 and tag not in hashtags:
+            hashtags.append(tag)
+    return _pad_hashtags(hashtags, topic, count) if hashtags else None
+
+
+def generate_combined(topic, count=10, cache=False, with_hashtags=None) -> dict:
+    """
+    Caption, hashtag'ler ve image prompt'u tek structured-output isteğiyle üretir.
+
+    Dönen dict sadece şemaya uyan alanları içerir (caption / hashtags / image_prompt);
+    parse hatası veya geçersiz alan varsa o alan eksik olur, çağıran o alan için
+    ayrı fonksiyona (generate_caption / generate_hashtags / generate_image_prompt) düşer.
+    Caption içerdiği için varsayılan olarak cache'lenmez (cache=False).
+    with_hashtags (None -> HASHTAG_MODE != "index"): False ise hashtag istenmez; çağıran
+    generate_hashtags ile önce hashtag index'ine bakar.
+    """
+    if with_hashtags is None:
+        with_hashtags = HASHTAG_MODE != "index"
+    topic_choice = _choose_topic(topic)
+    hashtag_line = (
+        f"- hashtags: caption'a uygun {count} adet Türkçe bağlamda Instagram hashtag'i, her biri '#' ile başlasın.\n"
+        if with_hashtags
+        else ""
+    )
+    prompt = (
+        f"Konu: {topic_choice}\n"
+        f"Bu içerik yalnızca şu temalardan biri üzerine olsun: {', '.join(ALLOWED_TOPICS)}.\n\n"
+        "Aşağıdaki alanları içeren bir JSON nesnesi döndür:\n"
+        "- caption: Türkçe, Instagram için KISA, mobilde okunaklı ve paylaşılabilir bir içerik (1-3 kısa cümle). "
+        "Duygusal, samimi ve hafif dramatik ama umutlu bir ton. Emoji en fazla 1-2. "
+        "CTA ya da 'yorumlarda paylaşın' gibi yönlendirme ve hashtag içermesin.\n"
+        + hashtag_line
+        + "- image_prompt: English, a concise image generation prompt (single paragraph) for a square Instagram "
+        "background about the same theme. No readable text in the image; leave a clear centered negative space "
+        "for a light-colored quote overlay; soft, emotive, high-quality style; suggest palette and mood; "
+        "minimal distractions in center, subtle texture, natural lighting or soft vignette.\n"
+    )
+    content = llm_cache.chat(
+        [{"role": "user", "content": prompt}],
+        model="gpt-4o-mini",
+        cache=cache,
+        response_format={
+            "type": "json_schema",
+            "json_schema": _BUNDLE_SCHEMA if with_hashtags else _BUNDLE_SCHEMA_NO_HASHTAGS,
+        },
+    )
+    try:
+        data = json.loads(content or "")
+    except (TypeError, ValueError) as e:
+        print(f"Warning: Combined generation returned invalid JSON: {e}")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    result = {}
+    caption = _valid_text(data.get("caption"))
+    if caption:
+        result["caption"] = caption
+    if with_hashtags:
+        hashtags = _valid_hashtags(data.get("hashtags"), topic, count)
+        if hashtags:
+            result["hashtags"] = hashtags
+    image_prompt = _valid_text(data.get("image_prompt"))
+    if image_prompt:
+        result["image_prompt"] = image_prompt
+    missing = {"caption", "image_prompt"} | ({"hashtags"} if with_hashtags else set())
+    missing -= result.keys()
+    if missing:
+        print(f"Warning: Combined generation missing/invalid fields {sorted(missing)}; falling back per field")
+    return result
+
+
+def submit(fn: Callable, *args, **kwargs) -> Future:
+    """
+    Blocking OpenAI/HTTP çağrısını paylaşılan I/O thread pool'unda başlatır (CONTENT_AI_WORKERS).
+    OpenAI client thread-safe; çağrılar paralel round trip yapar.
+    Çağıranın context'i (rate_limiter önceliği) worker thread'e taşınır.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(2, CONTENT_AI_WORKERS), thread_name_prefix="content-ai")
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+@dataclass
+class DraftContent:
+    """generate_draft_content sonucu; başarısız adımlar errors'ta (caption fallback ile doldurulur)."""
+
+    topic: str
+    caption: str
+    hashtags: list
+    image_prompt: str
+    image_bytes: Optional[bytes] = None
+    errors: dict = field(default_factory=dict)  # adım -> exception (caption / hashtags / image)
+    timings_ms: dict = field(default_factory=dict)  # combined / caption / hashtags / image_prompt / image (+ image_queue, image_generate, image_decode|image_download) / total
+
+
+def generate_draft_content(
+    topic: str,
+    hashtag_count: int = 10,
+    with_image: bool = True,
+    caption_fallback: Optional[str] = None,
+    combined: Optional[bool] = None,
+) -> DraftContent:
+    """
+    Caption, hashtag, image prompt (ve görsel) üretimini paralel çalıştırır.
+
+    combined (None -> CONTENT_AI_COMBINED): önce tek structured-output isteği
+    (generate_combined) üç alanı birlikte üretir; eksik/geçersiz alanlar aşağıdaki
+    zincirlerde ayrı fonksiyonlarla üretilir. HASHTAG_MODE=index iken hashtag'ler
+    combined istekte yoktur; generate_hashtags önce hashtag index'ine bakar.
+
+    Bağımlılıklar iki zincir halinde:
+    - caption -> hashtags (hashtag caption'a bakar)
+    - image_prompt -> generate_image_png_bytes (prompt hazır olur olmaz başlar)
+    Toplam süre ~ en uzun zincir (genelde prompt + görsel).
+
+    caption_fallback: caption üretilemezse kullanılacak metin (None ise hata yükseltilir).
+    Görsel üretilemezse image_bytes None, hata errors["image"]'da.
+    """
+    t0 = time.perf_counter()
+    errors: dict = {}
+    timings: dict = {}
+
+    def timed(name: str, fn: Callable, *args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[name] = (time.perf_counter() - t) * 1000
+
+    bundle: dict = {}
+    if CONTENT_AI_COMBINED if combined is None else combined:
+        try:
+            bundle = timed("combined", generate_combined, topic, count=hashtag_count)
+        except Exception as e:
+            print(f"Warning: Combined generation failed, using separate calls: {e}")
+            errors["combined"] = e
+
+    def text_chain():
+        try:
+            caption = bundle.get("caption") or timed("caption", generate_caption, topic)
+        except Exception as e:
+            if caption_fallback is None:
+                raise
+            print(f"Warning: Caption generation failed: {e}")
+            errors["caption"] = e
+            caption = caption_fallback
+        try:
+            hashtags = bundle.get("hashtags") or timed(
+                "hashtags", generate_hashtags, topic, caption=caption, count=hashtag_count
+            )
+        except Exception as e:
+            errors["hashtags"] = e
+            hashtags = []
+        return caption, hashtags
+
+    def image_chain():
+        image_prompt = bundle.get("image_prompt") or timed("image_prompt", generate_image_prompt, topic)
+        image_bytes = None
+        if with_image:
+            try:
+                image_bytes = timed("image", generate_image_png_bytes, image_prompt, timings=timings)
+            except Exception as e:
+                errors["image"] = e
+        return image_prompt, image_bytes
+
+    image_future = submit(image_chain)
+    # text zinciri çağıran thread'de çalışır (pool'da bir slot daha tutmaya gerek yok)
+    caption, hashtags = text_chain()
+    image_prompt, image_bytes = image_future.result()
+    timings["total"] = (time.perf_counter() - t0) * 1000
+    return DraftContent(
+        topic=topic,
+        caption=caption,
+        hashtags=hashtags,
+        image_prompt=image_prompt,
+        image_bytes=image_bytes,
+        errors=errors,
+        timings_ms=timings,
+    )
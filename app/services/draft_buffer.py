@@ -0,0 +1,293 @@
+"""Warm draft buffer for automation.
+
+Zamanı gelen automation slot'unda OpenAI metin + DALL-E zinciri kritik yolda
+olmasın diye içerik önceden üretilir: hesap başına DRAFT_BUFFER_SIZE hazır
+taslak (caption, hashtag, image prompt, içerik adresli arka plan, render
+parametreleri, perceptual hash) draft_buffer tablosunda bekler.
+
+- refill(): bir sonraki automation zamanı DRAFT_BUFFER_LEAD_MINUTES içindeyse
+  eksik hesaplar için taslak üretir (çağrı başına en fazla DRAFT_BUFFER_MAX_FILLS);
+  arka plan döngüsünden refill_async() ile boşta çalışır.
+- claim(): generate_draft_for_setting kendi dedup kontrollerinden (son 10 dk,
+  automation_runs) sonra buradan bir taslak alır; konu eşleşen önce, sonra en eski.
+  Alınırken near-duplicate kontrolü (image_dedup) tekrar yapılır.
+- expire(): süresi dolan (DRAFT_BUFFER_TTL_HOURS) veya yarım kalmış claim'ler silinir,
+  kullanılmayan arka plan dosyaları temizlenir.
+
+Final görsel yine onayda üretilir (post_render); buffer sadece pahalı üretim adımlarını öne alır.
+
+Provides:
+- next_fire_time(setting, local_now) -> datetime | None (naive UTC)
+- buffered_count(db, account_id) -> int
+- fill_one(db, setting) -> DraftBuffer | None
+- claim(db, account_id, topic=None) -> DraftBuffer | None
+- unclaim(db, item) / consume(db, item)
+- expire(db) -> int
+- refill(max_fills=None) -> int, refill_async() -> None
+"""
+from __future__ import annotations
+
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from app.config import (
+    DRAFT_BUFFER_LEAD_MINUTES,
+    DRAFT_BUFFER_MAX_FILLS,
+    DRAFT_BUFFER_SIZE,
+    DRAFT_BUFFER_TTL_HOURS,
+    IMAGE_DEDUP_ENABLED,
+)
+from app.database import SessionLocal
+from app.models import AutomationSetting, DraftBuffer, Post
+from app.services import background_library, image_dedup, post_render, rate_limiter
+from app.services.trend_radar import get_trending_topics
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+_WEEKDAYS = {"Mon": 0, "Tue": 1, "Wed": 2, "Thu": 3, "Fri": 4, "Sat": 5, "Sun": 6}
+# claim edilip Post'a dönüşmeyen (process çöktü vb.) kayıtlar bu süreden sonra silinir
+_STALE_CLAIM = timedelta(hours=1)
+
+_refill_lock = threading.Lock()
+
+
+def _parse_hhmm(value) -> Optional[tuple[int, int]]:
+    try:
+        parts = str(value).split(":")
+        return int(parts[0]), int(parts[1]) if len(parts) > 1 else 0
+    except Exception:
+        return None
+
+
+def _to_utc(local_dt: datetime) -> datetime:
+    return local_dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def next_fire_time(setting: AutomationSetting, local_now: datetime) -> Optional[datetime]:
+    """
+    Ayarın bir sonraki taslak üretim zamanı (naive UTC). run_automation_check ile aynı yorum:
+    saatler yerel saat dilimindedir; daily_times / weekly_times yoksa günlük pencere başlangıcı
+    (pencerenin içindeysek şimdi).
+    """
+    tz = local_now.tzinfo
+    candidates = []
+    try:
+        daily_times = json.loads(setting.daily_times) if setting.daily_times else []
+    except Exception:
+        daily_times = []
+    try:
+        weekly_times = json.loads(setting.weekly_times) if setting.weekly_times else []
+    except Exception:
+        weekly_times = []
+
+    if setting.frequency == "daily" and daily_times:
+        for t in daily_times:
+            hm = _parse_hhmm(t.get("time") if isinstance(t, dict) else t)
+            if not hm:
+                continue
+            at = datetime(local_now.year, local_now.month, local_now.day, hm[0], hm[1], tzinfo=tz)
+            if at <= local_now:
+                at += timedelta(days=1)
+            candidates.append(at)
+    elif setting.frequency == "weekly" and weekly_times:
+        for item in weekly_times:
+            if not isinstance(item, dict):
+                continue
+            wd = _WEEKDAYS.get(item.get("day"))
+            hm = _parse_hhmm(item.get("time"))
+            if wd is None or not hm:
+                continue
+            day = local_now.date() + timedelta(days=wd - local_now.weekday())
+            at = datetime(day.year, day.month, day.day, hm[0], hm[1], tzinfo=tz)
+            if at <= local_now:
+                at += timedelta(days=7)
+            candidates.append(at)
+    elif setting.frequency == "daily":
+        hm = _parse_hhmm(setting.start_time) if setting.start_time else (setting.start_hour or 0, 0)
+        end = _parse_hhmm(setting.end_time) if setting.end_time else (setting.end_hour if setting.end_hour is not None else 23, 59)
+        if hm and end:
+            start_at = datetime(local_now.year, local_now.month, local_now.day, hm[0], hm[1], tzinfo=tz)
+            end_at = datetime(local_now.year, local_now.month, local_now.day, end[0], end[1], tzinfo=tz)
+            if start_at <= local_now <= end_at:
+                candidates.append(local_now)
+            else:
+                candidates.append(start_at if start_at > local_now else start_at + timedelta(days=1))
+    return _to_utc(min(candidates)) if candidates else None
+
+
+def buffered_count(db, account_id: int) -> int:
+    now = datetime.utcnow()
+    return (
+        db.query(DraftBuffer)
+        .filter(DraftBuffer.account_id == account_id, DraftBuffer.claimed_at.is_(None), DraftBuffer.expires_at > now)
+        .count()
+    )
+
+
+def fill_one(db, setting: AutomationSetting) -> Optional[DraftBuffer]:
+    """Bir taslak üretip buffer'a ekler. Fallback içerik (caption/görsel hatası) ve near-duplicate'ler buffer'a girmez."""
+    topic = get_trending_topics()[0]
+    draft = background_library.draft_content(db, topic, setting.account_id)
+    if draft.image_bytes is None or "caption" in draft.errors:
+        print(f"[DRAFT_BUFFER] Skipping fill for account {setting.account_id}: {draft.errors}")
+        return None
+    # transient Post: render girdileri + önizleme hash'i için (session'a eklenmez)
+    tmp = Post(account_id=setting.account_id, caption=draft.caption)
+    post_render.attach_render_inputs(tmp, draft.image_bytes, draft.caption, "ince düşlerim", "minimal_dark")
+    dhash = None
+    if IMAGE_DEDUP_ENABLED:
+        try:
+            dhash = post_render.draft_hash(tmp)
+            image_dedup.check(db, setting.account_id, dhash)
+        except image_dedup.DuplicateImageError as e:
+            print(f"[DRAFT_BUFFER] Dropping buffered draft for account {setting.account_id}: {e}")
+            post_render.release_background_path(db, tmp.background_path)
+            return None
+        except Exception as e:
+            print(f"[DRAFT_BUFFER] Duplicate check failed for account {setting.account_id}: {e}")
+    now = datetime.utcnow()
+    item = DraftBuffer(
+        account_id=setting.account_id,
+        setting_id=setting.id,
+        topic=topic,
+        caption=draft.caption,
+        hashtags=json.dumps(draft.hashtags),
+        image_prompt=draft.image_prompt,
+        background_path=tmp.background_path,
+        render_params=tmp.render_params,
+        dhash=image_dedup.to_signed(dhash) if dhash is not None else None,
+        created_at=now,
+        expires_at=now + timedelta(hours=DRAFT_BUFFER_TTL_HOURS),
+    )
+    db.add(item)
+    db.commit()
+    print(f"[DRAFT_BUFFER] Buffered draft id={item.id} for account {setting.account_id} topic={topic}")
+    return item
+
+
+def claim(db, account_id: int, topic: Optional[str] = None) -> Optional[DraftBuffer]:
+    """
+    Hesap için hazır bir taslağı atomik olarak alır (claimed_at). Konu eşleşen önce, sonra en eski.
+    Arka planı kaybolmuş veya artık near-duplicate olan kayıtlar atlanıp silinir.
+    """
+    expire(db)
+    now = datetime.utcnow()
+    items = (
+        db.query(DraftBuffer)
+        .filter(DraftBuffer.account_id == account_id, DraftBuffer.claimed_at.is_(None), DraftBuffer.expires_at > now)
+        .order_by(DraftBuffer.created_at.asc())
+        .all()
+    )
+    items.sort(key=lambda it: it.topic != topic)
+    for item in items:
+        won = (
+            db.query(DraftBuffer)
+            .filter(DraftBuffer.id == item.id, DraftBuffer.claimed_at.is_(None))
+            .update({DraftBuffer.claimed_at: now}, synchronize_session=False)
+        )
+        db.commit()
+        if won != 1:
+            continue  # başka bir process aldı
+        db.refresh(item)
+        if not (BASE_DIR / item.background_path).exists():
+            _drop(db, item)
+            continue
+        if item.dhash is not None:
+            try:
+                image_dedup.check(db, account_id, image_dedup.to_unsigned(item.dhash))
+            except image_dedup.DuplicateImageError as e:
+                print(f"[DRAFT_BUFFER] Dropping buffered draft id={item.id}: {e}")
+                _drop(db, item)
+                continue
+        return item
+    return None
+
+
+def unclaim(db, item: DraftBuffer) -> None:
+    """Claim edilen taslak kullanılmadıysa buffer'a geri koyar."""
+    item.claimed_at = None  # type: ignore[assignment]
+    db.add(item)
+    db.commit()
+
+
+def consume(db, item: DraftBuffer) -> None:
+    """Taslak Post'a dönüştü: buffer satırı silinir (arka plan artık Post'a ait, silinmez)."""
+    db.delete(item)
+
+
+def _drop(db, item: DraftBuffer) -> None:
+    rel = item.background_path
+    db.delete(item)
+    db.commit()
+    post_render.release_background_path(db, rel)
+
+
+def expire(db) -> int:
+    """Süresi dolmuş ve yarım kalmış claim'leri siler; kullanılmayan arka planları temizler."""
+    now = datetime.utcnow()
+    stale = (
+        db.query(DraftBuffer)
+        .filter(
+            ((DraftBuffer.claimed_at.is_(None)) & (DraftBuffer.expires_at <= now))
+            | (DraftBuffer.claimed_at < now - _STALE_CLAIM)
+        )
+        .all()
+    )
+    for item in stale:
+        _drop(db, item)
+    if stale:
+        print(f"[DRAFT_BUFFER] Expired {len(stale)} buffered draft(s)")
+    return len(stale)
+
+
+@rate_limiter.with_priority("automation")
+def refill(max_fills: Optional[int] = None) -> int:
+    """
+    Bir sonraki automation zamanı DRAFT_BUFFER_LEAD_MINUTES içinde olan hesapların buffer'ını
+    DRAFT_BUFFER_SIZE'a tamamlar. Aynı anda tek refill çalışır; üretilen taslak sayısını döner.
+    """
+    if DRAFT_BUFFER_SIZE <= 0:
+        return 0
+    if not _refill_lock.acquire(blocking=False):
+        return 0
+    max_fills = DRAFT_BUFFER_MAX_FILLS if max_fills is None else max_fills
+    fills = 0
+    db = SessionLocal()
+    try:
+        expire(db)
+        settings = db.query(AutomationSetting).filter(AutomationSetting.enabled == 1).all()
+        now = datetime.utcnow()
+        local_now = datetime.now().astimezone()
+        lead = timedelta(minutes=DRAFT_BUFFER_LEAD_MINUTES)
+        seen_accounts = set()
+        for s in settings:
+            if fills >= max_fills:
+                break
+            if s.account_id in seen_accounts:
+                continue
+            nxt = next_fire_time(s, local_now)
+            if nxt is None or nxt - now > lead:
+                continue
+            seen_accounts.add(s.account_id)
+            while fills < max_fills and buffered_count(db, s.account_id) < DRAFT_BUFFER_SIZE:
+                try:
+                    item = fill_one(db, s)
+                except Exception as e:
+                    print(f"[DRAFT_BUFFER] Fill failed for account {s.account_id}: {e}")
+                    item = None
+                if item is None:
+                    break
+                fills += 1
+    finally:
+        db.close()
+        _refill_lock.release()
+    return fills
+
+
+def refill_async() -> None:
+    """refill()'i arka plan thread'inde başlatır (automation döngüsünü bekletmez)."""
+    if DRAFT_BUFFER_SIZE <= 0 or _refill_lock.locked():
+        return
+    threading.Thread(target=refill, name="draft-buffer-refill", daemon=True).start()
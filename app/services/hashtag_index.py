@@ -0,0 +1,205 @@
+"""In-process hashtag index built from post history.
+
+posts.hashtags geçmişinden bellekte iki yapı tutulur (NumPy):
+- tema -> hashtag frekansı (satır = ALLOWED_TOPICS teması, sütun = hashtag)
+- hashtag x hashtag birlikte görülme (co-occurrence) matrisi
+
+Sadece LLM'in ürettiği hashtag'ler sayılır: fallback ve konu kelimesinden doldurulan
+genel etiketler (content_ai.filler_hashtags) indekse girmez, yoksa her post'ta
+bulundukları için gerçek etiketlerin önüne geçerler.
+
+Yeni post'lar artımlı eklenir (id > son indekslenen id); rank() tamamen bellekte
+çalışır (birkaç vektör işlemi, mikrosaniyeler). content_ai.generate_hashtags
+HASHTAG_MODE=index iken önce buraya bakar, kapsam yetersizse LLM'i çağırır.
+
+NumPy yoksa index kapalıdır (available() False), hashtag'ler LLM'den gelir.
+
+Provides:
+- available() -> bool
+- add(topic, hashtags) -> None (tek post, artımlı)
+- add_post(post) -> None (commit edilmiş Post; sıradaki id değilse refresh)
+- refresh(db=None, force=False) -> int (yeni indekslenen post sayısı)
+- rank(topic, caption=None, count=10, min_support=None) -> list[str]
+- stats() -> dict
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from typing import Optional
+
+from app.config import HASHTAG_INDEX_MAX_TAGS, HASHTAG_INDEX_MIN_SUPPORT, HASHTAG_INDEX_REFRESH_SECONDS
+from app.services.content_ai import ALLOWED_TOPICS, filler_hashtags, topic_key
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy opsiyonel
+    np = None
+
+_lock = threading.RLock()
+_tag_ids: dict[str, int] = {}
+_tag_names: list[str] = []
+# topic_key her zaman bir ALLOWED_TOPICS teması döner: satırlar sabit
+_topic_rows: dict[str, int] = {t: i for i, t in enumerate(ALLOWED_TOPICS)}
+_topic_counts = None  # (temalar, kapasite) int32
+_cooc = None  # (kapasite, kapasite) int32; köşegen = hashtag'in toplam kullanımı
+_last_post_id = 0
+_last_refresh = 0.0
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _key(tag: str) -> str:
+    return tag.strip().lstrip("#").casefold()
+
+
+def _grow(size: int) -> None:
+    """Matrisleri en az size sütuna büyütür (kapasite ikiye katlanır, HASHTAG_INDEX_MAX_TAGS sınırı)."""
+    global _topic_counts, _cooc
+    cap = 0 if _cooc is None else _cooc.shape[0]
+    if size <= cap:
+        return
+    new_cap = min(max(64, cap * 2, size), HASHTAG_INDEX_MAX_TAGS)
+    cooc = np.zeros((new_cap, new_cap), dtype=np.int32)
+    counts = np.zeros((len(_topic_rows), new_cap), dtype=np.int32)
+    if _cooc is not None:
+        cooc[:cap, :cap] = _cooc
+        counts[:, :cap] = _topic_counts
+    _cooc, _topic_counts = cooc, counts
+
+
+def _tag_id(tag: str) -> Optional[int]:
+    key = _key(tag)
+    if not key:
+        return None
+    idx = _tag_ids.get(key)
+    if idx is None:
+        if len(_tag_names) >= HASHTAG_INDEX_MAX_TAGS:
+            return None
+        idx = len(_tag_names)
+        _grow(idx + 1)
+        _tag_ids[key] = idx
+        _tag_names.append("#" + tag.strip().lstrip("#"))
+    return idx
+
+
+def add(topic: Optional[str], hashtags) -> None:
+    """Bir post'un hashtag'lerini indekse ekler (tema frekansı + birlikte görülme); dolgu etiketleri atlanır."""
+    if np is None or not hashtags:
+        return
+    filler = filler_hashtags(topic)
+    tags = [h for h in hashtags if isinstance(h, str) and _key(h) not in filler]
+    if not tags:
+        return
+    with _lock:
+        ids = sorted({i for i in (_tag_id(h) for h in tags) if i is not None})
+        if not ids:
+            return
+        row = _topic_rows[topic_key(topic)]
+        idx = np.asarray(ids)
+        _topic_counts[row, idx] += 1
+        _cooc[np.ix_(idx, idx)] += 1
+
+
+def _parse(raw) -> list:
+    try:
+        value = json.loads(raw) if isinstance(raw, str) else raw
+    except Exception:
+        value = str(raw).split()
+    return value if isinstance(value, list) else []
+
+
+def refresh(db=None, force: bool = False) -> int:
+    """Son indekslenen id'den sonraki post'ları ekler (HASHTAG_INDEX_REFRESH_SECONDS'ta bir, force ile hemen)."""
+    global _last_post_id, _last_refresh
+    if np is None:
+        return 0
+    if not force and time.monotonic() - _last_refresh < HASHTAG_INDEX_REFRESH_SECONDS:
+        return 0
+    from app.database import SessionLocal
+    from app.models import Post
+
+    own = db is None
+    db = SessionLocal() if own else db
+    added = 0
+    try:
+        with _lock:
+            rows = (
+                db.query(Post.id, Post.topic, Post.hashtags)
+                .filter(Post.id > _last_post_id, Post.hashtags.isnot(None))
+                .order_by(Post.id.asc())
+                .all()
+            )
+            for post_id, topic, raw in rows:
+                add(topic, _parse(raw))
+                _last_post_id = post_id
+                added += 1
+            _last_refresh = time.monotonic()
+    except Exception as e:
+        print(f"[HASHTAG_INDEX] Refresh failed: {e}")
+    finally:
+        if own:
+            db.close()
+    return added
+
+
+def add_post(post) -> None:
+    """Yeni commit edilen post'u indekse ekler; arada başka process'lerin post'ları varsa refresh eder."""
+    global _last_post_id
+    if np is None or post is None or post.id is None:
+        return
+    with _lock:
+        if post.id <= _last_post_id:
+            return
+        if post.id == _last_post_id + 1:
+            add(post.topic, _parse(post.hashtags))
+            _last_post_id = post.id
+            return
+    refresh(force=True)
+
+
+def rank(topic: Optional[str], caption: Optional[str] = None, count: int = 10, min_support: Optional[int] = None) -> list[str]:
+    """
+    Tema ve caption için hashtag sıralaması. Skor = tema frekansı (normalize) + caption'da geçen
+    hashtag'lerle birlikte görülme (normalize). Desteği (tema sayısı veya birlikte görülme)
+    min_support'un altında kalanlar dönmez; liste count'tan kısa olabilir.
+    """
+    if np is None:
+        return []
+    refresh()
+    min_support = HASHTAG_INDEX_MIN_SUPPORT if min_support is None else min_support
+    with _lock:
+        n = len(_tag_names)
+        row = _topic_rows.get(topic_key(topic))
+        if n == 0 or row is None:
+            return []
+        tf = _topic_counts[row, :n]
+        support = tf.copy()
+        score = tf / max(int(tf.max()), 1)
+        if caption:
+            seeds = [_tag_ids[w] for w in {m.casefold() for m in _WORD.findall(caption)} if w in _tag_ids]
+            if seeds:
+                co = _cooc[np.asarray(seeds)][:, :n].sum(axis=0)
+                support = np.maximum(support, co)
+                score = score + 0.5 * co / max(int(co.max()), 1)
+        score = np.where(support >= min_support, score, 0.0)
+        k = min(count, n)
+        top = np.argpartition(-score, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-score[top], kind="stable")]
+        return [_tag_names[i] for i in top if score[i] > 0]
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "available": available(),
+            "tags": len(_tag_names),
+            "topics": {t: int(_topic_counts[r].sum()) for t, r in _topic_rows.items()} if _topic_counts is not None else {},
+            "last_post_id": _last_post_id,
+            "capacity": 0 if _cooc is None else int(_cooc.shape[0]),
+        }
@@ -2,14 +2,14 @@
 
 Provides:
 - generate_image_bytes(prompt) -> bytes
+- render_bytes(background_bytes, text, signature, style='minimal_dark', target='square', persist=False, profile=None) -> RenderResult
 - render_from_bytes(background_bytes, text, signature, style='minimal_dark', target='square') -> (rel_path, abs_path)
 - generate_image_url(prompt) -> str  (delegates to visual_ai.generate_image)
 """
 from __future__ import annotations
-import tempfile
-from typing import Tuple
+from typing import Optional, Tuple
 
-from app.services import content_ai, visual_ai, image_render
+from app.services import content_ai, visual_ai, image_render, render_pool, single_flight
 
 
 def generate_image_bytes(prompt: str) -> bytes:
@@ -18,27 +18,33 @@ def generate_image_bytes(prompt: str) -> bytes:
 
 
 def generate_image_url(prompt: str) -> str:
-    """Generate an image and return a URL (fallbacks handled by visual_ai)."""
-    return visual_ai.generate_image(prompt)
+    """Generate an image and return a URL (fallbacks handled by visual_ai).
 
+    Concurrent calls with the same prompt share one generation (see single_flight).
+    """
+    return single_flight.do("image_url", single_flight.make_key(prompt), visual_ai.generate_image, prompt)
 
-def render_from_bytes(background_bytes: bytes, text: str, signature: str, style: str = "minimal_dark", target: str = "square") -> Tuple[str, str]:
-    """Save background_bytes to a temporary file, call image_render.render_image and return its result."""
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    try:
-        tmp.write(background_bytes)
-        tmp.flush()
-        tmp_path = tmp.name
-    finally:
-        tmp.close()
-    try:
-        return image_render.render_image(str(tmp_path), text, signature, style, target)
-    finally:
-        try:
-            import os
-
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except Exception:
-            pass
 
+def render_bytes(
+    background_bytes: bytes,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    persist: bool = False,
+    profile: Optional[str] = None,
+) -> image_render.RenderResult:
+    """Render text on background_bytes fully in memory; result.data is ready to upload.
+
+    Runs in the render process pool (see render_pool; inline when RENDER_POOL_SIZE=0).
+    persist=True additionally writes media/{result.filename} in the background.
+    profile selects the encoder (see image_encoders); result.content_type matches it.
+    """
+    return render_pool.render_bytes(background_bytes, text, signature, style, target, persist=persist, profile=profile)
+
+
+def render_from_bytes(background_bytes: bytes, text: str, signature: str, style: str = "minimal_dark", target: str = "square") -> Tuple[str, str]:
+    """Render from bytes and save the final image to media/ (for callers that need a file path)."""
+    result = render_bytes(background_bytes, text, signature, style, target)
+    abs_path = image_render.save_media(result.data, result.filename)
+    return f"media/{result.filename}", abs_path
@@ -0,0 +1,173 @@
+"""Perceptual-hash index for post images (near-duplicate detection).
+
+Her görsel için 64-bit dHash (9x8 gri tonlamalı küçültme, yatay komşu farkları)
+image_hashes tablosunda saklanır. Hash dört 16-bit banda bölünüp ayrı ayrı
+indekslenir: Hamming mesafesi <= 3 olan iki hash en az bir bandı paylaşır
+(güvercin yuvası), bu yüzden aday komşular tablo taraması yerine indeksten gelir;
+adaylar üzerinde gerçek mesafe Python'da hesaplanır.
+
+IMAGE_DEDUP_MAX_DISTANCE 3'ten büyükse bant garantisi kalmaz; o zaman hesabın
+tüm hash'leri taranır (hesap başına birkaç bin satır, yine ucuz).
+
+Provides:
+- dhash(source) -> int (bytes / PIL image / path)
+- hamming(a, b) -> int
+- to_signed(h) / to_unsigned(h) -> int (SQLite INTEGER kolonları için 64-bit dönüşüm)
+- find_near(db, account_id, h, max_distance=None, exclude_post_id=None, published_only=False) -> [(post_id, distance)]
+- record(db, post_id, h, kind="final") -> None (commit çağırana ait)
+- forget(db, post_id) -> None
+- ensure_hash(db, post) -> int | None (kaydı yoksa mevcut görselden hesaplar)
+- check(db, account_id, h, exclude_post_id=None, published_only=False) -> raises DuplicateImageError
+- DuplicateImageError
+"""
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Optional, Union
+
+from PIL import Image
+from sqlalchemy import or_
+
+from app.config import IMAGE_DEDUP_ENABLED, IMAGE_DEDUP_MAX_DISTANCE
+from app.models import ImageHash, Post, PostStatus
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+
+class DuplicateImageError(Exception):
+    """Görsel, aynı hesabın mevcut bir post'una çok yakın (near-duplicate)."""
+
+    def __init__(self, post_id: int, distance: int):
+        self.post_id = post_id
+        self.distance = distance
+        super().__init__(f"Near-duplicate of post {post_id} (hamming distance {distance})")
+
+
+def to_signed(h: int) -> int:
+    # SQLite INTEGER is signed 64-bit
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def to_unsigned(h: int) -> int:
+    return h + (1 << 64) if h < 0 else h
+
+
+def _bands(h: int) -> list[int]:
+    return [(h >> (i * _BAND_BITS)) & _BAND_MASK for i in range(_BANDS)]
+
+
+def dhash(source: Union[bytes, Image.Image, str, Path]) -> int:
+    """64-bit difference hash; numpy varsa vektörel, yoksa saf Python."""
+    if isinstance(source, Image.Image):
+        img = source
+    else:
+        img = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        # JPEG: decoder'da küçültme (tam çözünürlük decode gerekmez)
+        img.draft("L", (64, 64))
+    small = img.convert("L").resize((9, 8), Image.Resampling.BOX)
+    try:
+        import numpy as np
+
+        px = np.asarray(small, dtype=np.int16)
+        bits = np.packbits((px[:, 1:] > px[:, :-1]).reshape(-1))
+        return int.from_bytes(bits.tobytes(), "big")
+    except ImportError:
+        px = list(small.getdata())
+        h = 0
+        for row in range(8):
+            for col in range(8):
+                h = (h << 1) | (px[row * 9 + col + 1] > px[row * 9 + col])
+        return h
+
+
+def hamming(a: int, b: int) -> int:
+    return (to_unsigned(a) ^ to_unsigned(b)).bit_count()
+
+
+def find_near(
+    db,
+    account_id: Optional[int],
+    h: int,
+    max_distance: Optional[int] = None,
+    exclude_post_id: Optional[int] = None,
+    published_only: bool = False,
+) -> list[tuple[int, int]]:
+    """Aynı hesabın (account_id None ise hesapsız post'ların) yakın görselleri: [(post_id, mesafe)] artan sırada."""
+    max_distance = IMAGE_DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+    q = db.query(ImageHash.post_id, ImageHash.dhash).join(Post, Post.id == ImageHash.post_id)
+    q = q.filter(Post.account_id == account_id) if account_id is not None else q.filter(Post.account_id.is_(None))
+    if published_only:
+        q = q.filter(Post.status == PostStatus.PUBLISHED)
+    else:
+        q = q.filter(Post.status != PostStatus.FAILED)
+    if exclude_post_id is not None:
+        q = q.filter(ImageHash.post_id != exclude_post_id)
+    if max_distance < _BANDS:
+        bands = _bands(h)
+        q = q.filter(or_(*[getattr(ImageHash, f"band{i}") == bands[i] for i in range(_BANDS)]))
+    near = []
+    for post_id, other in q.all():
+        d = hamming(h, other)
+        if d <= max_distance:
+            near.append((post_id, d))
+    near.sort(key=lambda x: x[1])
+    return near
+
+
+def record(db, post_id: int, h: int, kind: str = "final") -> None:
+    """post_id için hash'i ekler/günceller (commit çağırana ait)."""
+    row = db.query(ImageHash).filter(ImageHash.post_id == post_id).first()
+    if row is None:
+        row = ImageHash(post_id=post_id)
+    row.dhash = to_signed(h)
+    for i, band in enumerate(_bands(h)):
+        setattr(row, f"band{i}", band)
+    row.kind = kind
+    db.add(row)
+
+
+def forget(db, post_id: int) -> None:
+    db.query(ImageHash).filter(ImageHash.post_id == post_id).delete(synchronize_session=False)
+
+
+def ensure_hash(db, post: Post) -> Optional[int]:
+    """Kayıtlı hash'i döner; yoksa post'un görselinden (image_path ya da image_url) hesaplayıp kaydeder."""
+    row = db.query(ImageHash).filter(ImageHash.post_id == post.id).first()
+    if row is not None:
+        return to_unsigned(row.dhash)
+    try:
+        local = BASE_DIR / post.image_path if post.image_path else None
+        if local is not None and local.exists():
+            h = dhash(local)
+        elif post.image_url:
+            from app.services.image_render import _fetch_source_image
+
+            h = dhash(_fetch_source_image(post.image_url, presign=True))
+        else:
+            return None
+    except Exception as e:
+        print(f"[DEDUP] Could not hash image for post {post.id}: {e}")
+        return None
+    record(db, post.id, h)
+    db.commit()
+    return h
+
+
+def check(
+    db,
+    account_id: Optional[int],
+    h: Optional[int],
+    exclude_post_id: Optional[int] = None,
+    published_only: bool = False,
+) -> None:
+    """IMAGE_DEDUP_ENABLED iken yakın bir görsel varsa DuplicateImageError fırlatır."""
+    if not IMAGE_DEDUP_ENABLED or h is None:
+        return
+    near = find_near(db, account_id, h, exclude_post_id=exclude_post_id, published_only=published_only)
+    if near:
+        raise DuplicateImageError(*near[0])
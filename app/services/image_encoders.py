@@ -0,0 +1,91 @@
+"""Named output encoder profiles for rendered media.
+
+Her profil: Pillow formatı + save() ayarları + dosya uzantısı + content type.
+Varsayılan profil deployment başına RENDER_ENCODER_PROFILE ile seçilir,
+render fonksiyonlarında `profile=` ile çağrı başına değiştirilebilir.
+
+Profiles:
+- archival_png: PNG optimize=True (eski davranış; en yavaş, kayıpsız)
+- fast_png: PNG compress_level=1 (kayıpsız, hızlı encode, daha büyük dosya)
+- ig_jpeg: sRGB JPEG, quality 90, 4:4:4 (metin kenarları bozulmaz; IG zaten JPEG'e çevirir)
+- webp_preview: WebP quality 80 (panel önizlemeleri için küçük dosya)
+"""
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from PIL import Image
+
+from app.config import RENDER_ENCODER_PROFILE
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    name: str
+    format: str
+    ext: str
+    content_type: str
+    options: dict = field(default_factory=dict)
+    embed_srgb: bool = False
+
+
+PROFILES: dict[str, EncoderProfile] = {
+    "archival_png": EncoderProfile("archival_png", "PNG", ".png", "image/png", {"optimize": True}),
+    "fast_png": EncoderProfile("fast_png", "PNG", ".png", "image/png", {"compress_level": 1}),
+    "ig_jpeg": EncoderProfile(
+        "ig_jpeg",
+        "JPEG",
+        ".jpg",
+        "image/jpeg",
+        {"quality": 90, "subsampling": 0, "progressive": False},
+        embed_srgb=True,
+    ),
+    "webp_preview": EncoderProfile("webp_preview", "WEBP", ".webp", "image/webp", {"quality": 80, "method": 4}),
+}
+
+
+def get_profile(profile: str | EncoderProfile | None = None) -> EncoderProfile:
+    """İsim (veya None -> deployment varsayılanı) için profil; bilinmeyen isimde ValueError."""
+    if isinstance(profile, EncoderProfile):
+        return profile
+    name = profile or RENDER_ENCODER_PROFILE or "archival_png"
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown encoder profile: {name} (choose from {', '.join(PROFILES)})")
+
+
+@lru_cache(maxsize=1)
+def _srgb_icc() -> bytes | None:
+    try:
+        from PIL import ImageCms
+
+        return ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    except Exception:
+        return None
+
+
+def encode(img: Image.Image, profile: str | EncoderProfile | None = None) -> tuple[bytes, EncoderProfile]:
+    """img'i profile göre encode eder -> (bytes, profil)."""
+    prof = get_profile(profile)
+    if prof.format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")
+    options = dict(prof.options)
+    if prof.embed_srgb:
+        icc = _srgb_icc()
+        if icc:
+            options["icc_profile"] = icc
+    buf = io.BytesIO()
+    img.save(buf, prof.format, **options)
+    return buf.getvalue(), prof
+
+
+def filename_for(filename: str | None, profile: str | EncoderProfile | None, stem: str) -> str:
+    """Dosya adını profil uzantısıyla döner (content type ile uzantı tutarlı kalsın)."""
+    prof = get_profile(profile)
+    base = filename or stem
+    if "." in base:
+        base = base.rsplit(".", 1)[0]
+    return base + prof.ext
@@ -5,13 +5,36 @@ Temalar: minimal_dark, pastel_soft, neon_city.
 Fontlar app/assets/fonts/ içinde TTF olarak kullanılır.
 """
 
+import hashlib
+import io
 import os
 import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
+from typing import Callable, Union
 from uuid import uuid4
 
+import PIL
 from PIL import Image, ImageDraw, ImageFont
 
+from app.config import (
+    FONT_CACHE_SIZE,
+    RENDER_PREVIEW_PROFILE,
+    RENDER_PREVIEW_WIDTH,
+    SOURCE_IMAGE_CACHE_SIZE,
+    SOURCE_IMAGE_CACHE_TTL,
+    STORY_BLUR_MODE,
+    STORY_BLUR_SCALE,
+)
+from app.services import image_encoders, layout_cache
+from app.services.image_encoders import EncoderProfile
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 APP_DIR = BASE_DIR / "app"
 FONTS_DIR = APP_DIR / "assets" / "fonts"
@@ -132,37 +155,106 @@ def _is_emoji_char(c: str) -> bool:
     return False
 
 
-def _split_line_runs(line: str) -> list[tuple[str, bool]]:
-    """Satırı (metin, emoji) parçalarına böler. Her öğe (substring, is_emoji)."""
+# _is_emoji_char aralıklarının derlenmiş hali (0x1F300-0x1F9FF ve 0x1FA00-0x1FA6F bitişik).
+# Karakter karakter Python döngüsü yerine tek regex taramasıyla sınıflandırma yapılır.
+_EMOJI_RUN_RE = re.compile("[\u2600-\u27BF\U0001F300-\U0001FA6F]+")
+
+
+def _has_emoji(s: str) -> bool:
+    """Metinde emoji karakteri var mı (any(_is_emoji_char(c) ...) ile aynı sonuç)."""
+    return _EMOJI_RUN_RE.search(s) is not None
+
+
+@lru_cache(maxsize=4096)
+def _split_line_runs(line: str) -> tuple[tuple[str, bool], ...]:
+    """
+    Satırı (metin, emoji) parçalarına böler. Her öğe (substring, is_emoji).
+    Sonuç satır metni başına saklanır: aynı satırlar her font boyutu denemesinde,
+    ölçümde ve çizimde tekrar sınıflandırılmaz.
+    """
     runs: list[tuple[str, bool]] = []
-    current = []
-    current_emoji: bool | None = None
-    for c in line:
-        em = _is_emoji_char(c)
-        if current_emoji is None:
-            current_emoji = em
-            current.append(c)
-        elif current_emoji == em:
-            current.append(c)
-        else:
-            runs.append(("".join(current), current_emoji))
-            current = [c]
-            current_emoji = em
-    if current:
-        runs.append(("".join(current), current_emoji))
-    return runs
+    pos = 0
+    for m in _EMOJI_RUN_RE.finditer(line):
+        if m.start() > pos:
+            runs.append((line[pos : m.start()], False))
+        runs.append((m.group(), True))
+        pos = m.end()
+    if pos < len(line):
+        runs.append((line[pos:], False))
+    return tuple(runs)
+
+
+# Process-wide font cache: (resolved font path, size) -> FreeTypeFont.
+# Layout loops ask for dozens of sizes per render; without this every call
+# re-globs the fonts dir and re-parses the TTF.
+_FONT_CACHE: "OrderedDict[tuple[str, int], ImageFont.FreeTypeFont]" = OrderedDict()
+_FONT_CACHE_LOCK = threading.Lock()
+_FONT_CACHE_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+# Resolved font paths per logical name ("main", "signature", "emoji"); None = not found.
+_FONT_PATHS: dict[str, str | None] = {}
+
+
+def _resolve_font_path(name: str) -> str | None:
+    """Font dosya yolunu bir kez çözer ve saklar (dizin taraması her çağrıda yapılmaz)."""
+    with _FONT_CACHE_LOCK:
+        if name in _FONT_PATHS:
+            return _FONT_PATHS[name]
+    if name == "emoji":
+        path = _get_emoji_font_path()
+    else:
+        path = _get_font_path(name) or _get_system_font_path()
+    resolved = str(path.resolve()) if path else None
+    with _FONT_CACHE_LOCK:
+        _FONT_PATHS[name] = resolved
+    return resolved
+
+
+def _cached_truetype(path: str, size: int) -> ImageFont.FreeTypeFont:
+    """ImageFont.truetype için LRU önbellek. Yükleme hatası yukarı fırlatılır."""
+    key = (path, int(size))
+    with _FONT_CACHE_LOCK:
+        font = _FONT_CACHE.get(key)
+        if font is not None:
+            _FONT_CACHE.move_to_end(key)
+            _FONT_CACHE_STATS["hits"] += 1
+            return font
+        _FONT_CACHE_STATS["misses"] += 1
+    font = ImageFont.truetype(path, int(size))
+    with _FONT_CACHE_LOCK:
+        _FONT_CACHE[key] = font
+        _FONT_CACHE.move_to_end(key)
+        while len(_FONT_CACHE) > max(1, FONT_CACHE_SIZE):
+            _FONT_CACHE.popitem(last=False)
+            _FONT_CACHE_STATS["evictions"] += 1
+    return font
+
+
+def font_cache_stats() -> dict:
+    """Font önbelleği sayaçları: hits, misses, evictions, size, max_size."""
+    with _FONT_CACHE_LOCK:
+        stats = dict(_FONT_CACHE_STATS)
+        stats["size"] = len(_FONT_CACHE)
+    stats["max_size"] = FONT_CACHE_SIZE
+    return stats
+
+
+def clear_font_cache() -> None:
+    """Font önbelleğini ve çözülmüş font yollarını temizler (yeni font eklendiğinde)."""
+    with _FONT_CACHE_LOCK:
+        _FONT_CACHE.clear()
+        _FONT_PATHS.clear()
+        for k in _FONT_CACHE_STATS:
+            _FONT_CACHE_STATS[k] = 0
 
 
 def _load_font(
     size: int, name: str = "main"
 ) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
     """Önce app/assets/fonts/, yoksa sistem fontu, son çare PIL default."""
-    path = _get_font_path(name)
-    if not path:
-        path = _get_system_font_path()
+    path = _resolve_font_path(name)
     if path:
         try:
-            return ImageFont.truetype(str(path), size)
+            return _cached_truetype(path, size)
         except Exception:
             pass
     return ImageFont.load_default()
@@ -170,19 +262,44 @@ def _load_font(
 
 def _load_emoji_font(size: int) -> ImageFont.FreeTypeFont | None:
     """Emoji fontu yükler (varsa). Segoe UI Emoji vb."""
-    path = _get_emoji_font_path()
+    path = _resolve_font_path("emoji")
     if path:
         try:
-            return ImageFont.truetype(str(path), size)
+            return _cached_truetype(path, size)
         except Exception:
             pass
     return None
 
 
-def _wrap_text(
+# Kelime genişliği önbelleği (font başına): kelime -> (advance, ink_x0, ink_x1).
+# Fontlar _FONT_CACHE'ten paylaşıldığı için aynı kelimeler her boyut denemesinde tekrar ölçülmez.
+_WORD_METRICS: "weakref.WeakKeyDictionary[object, dict[str, tuple[float, int, int]]]" = (
+    weakref.WeakKeyDictionary()
+)
+_WORD_METRICS_MAX_WORDS = 4096  # font başına üst sınır; aşılınca o fontun tablosu sıfırlanır
+_SPACE_KEY = " "
+
+
+def _word_metrics(font, word: str) -> tuple[float, int, int]:
+    """(advance, ink_x0, ink_x1): kelimenin ilerleme genişliği ve mürekkep sınırları (memo)."""
+    table = _WORD_METRICS.get(font)
+    if table is None:
+        table = {}
+        _WORD_METRICS[font] = table
+    m = table.get(word)
+    if m is None:
+        if len(table) >= _WORD_METRICS_MAX_WORDS:
+            table.clear()
+        bbox = font.getbbox(word)
+        m = (font.getlength(word), bbox[0], bbox[2])
+        table[word] = m
+    return m
+
+
+def _wrap_text_slow(
     text: str, font: ImageFont.FreeTypeFont | ImageFont.ImageFont, max_width: int
 ) -> list[str]:
-    """Uzun metni max_width piksel genişliğine göre satırlara böler."""
+    """Eski yöntem: her kelimede tüm satır önekini yeniden ölçer (getbbox/getlength yoksa)."""
     words = text.split()
     lines = []
     current = []
@@ -208,6 +325,54 @@ def _wrap_text(
     return lines
 
 
+def _wrap_text(
+    text: str, font: ImageFont.FreeTypeFont | ImageFont.ImageFont, max_width: int
+) -> list[str]:
+    """
+    Uzun metni max_width piksel genişliğine göre satırlara böler.
+
+    Her kelime ve boşluk fontta bir kez ölçülür (_word_metrics); satır genişliği
+    ilerleme değerleri toplanarak tahmin edilir. Tahmin sınıra tolerans kadar
+    yakınsa satırın tamamı getbbox ile ölçülür (kerning/yuvarlama düzeltmesi),
+    böylece satır kırılımları tam ölçümle aynı kalır.
+    """
+    if not hasattr(font, "getlength") or not hasattr(font, "getbbox"):
+        return _wrap_text_slow(text, font, max_width)
+    words = text.split()
+    lines = []
+    current: list[str] = []
+    space_adv = _word_metrics(font, _SPACE_KEY)[0]
+    tolerance = 1 + 0.05 * getattr(font, "size", 0)
+    pen = 0.0  # sonraki kelimenin başlayacağı x (satır başından)
+    first_x0 = 0
+    for word in words:
+        adv, x0, x1 = _word_metrics(font, word)
+        if not current:
+            current = [word]
+            pen = adv + space_adv
+            first_x0 = x0
+            continue
+        est = pen + x1 - first_x0
+        if est <= max_width - tolerance:
+            fits = True
+        elif est > max_width + tolerance:
+            fits = False
+        else:
+            bbox = font.getbbox(" ".join(current + [word]))
+            fits = bbox[2] - bbox[0] <= max_width
+        if fits:
+            current.append(word)
+            pen += adv + space_adv
+        else:
+            lines.append(" ".join(current))
+            current = [word]
+            pen = adv + space_adv
+            first_x0 = x0
+    if current:
+        lines.append(" ".join(current))
+    return lines
+
+
 def _measure_run(
     s: str, font: ImageFont.FreeTypeFont | ImageFont.ImageFont | None
 ) -> tuple[int, int]:
@@ -232,21 +397,15 @@ def _draw_text_centered(
     shadow_color: tuple[int, int, int] | None = None,
     emoji_font: ImageFont.FreeTypeFont | None = None,
     stroke_width: int = 2,
+    line_dims: list[tuple[int, int]] | None = None,
 ) -> None:
-    """Satırları dikey merkezde ortalanmış çizer. Emoji varsa emoji_font ile çizilir."""
-    line_heights = []
-    for line in lines:
-        if not emoji_font or not any(_is_emoji_char(c) for c in line):
-            _, h = _measure_run(line, font)
-            line_heights.append(h)
-        else:
-            runs = _split_line_runs(line)
-            h = 0
-            for run_text, is_emoji in runs:
-                f = emoji_font if is_emoji else font
-                _, rh = _measure_run(run_text, f)
-                h = max(h, rh)
-            line_heights.append(h)
+    """
+    Satırları dikey merkezde ortalanmış çizer. Emoji varsa emoji_font ile çizilir.
+    line_dims verilirse (TextLayout.line_dims) satırlar yeniden ölçülmez.
+    """
+    if line_dims is None:
+        line_dims = _measure_lines(lines, font, emoji_font)
+    line_heights = [h for _, h in line_dims]
     total_height = sum(line_heights) + (len(lines) - 1) * int(
         (line_heights[0] if line_heights else 0) * 0.2
     )
@@ -254,8 +413,8 @@ def _draw_text_centered(
     offset = 2 if shadow_color else 0
     for i, line in enumerate(lines):
         line_h = line_heights[i]
-        if not emoji_font or not any(_is_emoji_char(c) for c in line):
-            line_w, _ = _measure_run(line, font)
+        if not emoji_font or not _has_emoji(line):
+            line_w = line_dims[i][0]
             x = (img_width - line_w) // 2
             y = y_start
             if shadow_color and offset:
@@ -289,10 +448,7 @@ def _draw_text_centered(
                 draw.text((x, y), line, font=font, fill=color)
         else:
             runs = _split_line_runs(line)
-            total_w = sum(
-                _measure_run(run_text, emoji_font if is_emoji else font)[0]
-                for run_text, is_emoji in runs
-            )
+            total_w = line_dims[i][0]
             x = (img_width - total_w) // 2
             y = y_start
             for run_text, is_emoji in runs:
@@ -329,70 +485,125 @@ def _draw_text_centered(
         y_start += line_h + int(line_h * 0.2)
 
 
-def ensure_media_dir() -> Path:
-    """media/ klasörünü oluşturur."""
-    MEDIA_DIR.mkdir(parents=True, exist_ok=True)
-    return MEDIA_DIR
-
-
-def render_image(
-    background_path: str,
-    text: str,
-    signature: str,
-    style: str = "minimal_dark",
-    target: str = "square",
-    full_height: bool = True,
-) -> tuple[str, str]:
+def _measure_lines(
+    lines: list[str],
+    font: ImageFont.FreeTypeFont | ImageFont.ImageFont,
+    emoji_font: ImageFont.FreeTypeFont | None,
+) -> list[tuple[int, int]]:
+    """Her satır için (genişlik, yükseklik). Emoji içeren satırlar run run ölçülür."""
+    dims = []
+    for line in lines:
+        if emoji_font and _has_emoji(line):
+            line_w = 0
+            line_h = 0
+            for run_text, is_emoji in _split_line_runs(line):
+                w, h = _measure_run(run_text, emoji_font if is_emoji else font)
+                line_w += w
+                line_h = max(line_h, h)
+        else:
+            line_w, line_h = _measure_run(line, font)
+        dims.append((line_w, line_h))
+    return dims
+
+
+@dataclass
+class TextLayout:
+    """Bir font boyutu için satır kırma + ölçüm sonucu; çizim kodu bunu doğrudan kullanır."""
+
+    size: int
+    font: ImageFont.FreeTypeFont | ImageFont.ImageFont
+    emoji_font: ImageFont.FreeTypeFont | None
+    lines: list[str]
+    line_dims: list[tuple[int, int]]  # satır başına (genişlik, yükseklik)
+
+    @property
+    def max_w(self) -> int:
+        return max((w for w, _ in self.line_dims), default=0)
+
+    @property
+    def fit_h(self) -> int:
+        """Boyut seçiminde kullanılan yükseklik (satır aralığı son satırdan)."""
+        total = sum(h for _, h in self.line_dims)
+        spacing = int(self.line_dims[-1][1] * 0.12) if total else 0
+        return total + spacing * max(0, len(self.line_dims) - 1)
+
+    @property
+    def block_h(self) -> int:
+        """Metin kutusu yüksekliği (satır aralığı ilk satırdan)."""
+        if not self.line_dims:
+            return 0
+        spacing = int(self.line_dims[0][1] * 0.12)
+        return sum(h for _, h in self.line_dims) + spacing * (len(self.line_dims) - 1)
+
+    def head(self, n: int) -> "TextLayout":
+        """İlk n satırla sınırlı kopya (ölçümler yeniden yapılmaz)."""
+        if len(self.lines) <= n:
+            return self
+        return TextLayout(self.size, self.font, self.emoji_font, self.lines[:n], self.line_dims[:n])
+
+
+def _layout_text(text: str, size: int, max_width: int, single_line: bool = False) -> TextLayout:
+    """Metni verilen boyutta satırlara böler ve ölçer."""
+    font = _load_font(size, "main")
+    emoji_font = _load_emoji_font(size)
+    lines = [text] if single_line else _wrap_text(text, font, max_width)
+    return TextLayout(size, font, emoji_font, lines, _measure_lines(lines, font, emoji_font))
+
+
+def _largest_true(lo: int, hi: int, pred: Callable[[int], bool]) -> int | None:
     """
-    1080x1080 arka plan üzerine ortalanmış metin + altta imza basar.
+    [lo, hi] aralığında pred'in True olduğu en büyük değer (yoksa None).
+    pred monoton kabul edilir: küçük boyutlarda True, büyüklerde False.
+    Yukarıdan aşağı doğrusal taramayla aynı sonucu O(log n) ölçümle verir.
+    """
+    if hi < lo:
+        return None
+    if pred(hi):
+        return hi
+    if not pred(lo):
+        return None
+    # invariant: pred(lo) True, pred(hi) False
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if pred(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
 
-    Args:
-        background_path: Arka plan görsel dosya yolu (mutlak veya proje köküne göre).
-        text: Ana metin (otomatik satır kırılır).
-        signature: En altta küçük imza metni.
-        style: minimal_dark | pastel_soft | neon_city
 
-    Returns:
-        (relative_path, absolute_path)
-        - relative_path: "media/{uuid}.png"
-        - absolute_path: Tam dosya yolu (okuma/yükleme için).
+def _grow_while_true(start: int, pred: Callable[[int], bool], upper: int) -> int:
     """
-    theme = THEMES.get(style, THEMES["minimal_dark"])
-    path = Path(background_path)
-    if not path.is_absolute():
-        path = BASE_DIR / path
-    if not path.exists():
-        raise FileNotFoundError(f"Background image not found: {path}")
-
-    img = Image.open(path).convert("RGBA")
-    # choose canvas size based on target (enforce exact sizes)
-    if target == "story":
-        width, height = 1080, 1920
-    else:
-        width, height = 1080, 1080
-    # For stories, avoid cropping important parts by fitting the image inside the canvas
-    # (scale down to fit and paste centered) instead of resizing to cover which may crop edges.
-    if target == "story":
-        # compute scale to fit inside canvas
-        img_w, img_h = img.width, img.height
-        scale = min(width / img_w, height / img_h)
-        new_w = max(1, int(img_w * scale))
-        new_h = max(1, int(img_h * scale))
-        img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-        paste_x = (width - new_w) // 2
-        paste_y = (height - new_h) // 2
-        canvas.paste(img_resized, (paste_x, paste_y))
-        img = canvas
-    else:
-        img = img.resize((width, height), Image.Resampling.LANCZOS)
+    start+1, start+2, ... pred True kaldıkça büyütülen boyut (galloping + binary search).
+    upper güvenlik sınırıdır; pred monoton kabul edilir.
+    """
+    ok = start
+    step = 1
+    while ok + step <= upper and pred(ok + step):
+        ok += step
+        step *= 2
+    bad = min(ok + step, upper + 1)
+    while bad - ok > 1:
+        mid = (ok + bad) // 2
+        if pred(mid):
+            ok = mid
+        else:
+            bad = mid
+    return ok
 
-    overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
 
-    # Görselde etiket (#hashtag) olmasın; sadece ana metin
-    text_only = _strip_hashtags_from_text((text or "").strip() or " ")
+def _fit_text_layout(
+    text_only: str, target: str, full_height: bool, width: int, height: int
+) -> tuple[TextLayout, int]:
+    """
+    render_image için font boyutu seçimi.
 
+    Returns:
+        (layout, draw_size)
+        - layout: çizilecek satırlar ve ölçümleri (seçilen boyutta)
+        - draw_size: çizimde kullanılacak font boyutu; güvenli alan küçültmesi
+          yapıldıysa layout.size'dan küçüktür (satırlar aynı kalır)
+    """
     # Dynamically choose main font size so that all text fits within the allowed box.
     min_size = 10  # minimum readable size
     # Set defaults that respect requested story/post rules:
@@ -420,212 +631,91 @@ def render_image(
         bottom_margin = int(height * 0.08)
         max_text_height = height - (top_margin + bottom_margin)
         single_line_mode = False
+        desired_text_height = None  # post: no grow step
 
-    chosen_size = preferred_size
-    chosen_font = _load_font(chosen_size, "main")
-    emoji_font = _load_emoji_font(chosen_size)
+    # Her font boyutu için satır kırma + ölçüm bir kez yapılır; arama adımları bunu paylaşır.
+    layouts: dict[int, TextLayout] = {}
 
-    def text_block_dimensions(font, emoji_f):
-        # If single_line_mode requested, treat the whole text as one line (no wrapping)
-        if single_line_mode:
-            lines_local = [text_only]
-        else:
-            lines_local = _wrap_text(text_only, font, max_text_width)
+    def layout_at(size: int) -> TextLayout:
+        lay = layouts.get(size)
+        if lay is None:
+            lay = _layout_text(text_only, size, max_text_width, single_line=single_line_mode)
+            layouts[size] = lay
+        return lay
+
+    def sizing_layout(size: int) -> TextLayout:
         # allow more lines but cap to a reasonable maximum to avoid excessive overflow
-        if len(lines_local) > max(20, MAX_TEXT_LINES):
-            lines_local = lines_local[: max(20, MAX_TEXT_LINES)]
-        total_h_local = 0
-        max_w_local = 0
-        for line in lines_local:
-            if emoji_f and any(_is_emoji_char(c) for c in line):
-                runs = _split_line_runs(line)
-                line_w = 0
-                line_h = 0
-                for run_text, is_emoji in runs:
-                    f = emoji_f if is_emoji else font
-                    w, h = _measure_run(run_text, f)
-                    line_w += w
-                    line_h = max(line_h, h)
-            else:
-                line_w, line_h = _measure_run(line, font)
-            max_w_local = max(max_w_local, line_w)
-            total_h_local += line_h
-        # line spacing (reduced)
-        spacing_local = (
-            int((line_h if "line_h" in locals() else preferred_size) * 0.12)
-            if total_h_local
-            else 0
-        )
-        total_h_local += spacing_local * (
-            len(lines_local) - 1 if len(lines_local) > 1 else 0
-        )
-        return max_w_local, total_h_local, lines_local
-
-    # Select font size.
+        return layout_at(size).head(max(20, MAX_TEXT_LINES))
+
+    def fits(size: int) -> bool:
+        lay = sizing_layout(size)
+        return lay.max_w <= max_text_width and lay.fit_h <= max_text_height
+
+    # Select font size (monotone search: larger size -> wider/taller block).
+    chosen_size = preferred_size
+    layout: TextLayout | None = None
     if full_height:
         # Try different target line counts to find the combination that fills
         # the height best while respecting width. Prefer fewer, larger lines.
         best_score = -1
-        best_choice = None
         max_lines_try = max(1, min(MAX_TEXT_LINES, 12))
         for target_lines in range(1, max_lines_try + 1):
-            # try font sizes from preferred down to min to find largest that produces <= target_lines
-            for size in range(preferred_size, min_size - 1, -1):
-                f = _load_font(size, "main")
-                ef = _load_emoji_font(size)
-                # wrap text with this font and measure lines
-                lines_try = _wrap_text(text_only, f, max_text_width)
-                if len(lines_try) > target_lines:
-                    continue
-                # measure total height for these lines
-                _, total_h_local, lines_measured = text_block_dimensions(f, ef)
-                if total_h_local <= max_text_height:
-                    # score by how much of desired_text_height we fill (closer is better)
-                    score = total_h_local
-                    if score > best_score:
-                        best_score = score
-                        best_choice = {
-                            "size": size,
-                            "font": f,
-                            "ef": ef,
-                            "lines": lines_measured,
-                        }
-                    # since we iterate sizes descending, break to try fewer lines (bigger sizes first)
-                    break
-        if best_choice:
-            chosen_size = best_choice["size"]
-            chosen_font = best_choice["font"]
-            emoji_font = best_choice["ef"]
-            lines = best_choice["lines"]
-        else:
+            # largest size that produces <= target_lines and fits the height
+            size = _largest_true(
+                min_size,
+                preferred_size,
+                lambda s, n=target_lines: len(sizing_layout(s).lines) <= n
+                and sizing_layout(s).fit_h <= max_text_height,
+            )
+            if size is None:
+                continue
+            lay = sizing_layout(size)
+            # score by how much of the height we fill; earlier (fewer lines) wins ties
+            if lay.fit_h > best_score:
+                best_score = lay.fit_h
+                chosen_size = size
+                layout = lay
+        if layout is None:
             # fallback: reduce until something fits
-            for size in range(preferred_size, min_size - 1, -1):
-                f = _load_font(size, "main")
-                ef = _load_emoji_font(size)
-                max_w_local, total_h_local, lines_try = text_block_dimensions(f, ef)
-                if max_w_local <= max_text_width and total_h_local <= max_text_height:
-                    chosen_size = size
-                    chosen_font = f
-                    emoji_font = ef
-                    lines = lines_try
-                    break
-    else:
-        # Try decreasing sizes until it fits within allowed height and width.
-        # Start from preferred_size.
-        for size in range(preferred_size, min_size - 1, -1):
-            f = _load_font(size, "main")
-            ef = _load_emoji_font(size)
-            max_w_local, total_h_local, lines_try = text_block_dimensions(f, ef)
-            if max_w_local <= max_text_width and total_h_local <= max_text_height:
+            size = _largest_true(min_size, preferred_size, fits)
+            if size is not None:
                 chosen_size = size
-                chosen_font = f
-                emoji_font = ef
-                lines = lines_try
-                break
+                layout = sizing_layout(size)
+    else:
+        # Largest size (<= preferred_size) that fits within allowed height and width.
+        size = _largest_true(min_size, preferred_size, fits)
+        if size is not None:
+            chosen_size = size
+            layout = sizing_layout(size)
     # Ensure fallback if nothing set
-    if "lines" not in locals() or not lines:
-        chosen_font = _load_font(min_size, "main")
-        emoji_font = _load_emoji_font(min_size)
-        lines = _wrap_text(text_only, chosen_font, max_text_width)[:MAX_TEXT_LINES]
+    if layout is None or not layout.lines:
+        layout = layout_at(min_size).head(MAX_TEXT_LINES)
 
-    # If full_height requested, try increasing font size (grow) while it still fits width
-    if full_height:
+    # If full_height requested (story), grow the font while it still fits width and
+    # stays under the desired height.
+    if full_height and desired_text_height is not None and layout.lines:
         try:
-            size = chosen_size
-            while True:
-                nxt = size + 1
-                f = _load_font(nxt, "main")
-                ef = _load_emoji_font(nxt)
-                max_w_local, total_h_local, lines_try = text_block_dimensions(f, ef)
-                if max_w_local <= max_text_width and total_h_local <= max_text_height and total_h_local < desired_text_height:
-                    size = nxt
-                    chosen_size = size
-                    chosen_font = f
-                    emoji_font = ef
-                    lines = lines_try
-                    # continue trying to grow
-                    continue
-                break
+            grown = _grow_while_true(
+                chosen_size,
+                lambda s: fits(s) and sizing_layout(s).fit_h < desired_text_height,
+                max_text_height,
+            )
+            if grown != chosen_size:
+                chosen_size = grown
+                layout = sizing_layout(grown)
         except Exception:
             pass
 
-    # Load signature font; for story target use a slightly smaller signature to avoid bottom UI overlap
-    sig_size = theme.get("signature_font_size", 28)
-    if target == "story":
-        sig_size = max(12, int(sig_size * 0.75))
-    sig_font = _load_font(sig_size, "signature")
-    if sig_font == chosen_font or getattr(sig_font, "getsize", None) is None:
-        sig_font = _load_font(sig_size, "main")
-
-    # lines and chosen_font determined above by dynamic sizing
-
-    # Compute text center relative to safe area so text is always inside safe area
-    if target == "story":
-        # center of safe area
-        SAFE_TOP = 250
-        SAFE_BOTTOM = height - 350
-        safe_center_y = SAFE_TOP + (SAFE_BOTTOM - SAFE_TOP) // 2
-        text_center_y = int(safe_center_y)
-    else:
-        text_center_y = height // 2 - int(height * 0.055)
-
-    # Compute bounding box for the text block to draw a translucent overlay behind it for legibility
-    line_dims = []
-    max_w = 0
-    total_h = 0
-    for line in lines:
-        if emoji_font and any(_is_emoji_char(c) for c in line):
-            runs = _split_line_runs(line)
-            line_w = 0
-            line_h = 0
-            for run_text, is_emoji in runs:
-                f = emoji_font if is_emoji else chosen_font
-                w, h = _measure_run(run_text, f)
-                line_w += w
-                line_h = max(line_h, h)
-        else:
-            line_w, line_h = _measure_run(line, chosen_font)
-        line_dims.append((line_w, line_h))
-        max_w = max(max_w, line_w)
-        total_h += line_h
-    # line spacing (reduced)
-    spacing = int((line_dims[0][1] if line_dims else 40) * 0.12) if line_dims else 4
-    total_h += spacing * (len(line_dims) - 1 if len(line_dims) > 1 else 0)
+    # Bounding box for the text block comes straight from the chosen layout (no re-measuring)
+    draw_size = layout.size
+    max_w = layout.max_w
+    total_h = layout.block_h
 
     padding_x = max(12, int(width * 0.01))
     # For story target, use slightly larger vertical padding so text doesn't touch UI edges
     padding_y = max(12, int(height * 0.02)) if target == "story" else max(10, int(height * 0.005))
     box_w = max_w + padding_x * 2
     box_h = total_h + padding_y * 2
-    box_x0 = (width - box_w) // 2
-    box_y0 = text_center_y - (box_h // 2)
-    box_x1 = box_x0 + box_w
-    box_y1 = box_y0 + box_h
-
-    # Ensure the text box fits within the safe area for story
-    if target == "story":
-        SAFE_LEFT = 80
-        SAFE_RIGHT = width - 80
-        SAFE_TOP = 250
-        SAFE_BOTTOM = height - 350
-        # clamp horizontally
-        if box_x0 < SAFE_LEFT:
-            shift = SAFE_LEFT - box_x0
-            box_x0 += shift
-            box_x1 += shift
-        if box_x1 > SAFE_RIGHT:
-            shift = box_x1 - SAFE_RIGHT
-            box_x0 -= shift
-            box_x1 -= shift
-        # clamp vertically
-        if box_y0 < SAFE_TOP:
-            shift = SAFE_TOP - box_y0
-            box_y0 += shift
-            box_y1 += shift
-        if box_y1 > SAFE_BOTTOM:
-            shift = box_y1 - SAFE_BOTTOM
-            box_y0 -= shift
-            box_y1 -= shift
 
     # MOBILE SAFE AREA: ensure the text box fits within a central safe area
     # Increase safe area for stories to avoid mobile UI overlays (status bar, gestures)
@@ -642,38 +732,370 @@ def render_image(
 
     # If box exceeds safe bounds, reduce font size further until it fits (aggressive).
     # For story target we DO perform aggressive shrinking even in full_height mode to avoid mobile overflow.
+    # Stepped linearly: wrapped block width is not monotone in font size, so this
+    # step cannot be bisected. Only the font shrinks; the fitted lines are kept.
     if not full_height or target == "story":
         while (box_w > safe_width or box_h > safe_height) and chosen_size > min_size:
             chosen_size -= 1
-            chosen_font = _load_font(chosen_size, "main")
-            emoji_font = _load_emoji_font(chosen_size)
-            # recompute lines and dims
-            max_w = 0
-            total_h = 0
-            line_dims = []
-            for line in _wrap_text(text_only, chosen_font, max_text_width):
-                if emoji_font and any(_is_emoji_char(c) for c in line):
-                    runs = _split_line_runs(line)
-                    line_w = 0
-                    line_h = 0
-                    for run_text, is_emoji in runs:
-                        f = emoji_font if is_emoji else chosen_font
-                        w, h = _measure_run(run_text, f)
-                        line_w += w
-                        line_h = max(line_h, h)
-                else:
-                    line_w, line_h = _measure_run(line, chosen_font)
-                line_dims.append((line_w, line_h))
-                max_w = max(max_w, line_w)
-                total_h += line_h
-            spacing = int((line_dims[0][1] if line_dims else 40) * 0.12) if line_dims else 4
-            total_h += spacing * (len(line_dims) - 1 if len(line_dims) > 1 else 0)
-            box_w = max_w + padding_x * 2
-            box_h = total_h + padding_y * 2
-            box_x0 = (width - box_w) // 2
-            box_y0 = text_center_y - (box_h // 2)
-            box_x1 = box_x0 + box_w
-            box_y1 = box_y0 + box_h
+            draw_size = chosen_size
+            lay = layout_at(chosen_size)
+            box_w = lay.max_w + padding_x * 2
+            box_h = lay.block_h + padding_y * 2
+
+    return layout, draw_size
+
+
+
+def _font_fingerprint() -> str:
+    """Ana + emoji font dosyalarının içerik özeti (layout önbellek anahtarı için)."""
+    parts = [f"pillow={PIL.__version__}"]
+    for name in ("main", "emoji"):
+        path = _resolve_font_path(name)
+        parts.append(f"{name}={_file_digest(path) if path else '-'}")
+    return ";".join(parts)
+
+
+_FILE_DIGESTS: dict[tuple[str, int, int], str] = {}
+
+
+def _file_digest(path: str) -> str:
+    """Dosya sha1 özeti; (yol, boyut, mtime) değişmedikçe yeniden okunmaz."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    key = (path, st.st_size, int(st.st_mtime))
+    digest = _FILE_DIGESTS.get(key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        if len(_FILE_DIGESTS) >= 1024:  # fonts + preview backgrounds; keep it bounded
+            _FILE_DIGESTS.clear()
+        _FILE_DIGESTS[key] = digest
+    return digest
+
+
+def _text_layout_for(
+    text_only: str, style: str, target: str, full_height: bool, width: int, height: int
+) -> tuple[TextLayout, int]:
+    """_fit_text_layout sonucunu layout_cache üzerinden döner (hit ise ölçüm yapılmaz)."""
+    key = layout_cache.make_key(text_only, style, target, full_height, _font_fingerprint())
+    hit = layout_cache.get(key)
+    if hit is not None:
+        try:
+            size = int(hit["size"])
+            layout = TextLayout(
+                size,
+                _load_font(size, "main"),
+                _load_emoji_font(size),
+                list(hit["lines"]),
+                [(int(w), int(h)) for w, h in hit["line_dims"]],
+            )
+            return layout, int(hit["draw_size"])
+        except (KeyError, TypeError, ValueError):
+            pass
+    layout, draw_size = _fit_text_layout(text_only, target, full_height, width, height)
+    layout_cache.put(
+        key,
+        {
+            "size": layout.size,
+            "draw_size": draw_size,
+            "lines": layout.lines,
+            "line_dims": [list(d) for d in layout.line_dims],
+            "max_w": layout.max_w,
+            "block_h": layout.block_h,
+        },
+    )
+    return layout, draw_size
+
+
+# Static overlay sprites (signature today; logos/watermarks later): key -> (RGBA sprite, origin offset)
+_SPRITE_CACHE: "OrderedDict[tuple, tuple[Image.Image, tuple[int, int]]]" = OrderedDict()
+_SPRITE_CACHE_LOCK = threading.Lock()
+_SPRITE_CACHE_MAX = 64
+
+
+def cached_sprite(key: tuple, build: Callable[[], tuple[Image.Image, tuple[int, int]]]) -> tuple[Image.Image, tuple[int, int]]:
+    """
+    Sabit overlay katmanları için sprite cache'i.
+
+    build() -> (RGBA sprite, (ox, oy)); sprite, hedefte (x - ox, y - oy) noktasına
+    alpha_composite edilir. key katmanı tam belirlemeli (metin/dosya, renkler, font, boyut);
+    ilk elemanı katman türü olsun ("signature", "logo", "watermark", ...).
+    Dönen sprite paylaşılır, değiştirmeyin.
+    """
+    with _SPRITE_CACHE_LOCK:
+        hit = _SPRITE_CACHE.get(key)
+        if hit is not None:
+            _SPRITE_CACHE.move_to_end(key)
+            return hit
+    built = build()
+    with _SPRITE_CACHE_LOCK:
+        _SPRITE_CACHE[key] = built
+        while len(_SPRITE_CACHE) > _SPRITE_CACHE_MAX:
+            _SPRITE_CACHE.popitem(last=False)
+    return built
+
+
+def _font_key(font) -> tuple:
+    return (getattr(font, "path", None) or id(font), getattr(font, "size", None))
+
+
+def _text_sprite(text: str, font, fill, shadow=None) -> tuple[Image.Image, tuple[int, int]]:
+    """Metin (+1px gölge) sprite'ı; draw.text((x, y)) ile aynı pikselleri (x - ox, y - oy)'de verir."""
+
+    def build() -> tuple[Image.Image, tuple[int, int]]:
+        x0, y0, x1, y1 = font.getbbox(text)
+        ox, oy = max(0, -x0), max(0, -y0)
+        sprite = Image.new("RGBA", (ox + x1 + 2, oy + y1 + 2), (0, 0, 0, 0))
+        d = ImageDraw.Draw(sprite)
+        if shadow:
+            d.text((ox + 1, oy + 1), text, font=font, fill=shadow)
+        d.text((ox, oy), text, font=font, fill=fill)
+        return sprite, (ox, oy)
+
+    return cached_sprite(("signature", text, tuple(fill), tuple(shadow) if shadow else None, _font_key(font)), build)
+
+
+def ensure_media_dir() -> Path:
+    """media/ klasörünü oluşturur."""
+    MEDIA_DIR.mkdir(parents=True, exist_ok=True)
+    return MEDIA_DIR
+
+
+# Background source accepted by the in-memory API: encoded bytes, a PIL image or a file path
+ImageSource = Union[bytes, bytearray, memoryview, Image.Image, str, Path]
+
+
+@dataclass
+class RenderResult:
+    """Encoded render output kept in memory (upload directly from .data)."""
+
+    data: bytes
+    width: int
+    height: int
+    filename: str
+    format: str = "PNG"
+    content_type: str = "image/png"
+    rel_path: str | None = None  # set when persisted to media/
+    abs_path: str | None = None
+    persisted: Future | None = None  # pending async write (persist=True)
+    timings_ms: dict = field(default_factory=dict)  # stage -> milliseconds
+
+
+def _open_image(source: ImageSource) -> Image.Image:
+    """bytes / PIL image / dosya yolu -> RGBA Image (disk sadece yol verilirse okunur)."""
+    if isinstance(source, Image.Image):
+        return source.convert("RGBA")
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source)).convert("RGBA")
+    return Image.open(_background_path(source)).convert("RGBA")
+
+
+def _background_path(source: str | Path) -> Path:
+    """Arka plan yolunu çözer (mutlak veya proje köküne göre); yoksa FileNotFoundError."""
+    path = Path(source)
+    if not path.is_absolute():
+        path = BASE_DIR / path
+    if not path.exists():
+        raise FileNotFoundError(f"Background image not found: {path}")
+    return path
+
+
+def save_media(data: bytes, filename: str) -> str:
+    """Encode edilmiş görseli media/ altına yazar, mutlak yolu döner."""
+    ensure_media_dir()
+    abs_path = MEDIA_DIR / filename
+    abs_path.write_bytes(data)
+    return str(abs_path)
+
+
+_PERSIST_LOCK = threading.Lock()
+_PERSIST_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def save_media_async(data: bytes, filename: str) -> Future:
+    """save_media'yı arka plan thread'inde çalıştırır; çağıran upload'a hemen devam edebilir."""
+    global _PERSIST_EXECUTOR
+    with _PERSIST_LOCK:
+        if _PERSIST_EXECUTOR is None:
+            _PERSIST_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-persist")
+    fut = _PERSIST_EXECUTOR.submit(save_media, data, filename)
+
+    def _log_failure(f: Future) -> None:
+        exc = f.exception()
+        if exc is not None:
+            print(f"[WARN][RENDER] async save of media/{filename} failed: {exc}")
+
+    fut.add_done_callback(_log_failure)
+    return fut
+
+
+def _media_result(
+    img: Image.Image,
+    filename: str | None,
+    persist: bool,
+    profile: str | EncoderProfile | None = None,
+) -> RenderResult:
+    """img'i seçilen encoder profiliyle encode eder; uzantı/content type profile uyar."""
+    data, prof = image_encoders.encode(img, profile)
+    filename = image_encoders.filename_for(filename, prof, str(uuid4()))
+    result = RenderResult(
+        data=data,
+        width=img.width,
+        height=img.height,
+        filename=filename,
+        format=prof.format,
+        content_type=prof.content_type,
+    )
+    if persist:
+        result.rel_path = f"media/{filename}"
+        result.abs_path = str(MEDIA_DIR / filename)
+        result.persisted = save_media_async(data, filename)
+    return result
+
+
+def render_image_bytes(
+    background: ImageSource,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    full_height: bool = True,
+    persist: bool = False,
+    filename: str | None = None,
+    profile: str | EncoderProfile | None = None,
+) -> RenderResult:
+    """
+    render_image'in bellek içi hali: arka plan bytes / PIL image (veya yol) alır,
+    encode edilmiş bytes + metadata döner. Ara dosya yazılmaz.
+
+    profile: encoder profili (archival_png | fast_png | ig_jpeg | webp_preview);
+    None ise RENDER_ENCODER_PROFILE.
+
+    persist=True ise çıktı media/{filename} altına arka planda yazılır
+    (rel_path/abs_path dolu, result.persisted.result() ile beklenebilir).
+    """
+    t0 = time.perf_counter()
+    src = _open_image(background)
+    t1 = time.perf_counter()
+    canvas = _prepare_canvas(src, target)
+    t2 = time.perf_counter()
+    stages: dict = {}
+    out = _draw_on_canvas(canvas, text, signature, style, target, full_height, timings=stages)
+    t3 = time.perf_counter()
+    result = _media_result(out, filename, persist, profile)
+    result.timings_ms = {
+        "decode": (t1 - t0) * 1000,
+        "resize": (t2 - t1) * 1000,
+        **stages,
+        "encode": (time.perf_counter() - t3) * 1000,
+    }
+    return result
+
+
+def _canvas_size(target: str) -> tuple[int, int]:
+    # choose canvas size based on target (enforce exact sizes)
+    if target == "story":
+        return 1080, 1920
+    return 1080, 1080
+
+
+def _prepare_canvas(img: Image.Image, target: str) -> Image.Image:
+    """Decode edilmiş arka planı hedef tuvale oturtur (story: fit + ortala, square: resize)."""
+    width, height = _canvas_size(target)
+    # For stories, avoid cropping important parts by fitting the image inside the canvas
+    # (scale down to fit and paste centered) instead of resizing to cover which may crop edges.
+    if target == "story":
+        # compute scale to fit inside canvas
+        img_w, img_h = img.width, img.height
+        scale = min(width / img_w, height / img_h)
+        new_w = max(1, int(img_w * scale))
+        new_h = max(1, int(img_h * scale))
+        img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
+        paste_x = (width - new_w) // 2
+        paste_y = (height - new_h) // 2
+        canvas.paste(img_resized, (paste_x, paste_y))
+        return canvas
+    return img.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _draw_on_canvas(
+    img: Image.Image,
+    text: str,
+    signature: str,
+    style: str,
+    target: str,
+    full_height: bool,
+    timings: dict | None = None,
+) -> Image.Image:
+    """
+    Metin + imzayı hazır tuvale basar, yeni RGB görsel döner (img değişmez; batch'te paylaşılır).
+    timings verilirse layout / draw / composite süreleri (ms) yazılır.
+    """
+    overlay = _text_overlay(img.size, text, signature, style, target, full_height, timings)
+    t_draw = time.perf_counter()
+    out = Image.alpha_composite(img, overlay).convert("RGB")
+    if timings is not None:
+        timings["composite"] = (time.perf_counter() - t_draw) * 1000
+    return out
+
+
+def _text_overlay(
+    size: tuple[int, int],
+    text: str,
+    signature: str,
+    style: str,
+    target: str,
+    full_height: bool,
+    timings: dict | None = None,
+) -> Image.Image:
+    """Metin + imza katmanı (şeffaf RGBA, tuval boyutunda); timings'e layout / draw yazılır."""
+    t_start = time.perf_counter()
+    theme = THEMES.get(style, THEMES["minimal_dark"])
+    width, height = size
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+
+    # Görselde etiket (#hashtag) olmasın; sadece ana metin
+    text_only = _strip_hashtags_from_text((text or "").strip() or " ")
+
+    # Dynamically choose main font size so that all text fits within the allowed box
+    # (cached per text/style/target/fonts; a repeated render only rasterizes).
+    layout, draw_size = _text_layout_for(text_only, style, target, full_height, width, height)
+    lines = layout.lines
+    if draw_size == layout.size:
+        chosen_font = layout.font
+        emoji_font = layout.emoji_font
+        draw_line_dims: list[tuple[int, int]] | None = layout.line_dims
+    else:
+        # safe-area shrink: smaller font, same lines -> drawing measures again
+        chosen_font = _load_font(draw_size, "main")
+        emoji_font = _load_emoji_font(draw_size)
+        draw_line_dims = None
+    t_layout = time.perf_counter()
+
+    # Load signature font; for story target use a slightly smaller signature to avoid bottom UI overlap
+    sig_size = theme.get("signature_font_size", 28)
+    if target == "story":
+        sig_size = max(12, int(sig_size * 0.75))
+    sig_font = _load_font(sig_size, "signature")
+    if sig_font == chosen_font or getattr(sig_font, "getsize", None) is None:
+        sig_font = _load_font(sig_size, "main")
+
+    # Compute text center relative to safe area so text is always inside safe area
+    if target == "story":
+        # center of safe area
+        SAFE_TOP = 250
+        SAFE_BOTTOM = height - 350
+        safe_center_y = SAFE_TOP + (SAFE_BOTTOM - SAFE_TOP) // 2
+        text_center_y = int(safe_center_y)
+    else:
+        text_center_y = height // 2 - int(height * 0.055)
 
     # Draw overlay rectangle on overlay layer for improved contrast
     # If full_height mode requested, use fully opaque black overlay and force white bold text
@@ -704,6 +1126,7 @@ def render_image(
         theme.get("shadow_color"),
         emoji_font=emoji_font,
         stroke_width=stroke_w_local,
+        line_dims=draw_line_dims,
     )
 
     # İmza: sadece altta "ince düşlerim" (veya body'den gelen)
@@ -720,36 +1143,210 @@ def render_image(
         sig_y = height - int(height * 0.08) - sig_h
     else:
         sig_y = height - int(height * 0.05) - sig_h
-    # draw signature with local signature color override if present
+    # signature (shadow + fill) comes from the sprite cache; colors carry theme + full_height
     try:
         shadow_col = theme.get("shadow_color")
         sig_col = signature_color_local if "signature_color_local" in locals() else theme["signature_color"]
-        if shadow_col:
-            draw.text((sig_x + 1, sig_y + 1), sig_text, font=sig_font, fill=shadow_col)
-        draw.text((sig_x, sig_y), sig_text, font=sig_font, fill=sig_col)
+        sprite, (ox, oy) = _text_sprite(sig_text, sig_font, sig_col, shadow_col)
+        overlay.alpha_composite(sprite, (sig_x - ox, sig_y - oy))
     except Exception:
         draw.text((sig_x, sig_y), sig_text, font=sig_font, fill=theme.get("signature_color", (200, 200, 200)))
 
-    out = Image.alpha_composite(img, overlay).convert("RGB")
-    ensure_media_dir()
-    filename = f"{uuid4()}.png"
-    rel_path = f"media/{filename}"
-    abs_path = MEDIA_DIR / filename
-    out.save(abs_path, "PNG", optimize=True)
-    return rel_path, str(abs_path)
+    if timings is not None:
+        timings["layout"] = (t_layout - t_start) * 1000
+        timings["draw"] = (time.perf_counter() - t_layout) * 1000
+    return overlay
+
+
+def render_image(
+    background_path: str,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    full_height: bool = True,
+    profile: str | EncoderProfile | None = None,
+) -> tuple[str, str]:
+    """
+    1080x1080 arka plan üzerine ortalanmış metin + altta imza basar.
+
+    Args:
+        background_path: Arka plan görsel dosya yolu (mutlak veya proje köküne göre).
+        text: Ana metin (otomatik satır kırılır).
+        signature: En altta küçük imza metni.
+        style: minimal_dark | pastel_soft | neon_city
+        profile: encoder profili (None -> RENDER_ENCODER_PROFILE)
 
+    Returns:
+        (relative_path, absolute_path)
+        - relative_path: "media/{uuid}.png" (uzantı profile göre .jpg/.webp olabilir)
+        - absolute_path: Tam dosya yolu (okuma/yükleme için).
 
-def render_story_image(text: str, output_filename: str | None = None, style: str = "minimal_dark") -> str:
+    Dosya yolu gereken çağıranlar için; bytes yeterliyse render_image_bytes kullanın.
+    """
+    result = render_image_bytes(background_path, text, signature, style, target, full_height, profile=profile)
+    abs_path = save_media(result.data, result.filename)
+    return f"media/{result.filename}", abs_path
+
+
+def preview_etag(
+    background_path: str,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    width: int | None = None,
+    profile: str | None = None,
+) -> str:
+    """
+    Önizleme için strong ETag: (metin, imza, stil, hedef, genişlik, profil, arka plan özeti,
+    font özeti). Render yapmadan hesaplanır; arka plan özeti (yol, boyut, mtime) başına bir kez okunur.
+    """
+    prof = image_encoders.get_profile(profile or RENDER_PREVIEW_PROFILE)
+    parts = [
+        text or "",
+        signature or "",
+        style or "",
+        target or "",
+        str(width or RENDER_PREVIEW_WIDTH),
+        prof.name,
+        _file_digest(str(_background_path(background_path))),
+        _font_fingerprint(),
+    ]
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:40]}"'
+
+
+def render_preview_bytes(
+    background: ImageSource,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    width: int | None = None,
+    profile: str | None = None,
+) -> RenderResult:
+    """
+    Dashboard önizlemesi: tam boy layout ile render edip `width` piksel genişliğe küçültür
+    (varsayılan RENDER_PREVIEW_WIDTH, profil RENDER_PREVIEW_PROFILE). media/'ya yazılmaz.
+    """
+    t0 = time.perf_counter()
+    canvas = _prepare_canvas(_open_image(background), target)
+    stages: dict = {}
+    out = _draw_on_canvas(canvas, text, signature, style, target, True, timings=stages)
+    width = max(1, min(int(width or RENDER_PREVIEW_WIDTH), out.width))
+    if width < out.width:
+        factor = out.width // width
+        if factor > 1 and out.width % width == 0 and out.height % factor == 0:
+            out = out.reduce(factor)
+        else:
+            out = out.resize((width, max(1, round(out.height * width / out.width))), Image.Resampling.BILINEAR)
+    t1 = time.perf_counter()
+    result = _media_result(out, None, False, profile or RENDER_PREVIEW_PROFILE)
+    result.timings_ms = {**stages, "render": (t1 - t0) * 1000, "encode": (time.perf_counter() - t1) * 1000}
+    return result
+
+
+def render_hash_image(
+    background: ImageSource,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    width: int = 72,
+) -> Image.Image:
+    """
+    Perceptual hash (dHash 9x8) için küçük render: arka plan doğrudan `width` genişliğe küçültülür,
+    metin katmanı tam boy layout ile çizilip aynı boya indirilir ve ikisi küçük boyda birleştirilir.
+    Tam boy arka plan resize + composite + encode yapılmaz; sonuç final görselle aynı hash'i verir
+    (mesafe 0-1), piksel olarak birebir değildir.
+    """
+    full_w, full_h = _canvas_size(target)
+    w, h = width, max(1, round(full_h * width / full_w))
+    img = _open_image(background)
+    if target == "story":
+        scale = min(w / img.width, h / img.height)
+        fitted = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.Resampling.BOX)
+        canvas = Image.new("RGBA", (w, h), (0, 0, 0, 255))
+        canvas.paste(fitted, ((w - fitted.width) // 2, (h - fitted.height) // 2))
+    else:
+        canvas = img.resize((w, h), Image.Resampling.BOX)
+    overlay = _text_overlay((full_w, full_h), text, signature, style, target, True)
+    return Image.alpha_composite(canvas, overlay.resize((w, h), Image.Resampling.BOX)).convert("RGB")
+
+
+@dataclass
+class RenderVariant:
+    """Batch render'da tek varyant (caption x tema x hedef)."""
+
+    text: str
+    signature: str = "ince düşlerim"
+    style: str = "minimal_dark"
+    target: str = "square"
+    full_height: bool = True
+
+
+@dataclass
+class BatchRenderResult:
+    variants: list[RenderResult]
+    decode_ms: float
+    prepare_ms: dict[str, float]  # target -> resize süresi (hedef başına bir kez)
+
+
+def render_batch(
+    background: ImageSource,
+    variants: list[RenderVariant | dict],
+    persist: bool = False,
+    profile: str | EncoderProfile | None = None,
+) -> BatchRenderResult:
+    """
+    Tek arka plan üzerinde birden çok varyant render eder (A/B: caption, tema, square/story).
+
+    Arka plan bir kez decode edilir, hedef tuval (square/story) başına bir kez
+    resize edilir; her varyant sadece metin çizimi + encode maliyeti öder.
+    Sonuçlar varyant sırasıyla döner, her birinin timings_ms'i layout/draw/composite/encode/total içerir.
+    """
+    t0 = time.perf_counter()
+    src = _open_image(background)
+    decode_ms = (time.perf_counter() - t0) * 1000
+
+    canvases: dict[str, Image.Image] = {}
+    prepare_ms: dict[str, float] = {}
+    results: list[RenderResult] = []
+    for v in variants:
+        if isinstance(v, dict):
+            v = RenderVariant(**v)
+        target = "story" if v.target == "story" else "square"
+        if target not in canvases:
+            t = time.perf_counter()
+            canvases[target] = _prepare_canvas(src, target)
+            prepare_ms[target] = (time.perf_counter() - t) * 1000
+        t1 = time.perf_counter()
+        stages: dict = {}
+        out = _draw_on_canvas(canvases[target], v.text, v.signature, v.style, target, v.full_height, timings=stages)
+        t2 = time.perf_counter()
+        result = _media_result(out, None, persist, profile)
+        result.timings_ms = {**stages, "encode": (time.perf_counter() - t2) * 1000}
+        result.timings_ms["total"] = (time.perf_counter() - t1) * 1000
+        results.append(result)
+    return BatchRenderResult(variants=results, decode_ms=decode_ms, prepare_ms=prepare_ms)
+
+
+def render_story_image(
+    text: str,
+    output_filename: str | None = None,
+    style: str = "minimal_dark",
+    profile: str | EncoderProfile | None = None,
+) -> str:
     """
     Generate an AI background, render `text` centered inside the story safe area,
-    save and upload to remote storage under ig/story and return public URL.
+    encode with the given encoder profile and upload to remote storage under ig/story
+    and return public URL.
 
     Returns public URL string on success, raises on failure.
     """
     from app.services import content_ai
     from app.services import storage_backend
-    import tempfile
-    import os
 
     # Ensure exact story canvas
     width, height = 1080, 1920
@@ -784,458 +1381,463 @@ def render_story_image(text: str, output_filename: str | None = None, style: str
         except Exception as e2:
             raise RuntimeError(f"Failed to obtain background image: {e} / {e2}") from e2
 
-    # Write bg_bytes to temp file and open
-    tmp_bg = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    try:
-        tmp_bg.write(bg_bytes)
-        tmp_bg.flush()
-        tmp_bg_path = tmp_bg.name
-    finally:
-        tmp_bg.close()
+    # Decode background straight from memory (no temp file)
+    img = _open_image(bg_bytes)
+    # Fit background to story canvas: prefer fitting by width so left/right are never cropped.
+    # We choose width-scaling when it keeps height within canvas; otherwise scale by height.
+    img_w, img_h = img.width, img.height
+    scale_w = width / img_w
+    scale_h = height / img_h
+    # Prefer scaling to width if it doesn't overflow vertically; otherwise scale to height.
+    if img_h * scale_w <= height:
+        scale = scale_w
+    else:
+        scale = scale_h
+    new_w = max(1, int(img_w * scale))
+    new_h = max(1, int(img_h * scale))
+    img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    # center image on canvas (no cropping), allowing vertical margins if any
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
+    paste_x = (width - new_w) // 2
+    paste_y = (height - new_h) // 2
+    canvas.paste(img_resized, (paste_x, paste_y))
+
+    # Prepare drawing layers
+    overlay = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
 
-    try:
-        img = Image.open(tmp_bg_path).convert("RGBA")
-        # Fit background to story canvas: prefer fitting by width so left/right are never cropped.
-        # We choose width-scaling when it keeps height within canvas; otherwise scale by height.
-        img_w, img_h = img.width, img.height
-        scale_w = width / img_w
-        scale_h = height / img_h
-        # Prefer scaling to width if it doesn't overflow vertically; otherwise scale to height.
-        if img_h * scale_w <= height:
-            scale = scale_w
-        else:
-            scale = scale_h
-        new_w = max(1, int(img_w * scale))
-        new_h = max(1, int(img_h * scale))
-        img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        # center image on canvas (no cropping), allowing vertical margins if any
-        canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-        paste_x = (width - new_w) // 2
-        paste_y = (height - new_h) // 2
-        canvas.paste(img_resized, (paste_x, paste_y))
+    # Clean text
+    text_only = _strip_hashtags_from_text((text or "").strip() or " ")
 
-        # Prepare drawing layers
-        overlay = Image.new("RGBA", canvas.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-
-        # Clean text
-        text_only = _strip_hashtags_from_text((text or "").strip() or " ")
-
-        # Helper to try fit text at a font size
-        def fit_text_at_size(font_size):
-            f = _load_font(font_size, "main")
-            ef = _load_emoji_font(font_size)
-            lines = _wrap_text(text_only, f, CONTENT_MAX_WIDTH)
-            # compute total height
-            heights = []
-            for ln in lines:
-                if ef and any(_is_emoji_char(c) for c in ln):
-                    runs = _split_line_runs(ln)
-                    h = 0
-                    for rt, is_e in runs:
-                        h = max(h, _measure_run(rt, ef if is_e else f)[1])
-                    heights.append(h)
-                else:
-                    heights.append(_measure_run(ln, f)[1])
-            spacing = int(font_size * 0.12) if heights else 0
-            total_h = sum(heights) + spacing * (len(heights) - 1 if len(heights) > 1 else 0)
-            return lines, total_h, f, ef
-
-        # Try decreasing font until fits within safe area (account for box padding)
-        chosen_font_size = FONT_MAX
-        chosen_lines = []
-        chosen_font = None
-        chosen_ef = None
-        max_box_height = SAFE_HEIGHT - BOX_PADDING * 2
-        for fs in range(FONT_MAX, FONT_MIN - 1, -2):
-            lines, total_h, f, ef = fit_text_at_size(fs)
-            if total_h <= max_box_height and len(lines) > 0 and max(_measure_run(ln, f)[0] for ln in lines) <= CONTENT_MAX_WIDTH:
-                chosen_font_size = fs
-                chosen_lines = lines
-                chosen_font = f
-                chosen_ef = ef
-                break
-
-        # If still not fitted, use min font and then truncate words until fits
-        truncated = False
-        if not chosen_lines:
-            fs = FONT_MIN
-            lines, total_h, f, ef = fit_text_at_size(fs)
-            # If total_h too large or some line too wide, truncate text words
-            if total_h <= max_box_height and max(_measure_run(ln, f)[0] for ln in lines) <= CONTENT_MAX_WIDTH:
-                chosen_font_size = fs
-                chosen_lines = lines
-                chosen_font = f
-                chosen_ef = ef
+    # Helper to try fit text at a font size
+    def fit_text_at_size(font_size):
+        f = _load_font(font_size, "main")
+        ef = _load_emoji_font(font_size)
+        lines = _wrap_text(text_only, f, CONTENT_MAX_WIDTH)
+        # compute total height
+        heights = []
+        for ln in lines:
+            if ef and _has_emoji(ln):
+                runs = _split_line_runs(ln)
+                h = 0
+                for rt, is_e in runs:
+                    h = max(h, _measure_run(rt, ef if is_e else f)[1])
+                heights.append(h)
             else:
-                words = text_only.split()
-                if not words:
-                    chosen_font_size = fs
-                    chosen_lines = [text_only]
-                    chosen_font = f
-                    chosen_ef = ef
-                else:
-                    # progressively shorten
-                    for n in range(len(words), 0, -1):
-                        candidate = " ".join(words[:n]) + ("…" if n < len(words) else "")
-                        # measure
-                        tmp_lines = _wrap_text(candidate, f, CONTENT_MAX_WIDTH)
-                        heights = []
-                        for ln in tmp_lines:
-                            if ef and any(_is_emoji_char(c) for c in ln):
-                                runs = _split_line_runs(ln)
-                                h = 0
-                                for rt, is_e in runs:
-                                    h = max(h, _measure_run(rt, ef if is_e else f)[1])
-                                heights.append(h)
-                            else:
-                                heights.append(_measure_run(ln, f)[1])
-                        spacing = int(fs * 0.12) if heights else 0
-                        tot_h = sum(heights) + spacing * (len(heights) - 1 if len(heights) > 1 else 0)
-                        if tot_h <= max_box_height and max(_measure_run(ln, f)[0] for ln in tmp_lines) <= CONTENT_MAX_WIDTH:
-                            chosen_font_size = fs
-                            chosen_lines = tmp_lines
-                            chosen_font = f
-                            chosen_ef = ef
-                            truncated = (n < len(words))
-                            break
-        # If still nothing, fallback to single-line truncate
-        if not chosen_lines:
-            fs = FONT_MIN
-            f = _load_font(fs, "main")
-            ef = _load_emoji_font(fs)
-            # truncate to fit width with ellipsis
-            s = text_only
-            while s and _measure_run(s + "…", f)[0] > CONTENT_MAX_WIDTH:
-                s = s[:-1]
-            chosen_lines = [s + "…"]
+                heights.append(_measure_run(ln, f)[1])
+        spacing = int(font_size * 0.12) if heights else 0
+        total_h = sum(heights) + spacing * (len(heights) - 1 if len(heights) > 1 else 0)
+        return lines, total_h, f, ef
+
+    # Try decreasing font until fits within safe area (account for box padding)
+    chosen_font_size = FONT_MAX
+    chosen_lines = []
+    chosen_font = None
+    chosen_ef = None
+    max_box_height = SAFE_HEIGHT - BOX_PADDING * 2
+    for fs in range(FONT_MAX, FONT_MIN - 1, -2):
+        lines, total_h, f, ef = fit_text_at_size(fs)
+        if total_h <= max_box_height and len(lines) > 0 and max(_measure_run(ln, f)[0] for ln in lines) <= CONTENT_MAX_WIDTH:
+            chosen_font_size = fs
+            chosen_lines = lines
             chosen_font = f
             chosen_ef = ef
-            truncated = True
-
-        # Compute box dimensions
-        line_heights = [(_measure_run(ln, chosen_ef if (chosen_ef and any(_is_emoji_char(c) for c in ln)) else chosen_font)[1]) for ln in chosen_lines]
-        spacing = int(chosen_font_size * 0.12) if line_heights else 0
-        total_h = sum(line_heights) + spacing * (len(line_heights) - 1 if len(line_heights) > 1 else 0)
-        box_w = min(BOX_MAX_WIDTH, SAFE_WIDTH)
-        box_h = total_h + BOX_PADDING * 2
-        box_x0 = SAFE_LEFT + (SAFE_WIDTH - box_w) // 2
-        box_y0 = SAFE_TOP + (SAFE_HEIGHT - box_h) // 2
-        box_x1 = box_x0 + box_w
-        box_y1 = box_y0 + box_h
-
-        # Removed rounded rectangle background box per user request:
-        # keep text_layer (transparent background) pasted over the image so only text is visible.
-
-        # Draw text centered inside box onto a clipped text layer to avoid overflow
-        text_layer_w = CONTENT_MAX_WIDTH
-        max_box_inner_h = box_h - BOX_PADDING * 2
-        text_layer_h = max_box_inner_h
-        text_layer = Image.new("RGBA", (text_layer_w, text_layer_h), (0, 0, 0, 0))
-        tdraw = ImageDraw.Draw(text_layer)
-        ty = 0
-        for ln in chosen_lines:
-            # measure with chosen_font / chosen_ef
-            if chosen_ef and any(_is_emoji_char(c) for c in ln):
-                # draw runs centered within text_layer_w
-                runs = _split_line_runs(ln)
-                total_w = sum(_measure_run(rt, chosen_ef if is_e else chosen_font)[0] for rt, is_e in runs)
-                tx = (text_layer_w - total_w) // 2
-                for rt, is_e in runs:
-                    f2 = chosen_ef if is_e else chosen_font
-                    tdraw.text((tx, ty), rt, font=f2, fill=(255, 255, 255))
-                    w, h = _measure_run(rt, f2)
-                    tx += w
-                # advance by line height using chosen_font metrics
-                lh = _measure_run(ln, chosen_font)[1]
-                ty += lh + spacing
+            break
+
+    # If still not fitted, use min font and then truncate words until fits
+    truncated = False
+    if not chosen_lines:
+        fs = FONT_MIN
+        lines, total_h, f, ef = fit_text_at_size(fs)
+        # If total_h too large or some line too wide, truncate text words
+        if total_h <= max_box_height and max(_measure_run(ln, f)[0] for ln in lines) <= CONTENT_MAX_WIDTH:
+            chosen_font_size = fs
+            chosen_lines = lines
+            chosen_font = f
+            chosen_ef = ef
+        else:
+            words = text_only.split()
+            if not words:
+                chosen_font_size = fs
+                chosen_lines = [text_only]
+                chosen_font = f
+                chosen_ef = ef
             else:
-                line_w, line_h = _measure_run(ln, chosen_font)
-                tx = (text_layer_w - line_w) // 2
-                tdraw.text((tx, ty), ln, font=chosen_font, fill=(255, 255, 255))
-                ty += line_h + spacing
+                # progressively shorten
+                for n in range(len(words), 0, -1):
+                    candidate = " ".join(words[:n]) + ("…" if n < len(words) else "")
+                    # measure
+                    tmp_lines = _wrap_text(candidate, f, CONTENT_MAX_WIDTH)
+                    heights = []
+                    for ln in tmp_lines:
+                        if ef and _has_emoji(ln):
+                            runs = _split_line_runs(ln)
+                            h = 0
+                            for rt, is_e in runs:
+                                h = max(h, _measure_run(rt, ef if is_e else f)[1])
+                            heights.append(h)
+                        else:
+                            heights.append(_measure_run(ln, f)[1])
+                    spacing = int(fs * 0.12) if heights else 0
+                    tot_h = sum(heights) + spacing * (len(heights) - 1 if len(heights) > 1 else 0)
+                    if tot_h <= max_box_height and max(_measure_run(ln, f)[0] for ln in tmp_lines) <= CONTENT_MAX_WIDTH:
+                        chosen_font_size = fs
+                        chosen_lines = tmp_lines
+                        chosen_font = f
+                        chosen_ef = ef
+                        truncated = (n < len(words))
+                        break
+    # If still nothing, fallback to single-line truncate
+    if not chosen_lines:
+        fs = FONT_MIN
+        f = _load_font(fs, "main")
+        ef = _load_emoji_font(fs)
+        # truncate to fit width with ellipsis
+        s = text_only
+        while s and _measure_run(s + "…", f)[0] > CONTENT_MAX_WIDTH:
+            s = s[:-1]
+        chosen_lines = [s + "…"]
+        chosen_font = f
+        chosen_ef = ef
+        truncated = True
+
+    # Compute box dimensions
+    line_heights = [(_measure_run(ln, chosen_ef if (chosen_ef and _has_emoji(ln)) else chosen_font)[1]) for ln in chosen_lines]
+    spacing = int(chosen_font_size * 0.12) if line_heights else 0
+    total_h = sum(line_heights) + spacing * (len(line_heights) - 1 if len(line_heights) > 1 else 0)
+    box_w = min(BOX_MAX_WIDTH, SAFE_WIDTH)
+    box_h = total_h + BOX_PADDING * 2
+    box_x0 = SAFE_LEFT + (SAFE_WIDTH - box_w) // 2
+    box_y0 = SAFE_TOP + (SAFE_HEIGHT - box_h) // 2
+    box_x1 = box_x0 + box_w
+    box_y1 = box_y0 + box_h
 
-        # Paste the clipped text layer into overlay at box position (respecting padding)
-        overlay.paste(text_layer, (box_x0 + BOX_PADDING, box_y0 + BOX_PADDING), text_layer)
+    # Removed rounded rectangle background box per user request:
+    # keep text_layer (transparent background) pasted over the image so only text is visible.
+
+    # Draw text centered inside box onto a clipped text layer to avoid overflow
+    text_layer_w = CONTENT_MAX_WIDTH
+    max_box_inner_h = box_h - BOX_PADDING * 2
+    text_layer_h = max_box_inner_h
+    text_layer = Image.new("RGBA", (text_layer_w, text_layer_h), (0, 0, 0, 0))
+    tdraw = ImageDraw.Draw(text_layer)
+    ty = 0
+    for ln in chosen_lines:
+        # measure with chosen_font / chosen_ef
+        if chosen_ef and _has_emoji(ln):
+            # draw runs centered within text_layer_w
+            runs = _split_line_runs(ln)
+            total_w = sum(_measure_run(rt, chosen_ef if is_e else chosen_font)[0] for rt, is_e in runs)
+            tx = (text_layer_w - total_w) // 2
+            for rt, is_e in runs:
+                f2 = chosen_ef if is_e else chosen_font
+                tdraw.text((tx, ty), rt, font=f2, fill=(255, 255, 255))
+                w, h = _measure_run(rt, f2)
+                tx += w
+            # advance by line height using chosen_font metrics
+            lh = _measure_run(ln, chosen_font)[1]
+            ty += lh + spacing
+        else:
+            line_w, line_h = _measure_run(ln, chosen_font)
+            tx = (text_layer_w - line_w) // 2
+            tdraw.text((tx, ty), ln, font=chosen_font, fill=(255, 255, 255))
+            ty += line_h + spacing
 
-        out = Image.alpha_composite(canvas, overlay).convert("RGB")
+    # Paste the clipped text layer into overlay at box position (respecting padding)
+    overlay.paste(text_layer, (box_x0 + BOX_PADDING, box_y0 + BOX_PADDING), text_layer)
 
-        # Save and upload
-        out_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-        try:
-            out.save(out_tmp.name, "PNG", optimize=True)
-            out_tmp.flush()
-            final_path = out_tmp.name
-        finally:
-            out_tmp.close()
+    out = Image.alpha_composite(canvas, overlay).convert("RGB")
 
-        with open(final_path, "rb") as f:
-            final_bytes = f.read()
-        filename = output_filename or f"{uuid4()}.png"
-        public_url = storage_backend.upload_to_remote_server(final_bytes, filename, prefix="ig/story")
+    # Encode in memory and upload
+    result = _media_result(out, output_filename, False, profile)
+    return storage_backend.upload_to_remote_server(
+        result.data, result.filename, prefix="ig/story", content_type=result.content_type
+    )
 
-        try:
-            os.remove(tmp_bg_path)
-        except Exception:
-            pass
-        try:
-            os.remove(final_path)
-        except Exception:
-            pass
 
-        return public_url
-    except Exception as e:
-        try:
-            os.remove(tmp_bg_path)
-        except Exception:
-            pass
-        raise
+_SOURCE_CACHE: "OrderedDict[str, tuple[str | None, float, Image.Image]]" = OrderedDict()
+_SOURCE_CACHE_LOCK = threading.Lock()
+_SOURCE_CACHE_STATS = {"hits": 0, "revalidated": 0, "misses": 0}
 
 
-def make_story_from_post(image_path_or_url: str, output_filename: str | None = None, bg_mode: str = "blur", solid_color: str = "#111") -> str:
-    """
-    Create a 1080x1920 story image from a post image (1:1). The post image is NOT cropped and is centered.
+def _source_cache_get(key: str) -> tuple[str | None, float, Image.Image] | None:
+    with _SOURCE_CACHE_LOCK:
+        entry = _SOURCE_CACHE.get(key)
+        if entry is not None:
+            _SOURCE_CACHE.move_to_end(key)
+        return entry
 
-    bg_mode: "blur" (use enlarged blurred background from post) or "solid" (use solid color).
-    solid_color: hex string for solid background.
 
-    Returns public URL after uploading to storage (prefix: ig/story).
-    """
-    import tempfile
-    import requests
-    from app.services import storage_backend
-    import os
-    from PIL import ImageFilter
+def _source_cache_put(key: str, validator: str | None, img: Image.Image) -> None:
+    with _SOURCE_CACHE_LOCK:
+        _SOURCE_CACHE[key] = (validator, time.time(), img)
+        _SOURCE_CACHE.move_to_end(key)
+        while len(_SOURCE_CACHE) > max(0, SOURCE_IMAGE_CACHE_SIZE):
+            _SOURCE_CACHE.popitem(last=False)
 
-    width, height = 1080, 1920
 
-    # Load source image (local path or URL)
-    tmp_src = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    try:
-        if str(image_path_or_url).startswith("http"):
-            # If the URL is an R2 URL that requires presigning, try to generate a presigned GET first.
-            try:
-                from app.services import r2_storage
-
-                presigned = r2_storage.generate_presigned_get_from_url(image_path_or_url, expires=60)
-            except Exception:
-                presigned = None
-            # try presigned first, then original
-            tried_urls = []
-            download_url = presigned or image_path_or_url
-            tried_urls.append(download_url)
-            r = None
-            try:
-                r = requests.get(download_url, timeout=30)
-                r.raise_for_status()
-            except Exception:
-                # try original if different
-                if presigned and image_path_or_url not in tried_urls:
-                    try:
-                        r = requests.get(image_path_or_url, timeout=30)
-                        r.raise_for_status()
-                    except Exception as e:
-                        raise
-                else:
-                    raise
-            tmp_src.write(r.content)
-            tmp_src.flush()
-            src_path = tmp_src.name
-        else:
-            # assume local path
-            src_path = str(Path(image_path_or_url))
-        tmp_src.close()
+def source_cache_stats() -> dict:
+    with _SOURCE_CACHE_LOCK:
+        return {**_SOURCE_CACHE_STATS, "size": len(_SOURCE_CACHE), "max_size": SOURCE_IMAGE_CACHE_SIZE}
 
-        src = Image.open(src_path).convert("RGBA")
-        src_w, src_h = src.width, src.height
 
-        # Create background
-        if bg_mode == "solid":
-            # parse solid_color
-            try:
-                col = tuple(int(s, 16) for s in (solid_color.lstrip("#")[0:2], solid_color.lstrip("#")[2:4], solid_color.lstrip("#")[4:6]))
-            except Exception:
-                col = (17, 17, 17)
-            bg = Image.new("RGBA", (width, height), col + (255,))
-        else:
-            # blur mode: create cover background from source (may crop here), then blur
-            scale = max(width / src_w, height / src_h)
-            new_w = max(1, int(src_w * scale))
-            new_h = max(1, int(src_h * scale))
-            bg_tmp = src.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            left = (new_w - width) // 2
-            top = (new_h - height) // 2
-            bg = bg_tmp.crop((left, top, left + width, top + height)).convert("RGBA")
-            # apply strong blur
-            try:
-                bg = bg.filter(ImageFilter.GaussianBlur(radius=25))
-            except Exception:
-                pass
+def _fetch_source_image(image_path_or_url: str, presign: bool = False) -> Image.Image:
+    """
+    Post görselini decode edilmiş RGBA olarak döner (paylaşılan nesne: değiştirmeyin).
 
-        # Prepare final canvas and paste background
-        canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-        # If bg smaller (unlikely), center it
-        canvas.paste(bg, (0, 0))
-
-        # Prepare foreground post image: scale down/up to fit within 1080x1080 without cropping
-        max_fg = 1080
-        fg_scale = min(max_fg / src_w, max_fg / src_h)
-        fg_w = max(1, int(src_w * fg_scale))
-        fg_h = max(1, int(src_h * fg_scale))
-        fg = src.resize((fg_w, fg_h), Image.Resampling.LANCZOS)
-
-        # Paste fg centered
-        paste_x = (width - fg_w) // 2
-        paste_y = (height - fg_h) // 2
-        canvas.paste(fg, (paste_x, paste_y), fg)
-
-        # Save to temp and upload
-        out_tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+    Küçük bir LRU cache kullanır (SOURCE_IMAGE_CACHE_SIZE):
+    - yerel dosya: anahtar yol, doğrulayıcı mtime + boyut
+    - URL: anahtar URL (presigned değil, orijinal); ETag/Last-Modified varsa koşullu GET
+      (304 -> cache), yoksa SOURCE_IMAGE_CACHE_TTL saniye boyunca doğrudan cache
+    presign=True ise R2 URL'leri için önce presigned GET denenir.
+    """
+    import requests
+
+    key = str(image_path_or_url)
+    cached = _source_cache_get(key)
+    if not key.startswith("http"):
+        # assume local path
+        path = Path(image_path_or_url)
+        st = path.stat()
+        validator = f"{st.st_mtime_ns}:{st.st_size}"
+        if cached is not None and cached[0] == validator:
+            _SOURCE_CACHE_STATS["hits"] += 1
+            return cached[2]
+        _SOURCE_CACHE_STATS["misses"] += 1
+        img = Image.open(str(path)).convert("RGBA")
+        _source_cache_put(key, validator, img)
+        return img
+
+    headers = {}
+    if cached is not None:
+        validator, stored_at, img = cached
+        if validator is None and time.time() - stored_at <= SOURCE_IMAGE_CACHE_TTL:
+            _SOURCE_CACHE_STATS["hits"] += 1
+            return img
+        if validator and validator.startswith("etag:"):
+            headers["If-None-Match"] = validator[5:]
+        elif validator and validator.startswith("lm:"):
+            headers["If-Modified-Since"] = validator[3:]
+
+    presigned = None
+    if presign:
+        # If the URL is an R2 URL that requires presigning, try to generate a presigned GET first.
         try:
-            canvas.convert("RGB").save(out_tmp.name, "PNG", optimize=True)
-            out_tmp.flush()
-            final_path = out_tmp.name
-        finally:
-            out_tmp.close()
+            from app.services import r2_storage
+
+            presigned = r2_storage.generate_presigned_get_from_url(image_path_or_url, expires=60)
+        except Exception:
+            presigned = None
+    download_url = presigned or image_path_or_url
+    try:
+        r = requests.get(download_url, timeout=30, headers=headers)
+        r.raise_for_status()
+    except Exception:
+        # try original if different
+        if not presigned:
+            raise
+        r = requests.get(image_path_or_url, timeout=30, headers=headers)
+        r.raise_for_status()
+    if r.status_code == 304 and cached is not None:
+        _SOURCE_CACHE_STATS["revalidated"] += 1
+        _source_cache_put(key, cached[0], cached[2])
+        return cached[2]
+    _SOURCE_CACHE_STATS["misses"] += 1
+    img = _open_image(r.content)
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    validator = f"etag:{etag}" if etag else (f"lm:{last_modified}" if last_modified else None)
+    _source_cache_put(key, validator, img)
+    return img
+
+
+def _box_blur_numpy(img: Image.Image, radius: float) -> Image.Image:
+    """3 geçişli box blur (Gauss yaklaşımı); numpy kümülatif toplam ile, kenarlar tekrar edilir."""
+    import numpy as np
+
+    # box width for 3 passes with the same variance as a Gaussian of sigma=radius
+    w = max(1, int(round((12 * radius * radius / 3 + 1) ** 0.5)))
+    r = w // 2
+    arr = np.asarray(img, dtype=np.float32)
+    for _ in range(3):
+        for axis in (0, 1):
+            pad = [(0, 0)] * arr.ndim
+            pad[axis] = (r + 1, r)
+            c = np.cumsum(np.pad(arr, pad, mode="edge"), axis=axis, dtype=np.float32)
+            n = arr.shape[axis]
+            hi = np.take(c, np.arange(2 * r + 1, 2 * r + 1 + n), axis=axis)
+            lo = np.take(c, np.arange(0, n), axis=axis)
+            arr = (hi - lo) / (2 * r + 1)
+    return Image.fromarray(np.clip(arr + 0.5, 0, 255).astype(np.uint8), img.mode)
+
+
+def _blurred_cover(src: Image.Image, width: int, height: int, radius: float = 25, mode: str | None = None) -> Image.Image:
+    """
+    Story arka planı: kaynağı width x height'ı kaplayacak şekilde ölçekle, ortadan kırp, bulanıklaştır.
 
-        with open(final_path, "rb") as f:
-            final_bytes = f.read()
-        filename = output_filename or f"{uuid4()}.png"
-        public_url = storage_backend.upload_to_remote_server(final_bytes, filename, prefix="ig/story")
+    mode (None -> STORY_BLUR_MODE):
+    - quality: tam çözünürlükte LANCZOS + GaussianBlur (eski davranış, en yavaş)
+    - fast: 1/STORY_BLUR_SCALE çözünürlükte blur (yarıçap da ölçeklenir), sonra büyüt
+    - numpy: fast ile aynı, blur numpy box-blur yaklaşımıyla (numpy yoksa fast)
+    """
+    from PIL import ImageFilter
 
+    mode = (mode or STORY_BLUR_MODE or "quality").lower()
+    src_w, src_h = src.width, src.height
+    if mode not in ("fast", "numpy"):
+        scale = max(width / src_w, height / src_h)
+        new_w = max(1, int(src_w * scale))
+        new_h = max(1, int(src_h * scale))
+        bg_tmp = src.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        left = max(0, (new_w - width) // 2)
+        top = max(0, (new_h - height) // 2)
+        bg = bg_tmp.crop((left, top, left + width, top + height)).convert("RGBA")
+        # apply strong blur
         try:
-            os.remove(tmp_src.name)
+            bg = bg.filter(ImageFilter.GaussianBlur(radius=radius))
         except Exception:
             pass
+        return bg
+
+    factor = max(1, STORY_BLUR_SCALE)
+    small_w = max(1, -(-width // factor))
+    small_h = max(1, -(-height // factor))
+    scale = max(small_w / src_w, small_h / src_h)
+    new_w = max(small_w, int(src_w * scale))
+    new_h = max(small_h, int(src_h * scale))
+    # area-average downscale: cheap and already a low-pass before the blur
+    small = src.convert("RGBA").resize((new_w, new_h), Image.Resampling.BOX)
+    left = (new_w - small_w) // 2
+    top = (new_h - small_h) // 2
+    small = small.crop((left, top, left + small_w, top + small_h))
+    small_radius = radius * small_w / width
+    blurred = None
+    if mode == "numpy":
         try:
-            os.remove(final_path)
-        except Exception:
-            pass
+            blurred = _box_blur_numpy(small, small_radius)
+        except ImportError:
+            blurred = None
+    if blurred is None:
+        blurred = small.filter(ImageFilter.GaussianBlur(radius=small_radius))
+    return blurred.resize((width, height), Image.Resampling.BICUBIC)
+
+
+def build_story_canvas(
+    image_path_or_url: str,
+    bg_mode: str = "blur",
+    solid_color: str = "#111",
+    upscale: bool = True,
+    output_filename: str | None = None,
+    persist: bool = False,
+    profile: str | EncoderProfile | None = None,
+) -> RenderResult:
+    """
+    Create a 1080x1920 story canvas from a post image (1:1) and return it encoded in memory.
+    The post image is NOT cropped and is centered.
 
-        return public_url
-    except Exception:
+    bg_mode: "blur" (use enlarged blurred background from post) or "solid" (use solid color).
+    solid_color: hex string for solid background.
+    upscale: allow enlarging posts smaller than 1080px (False keeps their native size).
+
+    The decoded source comes from the source cache, so a retry/fallback for the same
+    post does not download and decode it again. persist=True also writes it to media/.
+    """
+    width, height = 1080, 1920
+
+    # Load source image (local path or URL); R2 URLs are presigned when needed
+    src = _fetch_source_image(image_path_or_url, presign=True)
+    src_w, src_h = src.width, src.height
+
+    # Create background
+    if bg_mode == "solid":
+        # parse solid_color
         try:
-            os.remove(tmp_src.name)
+            col = tuple(int(s, 16) for s in (solid_color.lstrip("#")[0:2], solid_color.lstrip("#")[2:4], solid_color.lstrip("#")[4:6]))
         except Exception:
-            pass
-        raise
+            col = (17, 17, 17)
+        bg = Image.new("RGBA", (width, height), col + (255,))
+    else:
+        # blur mode: cover background from source (may crop here), strongly blurred
+        bg = _blurred_cover(src, width, height)
+
+    # Prepare final canvas and paste background
+    canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
+    canvas.paste(bg, (0, 0))
+
+    # Foreground: fit post into max 1080x1080 without cropping
+    max_fg = 1080
+    fg_scale = min(max_fg / src_w, max_fg / src_h)
+    if not upscale:
+        fg_scale = min(fg_scale, 1.0)
+    fg_w = max(1, int(src_w * fg_scale))
+    fg_h = max(1, int(src_h * fg_scale))
+    fg = src if (fg_w, fg_h) == src.size else src.resize((fg_w, fg_h), Image.Resampling.LANCZOS)
+
+    # Paste fg centered
+    paste_x = (width - fg_w) // 2
+    paste_y = (height - fg_h) // 2
+    canvas.paste(fg, (paste_x, paste_y), fg)
+
+    return _media_result(canvas.convert("RGB"), output_filename, persist, profile)
+
+
+def make_story_from_post(
+    image_path_or_url: str,
+    output_filename: str | None = None,
+    bg_mode: str = "blur",
+    solid_color: str = "#111",
+    profile: str | EncoderProfile | None = None,
+) -> str:
+    """
+    Create a 1080x1920 story image from a post image (1:1) via build_story_canvas
+    and upload it. Returns public URL (prefix: ig/story).
+    """
+    from app.services import storage_backend
+
+    result = build_story_canvas(image_path_or_url, bg_mode, solid_color, output_filename=output_filename, profile=profile)
+    return storage_backend.upload_to_remote_server(
+        result.data, result.filename, prefix="ig/story", content_type=result.content_type
+    )
 
 
-def generate_post_image(prompt: str, caption: str | None = None, output_filename: str | None = None, style: str = "minimal_dark") -> str:
+def generate_post_image(
+    prompt: str,
+    caption: str | None = None,
+    output_filename: str | None = None,
+    style: str = "minimal_dark",
+    profile: str | EncoderProfile | None = None,
+) -> str:
     """
     Generate a 1080x1080 post image via AI and render caption text onto it.
     Returns absolute path to saved image in media/.
     """
     from app.services import content_ai
-    import tempfile
-    import os
 
-    width, height = 1080, 1080
-    tmp_bg = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
+    # Generate prompt from given prompt/text
     try:
-        # Generate prompt from given prompt/text
-        try:
-            image_prompt = content_ai.generate_image_prompt(prompt)
-        except Exception:
-            image_prompt = prompt
-        bg_bytes = content_ai.generate_image_png_bytes(image_prompt)
-        tmp_bg.write(bg_bytes)
-        tmp_bg.flush()
-        tmp_bg_path = tmp_bg.name
-    finally:
-        tmp_bg.close()
-
-    try:
-        # Render text onto the square canvas using existing render_image
-        rel, abs_path = render_image(tmp_bg_path, caption or "", "ince düşlerim", style=style, target="square")
-        try:
-            os.remove(tmp_bg_path)
-        except Exception:
-            pass
-        return abs_path
+        image_prompt = content_ai.generate_image_prompt(prompt)
     except Exception:
-        try:
-            os.remove(tmp_bg_path)
-        except Exception:
-            pass
-        raise
+        image_prompt = prompt
+    bg_bytes = content_ai.generate_image_png_bytes(image_prompt)
 
+    # Render text onto the square canvas in memory; only the final image is written
+    result = render_image_bytes(bg_bytes, caption or "", "ince düşlerim", style=style, target="square", filename=output_filename, profile=profile)
+    return save_media(result.data, result.filename)
 
-def generate_story_image_from_post(image_path_or_url: str, output_filename: str | None = None, bg_mode: str = "blur", solid_color: str = "#111") -> str:
+
+def generate_story_image_from_post(
+    image_path_or_url: str,
+    output_filename: str | None = None,
+    bg_mode: str = "blur",
+    solid_color: str = "#111",
+    profile: str | EncoderProfile | None = None,
+) -> str:
     """
     Create a 1080x1920 story image from a post image (1:1). Returns absolute local path under media/.
     """
-    import tempfile
-    import requests
-    from PIL import ImageFilter
-    import os
-    from pathlib import Path
-
-    width, height = 1080, 1920
-    tmp_src = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    try:
-        if str(image_path_or_url).startswith("http"):
-            r = requests.get(image_path_or_url, timeout=30)
-            r.raise_for_status()
-            tmp_src.write(r.content)
-            tmp_src.flush()
-            src_path = tmp_src.name
-        else:
-            src_path = str(Path(image_path_or_url))
-        tmp_src.close()
-
-        src = Image.open(src_path).convert("RGBA")
-        src_w, src_h = src.width, src.height
-
-        # Background
-        if bg_mode == "solid":
-            try:
-                col = tuple(int(s, 16) for s in (solid_color.lstrip("#")[0:2], solid_color.lstrip("#")[2:4], solid_color.lstrip("#")[4:6]))
-            except Exception:
-                col = (17, 17, 17)
-            bg = Image.new("RGBA", (width, height), col + (255,))
-        else:
-            scale = max(width / src_w, height / src_h)
-            new_w = max(1, int(src_w * scale))
-            new_h = max(1, int(src_h * scale))
-            bg_tmp = src.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            left = max(0, (new_w - width) // 2)
-            top = max(0, (new_h - height) // 2)
-            bg = bg_tmp.crop((left, top, left + width, top + height)).convert("RGBA")
-            try:
-                bg = bg.filter(ImageFilter.GaussianBlur(radius=25))
-            except Exception:
-                pass
-
-        # Compose canvas
-        canvas = Image.new("RGBA", (width, height), (0, 0, 0, 255))
-        canvas.paste(bg, (0, 0))
-
-        # Foreground: fit post into max 1080x1080 without cropping (scale down if necessary)
-        max_fg = 1080
-        fg_scale = min(max_fg / src_w, max_fg / src_h, 1.0)
-        fg_w = max(1, int(src_w * fg_scale))
-        fg_h = max(1, int(src_h * fg_scale))
-        fg = src.resize((fg_w, fg_h), Image.Resampling.LANCZOS)
-        paste_x = (width - fg_w) // 2
-        paste_y = (height - fg_h) // 2
-        canvas.paste(fg, (paste_x, paste_y), fg)
-
-        # Save to media dir
-        ensure_media_dir()
-        filename = output_filename or f"{uuid4()}.png"
-        abs_path = MEDIA_DIR / filename
-        canvas.convert("RGB").save(abs_path, "PNG", optimize=True)
-        print(f"[LOG][GENERATE_STORY] saved story local path: {abs_path}")
-
-        try:
-            os.remove(tmp_src.name)
-        except Exception:
-            pass
-        return str(abs_path)
-    except Exception:
-        try:
-            os.remove(tmp_src.name)
-        except Exception:
-            pass
-        raise
+    result = build_story_canvas(
+        image_path_or_url, bg_mode, solid_color, upscale=False, output_filename=output_filename, profile=profile
+    )
+    abs_path = save_media(result.data, result.filename)
+    print(f"[LOG][GENERATE_STORY] saved story local path: {abs_path}")
+    return abs_path
@@ -277,7 +277,7 @@ def publish_story(image_url, ig_user_id, access_token=None):
     media_url = f"{INSTAGRAM_API}/{ig_user_id}/media"
     # Determine whether we must convert the provided image to a story canvas.
     try:
-        from app.services.image_render import generate_story_image_from_post, make_story_from_post
+        from app.services import render_pool
         need_convert = False
         # If URL looks like a post or a local media, try to fetch and inspect size
         try:
@@ -336,27 +336,32 @@ def publish_story(image_url, ig_user_id, access_token=None):
             pass
 
         if need_convert:
+            from app.services import storage_backend
+            from app.services.image_render import build_story_canvas
+
+            # Build the story canvas once; retries reuse the bytes (upload) or the decoded source (build).
+            story = None
             try:
                 print(f"[LOG][STORY_CONVERT] starting conversion for {image_url}")
-                local_story = generate_story_image_from_post(image_url)
-                print(f"[LOG][STORY_CONVERT] created local story at {local_story}")
-                from app.services import storage_backend
-
-                with open(local_story, "rb") as _f:
-                    story_bytes = _f.read()
-                filename = Path(local_story).name
-                public = storage_backend.upload_to_remote_server(story_bytes, filename, prefix="ig/story")
-                image_url = public
-                print(f"[LOG][STORY_CONVERT] uploaded story to {image_url}")
+                story = render_pool.story_from_post(image_url)
+                print(f"[LOG][STORY_CONVERT] rendered story in memory ({len(story.data)} bytes)")
             except Exception as ex_conv:
                 print(f"[WARN][STORY_CONVERT] conversion failed: {ex_conv}")
                 try:
-                    story_url = make_story_from_post(image_url)
-                    image_url = story_url
-                    print(f"[LOG][STORY_CONVERT] fallback make_story_from_post returned {image_url}")
+                    # fallback in this process (pool busy/timeout); decoded source is cached
+                    story = build_story_canvas(image_url, upscale=False)
                 except Exception as ex_f:
                     print(f"[WARN][STORY_CONVERT] fallback failed: {ex_f}")
-                    pass
+            if story is not None:
+                for attempt in range(2):
+                    try:
+                        image_url = storage_backend.upload_to_remote_server(
+                            story.data, story.filename, prefix="ig/story", content_type=story.content_type
+                        )
+                        print(f"[LOG][STORY_CONVERT] uploaded story to {image_url}")
+                        break
+                    except Exception as ex_up:
+                        print(f"[WARN][STORY_CONVERT] upload attempt {attempt + 1} failed: {ex_up}")
     except Exception:
         # image_render may not be available; continue
         pass
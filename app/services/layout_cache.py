@@ -0,0 +1,178 @@
+"""Layout result cache for image_render.
+
+render_image'in font boyutu araması (wrap + ölçüm) aynı metin için tekrar
+tekrar çalışmasın diye sonucu saklar: retry, republish, story dönüşümü,
+stil denemeleri. Anahtar: (normalize metin, stil, hedef, full_height, font özeti).
+
+İki katman:
+- process içi LRU (LAYOUT_CACHE_SIZE kayıt)
+- opsiyonel SQLite dosyası (LAYOUT_CACHE_DB); render worker'ları arasında
+  paylaşılır ve yeniden başlatmalarda korunur. Boşsa disk katmanı kapalıdır.
+
+Provides:
+- make_key(text, style, target, full_height, font_fingerprint) -> str
+- get(key) -> dict | None
+- put(key, value) -> None
+- stats() -> dict
+- clear(disk=False) -> None
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.config import LAYOUT_CACHE_DB, LAYOUT_CACHE_DISK_MAX, LAYOUT_CACHE_SIZE
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, dict]" = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "puts": 0, "disk_errors": 0}
+_disk_ready = False
+
+
+def make_key(text: str, style: str, target: str, full_height: bool, font_fingerprint: str) -> str:
+    """Önbellek anahtarı. Metin boşluklara göre normalize edilir (wrap de text.split() kullanır)."""
+    normalized = " ".join((text or "").split())
+    raw = json.dumps(
+        [normalized, style or "", target or "", bool(full_height), font_fingerprint],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _db_path() -> Optional[Path]:
+    if not LAYOUT_CACHE_DB:
+        return None
+    p = Path(LAYOUT_CACHE_DB)
+    if not p.is_absolute():
+        p = BASE_DIR / p
+    return p
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    """Disk katmanı bağlantısı (kapalıysa None). Tablo ilk kullanımda oluşturulur."""
+    global _disk_ready
+    path = _db_path()
+    if path is None:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=5)
+    if not _disk_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS layout_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL, last_used REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_layout_cache_last_used ON layout_cache(last_used)")
+        conn.commit()
+        _disk_ready = True
+    return conn
+
+
+def _remember(key: str, value: dict) -> None:
+    with _lock:
+        _memory[key] = value
+        _memory.move_to_end(key)
+        while len(_memory) > max(1, LAYOUT_CACHE_SIZE):
+            _memory.popitem(last=False)
+
+
+def get(key: str) -> Optional[dict]:
+    """Önce bellek, sonra disk. Disk hit'i belleğe de alınır."""
+    with _lock:
+        value = _memory.get(key)
+        if value is not None:
+            _memory.move_to_end(key)
+            _stats["memory_hits"] += 1
+            return value
+    try:
+        conn = _connect()
+    except Exception:
+        conn = None
+        with _lock:
+            _stats["disk_errors"] += 1
+    if conn is not None:
+        try:
+            row = conn.execute("SELECT value FROM layout_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE layout_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+                value = json.loads(row[0])
+                _remember(key, value)
+                with _lock:
+                    _stats["disk_hits"] += 1
+                return value
+        except Exception:
+            with _lock:
+                _stats["disk_errors"] += 1
+        finally:
+            conn.close()
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def put(key: str, value: dict) -> None:
+    """Sonucu bellek katmanına ve (açıksa) diske yazar. Disk hataları render'ı bozmaz."""
+    _remember(key, value)
+    with _lock:
+        _stats["puts"] += 1
+    try:
+        conn = _connect()
+    except Exception:
+        with _lock:
+            _stats["disk_errors"] += 1
+        return
+    if conn is None:
+        return
+    try:
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO layout_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), now, now),
+        )
+        # size bound: drop least recently used rows beyond LAYOUT_CACHE_DISK_MAX
+        conn.execute(
+            "DELETE FROM layout_cache WHERE key IN ("
+            "SELECT key FROM layout_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (max(1, LAYOUT_CACHE_DISK_MAX),),
+        )
+        conn.commit()
+    except Exception:
+        with _lock:
+            _stats["disk_errors"] += 1
+    finally:
+        conn.close()
+
+
+def stats() -> dict:
+    """Sayaçlar + bellek katmanı doluluğu."""
+    with _lock:
+        out = dict(_stats)
+        out["memory_size"] = len(_memory)
+    out["memory_max"] = LAYOUT_CACHE_SIZE
+    out["disk_enabled"] = bool(LAYOUT_CACHE_DB)
+    return out
+
+
+def clear(disk: bool = False) -> None:
+    """Bellek katmanını (ve istenirse disk tablosunu) temizler."""
+    with _lock:
+        _memory.clear()
+        for k in _stats:
+            _stats[k] = 0
+    if disk:
+        conn = _connect()
+        if conn is not None:
+            try:
+                conn.execute("DELETE FROM layout_cache")
+                conn.commit()
+            finally:
+                conn.close()
@@ -0,0 +1,229 @@
+"""Persistent response cache for OpenAI chat completions.
+
+Aynı istek (model + normalize mesajlar + parametreler) tekrar OpenAI'ye
+gitmesin diye cevap metnini SQLite'ta saklar: retry'lar, yeniden üretimler,
+aynı konu seçimi için sabit image prompt isteği, aynı caption için hashtag'ler.
+Çeşitlilik istenen çağrılar (caption) cache=False ile atlar.
+
+Ayarlar (app.config):
+- LLM_CACHE_DB: SQLite dosya yolu (boşsa cache kapalı, her çağrı OpenAI'ye gider)
+- LLM_CACHE_TTL: kayıt ömrü (saniye)
+- LLM_CACHE_MAX_ENTRIES: satır üst sınırı; aşılınca en uzun süredir kullanılmayanlar silinir
+
+Provides:
+- make_key(model, messages, params) -> str
+- chat(messages, model="gpt-4o-mini", cache=True, ttl=None, **params) -> str (cevap metni)
+- get(key, ttl=None) -> str | None
+- put(key, content) -> None
+- stats() -> dict (hits / misses / hit_rate / bypass / entries)
+- clear() -> None
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import LLM_CACHE_DB, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL
+from app.services import rate_limiter, single_flight
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "bypass": 0, "puts": 0, "errors": 0}
+_db_ready = False
+
+
+def _normalize_messages(messages: list) -> list:
+    """Boşluk farkları aynı anahtarı üretsin (satır sonları korunur, satır içi boşluklar tekleşir)."""
+    out = []
+    for m in messages or []:
+        content = m.get("content")
+        if isinstance(content, str):
+            content = "\n".join(" ".join(line.split()) for line in content.strip().splitlines())
+        out.append({"role": m.get("role"), "content": content})
+    return out
+
+
+def make_key(model: str, messages: list, params: Optional[dict] = None) -> str:
+    raw = json.dumps(
+        [model, _normalize_messages(messages), params or {}],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _db_path() -> Optional[Path]:
+    if not LLM_CACHE_DB:
+        return None
+    p = Path(LLM_CACHE_DB)
+    if not p.is_absolute():
+        p = BASE_DIR / p
+    return p
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    """Cache bağlantısı (kapalıysa None). Tablo ilk kullanımda oluşturulur."""
+    global _db_ready
+    path = _db_path()
+    if path is None:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=5)
+    if not _db_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache(last_used)")
+        conn.commit()
+        _db_ready = True
+    return conn
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def get(key: str, ttl: Optional[float] = None) -> Optional[str]:
+    """TTL içindeki cevap; süresi dolmuşsa silinir ve None döner."""
+    try:
+        conn = _connect()
+    except Exception:
+        _count("errors")
+        return None
+    if conn is None:
+        return None
+    ttl = LLM_CACHE_TTL if ttl is None else ttl
+    try:
+        row = conn.execute("SELECT content, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            _count("misses")
+            return None
+        now = time.time()
+        if ttl and now - (row[1] or 0) > ttl:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            conn.commit()
+            _count("expired")
+            _count("misses")
+            return None
+        conn.execute("UPDATE llm_cache SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        conn.commit()
+        _count("hits")
+        return row[0]
+    except Exception:
+        _count("errors")
+        return None
+    finally:
+        conn.close()
+
+
+def put(key: str, content: str) -> None:
+    """Cevabı yazar; LLM_CACHE_MAX_ENTRIES aşılırsa en eski kullanılanları siler. Hatalar çağrıyı bozmaz."""
+    try:
+        conn = _connect()
+    except Exception:
+        _count("errors")
+        return
+    if conn is None:
+        return
+    try:
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, content, created_at, last_used, hits) VALUES (?, ?, ?, ?, 0)",
+            (key, content, now, now),
+        )
+        conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (max(1, LLM_CACHE_MAX_ENTRIES),),
+        )
+        conn.commit()
+        _count("puts")
+    except Exception:
+        _count("errors")
+    finally:
+        conn.close()
+
+
+def chat(
+    messages: list,
+    model: str = "gpt-4o-mini",
+    cache: bool = True,
+    ttl: Optional[float] = None,
+    **params,
+) -> str:
+    """
+    get_client().chat.completions.create(...) önünde cache; cevap metnini (choices[0].message.content) döner.
+
+    cache=False: cache okunmaz/yazılmaz (çeşitlilik istenen çağrılar).
+    Cache'ten bağımsız olarak eşzamanlı aynı istekler tek çağrıda birleşir (single_flight);
+    birleşme sadece zamanda çakışan çağrılar içindir, biten çağrının sonucu sonrakine verilmez.
+    ttl: bu çağrı için kayıt ömrü (None -> LLM_CACHE_TTL).
+    """
+    from app.services.content_ai import get_client
+
+    key = None
+    if cache and LLM_CACHE_DB:
+        key = make_key(model, messages, params)
+        content = get(key, ttl)
+        if content is not None:
+            return content
+    else:
+        _count("bypass")
+    def call():
+        # model RPM/TPM bütçesi + öncelik kuyruğu (rate_limiter); gerçek kullanım tahmini düzeltir
+        with rate_limiter.limit(model, rate_limiter.estimate_tokens(messages, params.get("max_tokens"))) as lease:
+            resp = get_client().chat.completions.create(model=model, messages=messages, **params)
+            lease.settle(getattr(getattr(resp, "usage", None), "total_tokens", None))
+        return resp.choices[0].message.content
+
+    # eşzamanlı aynı istekler (cache'li ya da değil) tek OpenAI çağrısını paylaşır
+    content = single_flight.do("chat", key or make_key(model, messages, params), call)
+    if key is not None and content:
+        put(key, content)
+    return content
+
+
+def stats() -> dict:
+    """Sayaçlar, hit oranı ve tablo boyutu."""
+    with _lock:
+        out = dict(_stats)
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+    out["enabled"] = bool(LLM_CACHE_DB)
+    out["ttl"] = LLM_CACHE_TTL
+    out["max_entries"] = LLM_CACHE_MAX_ENTRIES
+    out["entries"] = 0
+    try:
+        conn = _connect()
+        if conn is not None:
+            try:
+                out["entries"] = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            finally:
+                conn.close()
+    except Exception:
+        pass
+    return out
+
+
+def clear() -> None:
+    """Sayaçları ve cache tablosunu temizler."""
+    with _lock:
+        for k in _stats:
+            _stats[k] = 0
+    conn = _connect()
+    if conn is not None:
+        try:
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+        finally:
+            conn.close()
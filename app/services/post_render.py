@@ -0,0 +1,202 @@
+"""Lazy render-on-approve for posts.
+
+Drafts only keep their render inputs: the text-less background in a
+content-addressed local store (storage/backgrounds/<sha256>.png) plus the render
+params (text, signature, style, target, encoder profile) as JSON on the Post.
+The final image is rendered + uploaded only when it is actually needed
+(approve / schedule / publish); the result is cached on the Post via render_key,
+so repeated calls are no-ops until the inputs change.
+
+Provides:
+- store_background(data) -> relative path (storage/backgrounds/<sha256>.png)
+- attach_render_inputs(post, background_bytes, text, signature, style, target, profile)
+- has_render_inputs(post) -> bool
+- needs_render(post) -> bool
+- materialize(post, db=None) -> final image_url (renders + uploads if needed)
+- preview_url(post) -> /api/posts/{id}/preview (cheap preview for draft listings)
+- draft_hash(post) -> perceptual hash of the draft (from a small hash render), see image_dedup
+- release_background(db, post) -> removes the background file if no other post uses it
+- release_background_path(db, rel, exclude_post_id=None) -> same, by path (also checks draft_buffer and the background library)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.config import BACKGROUND_STORE_DIR
+from app.models import BackgroundAsset, DraftBuffer, Post
+from app.services import image_dedup, render_pool
+from app.services.storage_service import upload_to_remote_server
+from app.utils import normalize_image_url
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+BACKGROUND_DIR = BASE_DIR / BACKGROUND_STORE_DIR
+
+# post id -> lock; aynı post için eşzamanlı approve + publish iki kez render etmesin
+_POST_LOCKS: dict[int, threading.Lock] = {}
+_POST_LOCKS_GUARD = threading.Lock()
+
+
+def _post_lock(post_id: int | None) -> threading.Lock:
+    with _POST_LOCKS_GUARD:
+        if len(_POST_LOCKS) > 1024:
+            _POST_LOCKS.clear()
+        return _POST_LOCKS.setdefault(post_id or 0, threading.Lock())
+
+
+def store_background(data: bytes) -> str:
+    """Arka planı içerik adresli olarak saklar (aynı bytes tek dosya); relative path döner."""
+    digest = hashlib.sha256(data).hexdigest()
+    BACKGROUND_DIR.mkdir(parents=True, exist_ok=True)
+    path = BACKGROUND_DIR / f"{digest}.png"
+    if not path.exists():
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    return path.relative_to(BASE_DIR).as_posix()
+
+
+def attach_render_inputs(
+    post: Post,
+    background_bytes: bytes,
+    text: str,
+    signature: str = "ince düşlerim",
+    style: str = "minimal_dark",
+    target: str = "square",
+    profile: Optional[str] = None,
+) -> None:
+    """Render girdilerini post'a yazar (commit çağırana ait); final görsel üretilmez."""
+    post.background_path = store_background(background_bytes)  # type: ignore[assignment]
+    post.render_params = json.dumps(  # type: ignore[assignment]
+        {"text": text, "signature": signature, "style": style, "target": target, "profile": profile},
+        ensure_ascii=False,
+    )
+    post.render_key = None  # type: ignore[assignment]
+
+
+def render_params(post: Post) -> dict:
+    try:
+        params = json.loads(post.render_params or "{}")
+    except Exception:
+        params = {}
+    return {
+        "text": params.get("text") or post.caption or "",
+        "signature": params.get("signature") or "ince düşlerim",
+        "style": params.get("style") or "minimal_dark",
+        "target": params.get("target") or "square",
+        "profile": params.get("profile"),
+    }
+
+
+def has_render_inputs(post: Post) -> bool:
+    return bool(getattr(post, "background_path", None)) and (BASE_DIR / post.background_path).exists()
+
+
+def _render_key(post: Post) -> str:
+    # background_path zaten içerik özeti taşıyor; dosyayı yeniden hash'lemeye gerek yok
+    payload = json.dumps([post.background_path, render_params(post)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:40]
+
+
+def needs_render(post: Post) -> bool:
+    """Girdiler var ve final görsel yok ya da girdiler değişmiş."""
+    if not has_render_inputs(post):
+        return False
+    return not post.image_url or post.render_key != _render_key(post)
+
+
+def materialize(post: Post, db=None) -> Optional[str]:
+    """
+    Final görseli gerekiyorsa render + upload eder ve post.image_url / image_path / render_key'i
+    günceller (db verilirse commit eder). Girdisi olmayan (eski) post'larda image_url aynen döner.
+    """
+    if not needs_render(post):
+        return post.image_url
+    with _post_lock(post.id):
+        if db is not None:
+            try:
+                db.refresh(post)
+            except Exception:
+                pass
+        if not needs_render(post):
+            return post.image_url
+        params = render_params(post)
+        background = (BASE_DIR / post.background_path).read_bytes()
+        rendered = render_pool.render_bytes(
+            background,
+            params["text"],
+            params["signature"],
+            params["style"],
+            params["target"],
+            persist=True,
+            profile=params["profile"],
+        )
+        prefix = "ig/story" if params["target"] == "story" else "ig/post"
+        try:
+            public_url = upload_to_remote_server(
+                rendered.data, rendered.filename, prefix=prefix, content_type=rendered.content_type
+            )
+        except Exception as e:
+            print(f"[RENDER] Final image upload failed for post {post.id}: {e}")
+            public_url = f"/media/{rendered.filename}"
+        post.image_url = normalize_image_url(public_url)  # type: ignore[assignment]
+        post.image_path = rendered.rel_path  # type: ignore[assignment]
+        post.render_key = _render_key(post)  # type: ignore[assignment]
+        if db is not None:
+            try:
+                image_dedup.record(db, post.id, image_dedup.dhash(rendered.data), "final")
+            except Exception as e:
+                print(f"[DEDUP] Failed to hash final image for post {post.id}: {e}")
+            db.add(post)
+            db.commit()
+        print(f"[RENDER] Materialized final image for post {post.id}: {post.image_url}")
+        return post.image_url
+
+
+def preview_url(post: Post) -> str:
+    return f"/api/posts/{post.id}/preview"
+
+
+def draft_hash(post: Post) -> Optional[int]:
+    """
+    Taslağın perceptual hash'i, küçük hash render'ından (image_render.render_hash_image; tam boy
+    render yok). Final görselin gerçek hash'i materialize'da kaydedilir.
+    """
+    if not has_render_inputs(post):
+        return None
+    params = render_params(post)
+    small = render_pool.call(
+        "render_hash_image",
+        post.background_path,
+        params["text"],
+        params["signature"],
+        params["style"],
+        params["target"],
+    )
+    return image_dedup.dhash(small)
+
+
+def release_background_path(db, rel: Optional[str], exclude_post_id: Optional[int] = None) -> None:
+    """Arka plan dosyasını hiçbir post / draft buffer / kütüphane kaydı kullanmıyorsa siler (best effort)."""
+    if not rel:
+        return
+    try:
+        q = db.query(Post).filter(Post.background_path == rel)
+        if exclude_post_id is not None:
+            q = q.filter(Post.id != exclude_post_id)
+        if (
+            q.count() == 0
+            and db.query(DraftBuffer).filter(DraftBuffer.background_path == rel).count() == 0
+            and db.query(BackgroundAsset).filter(BackgroundAsset.path == rel).count() == 0
+        ):
+            (BASE_DIR / rel).unlink(missing_ok=True)
+    except Exception as e:
+        print(f"[RENDER] Background cleanup failed for {rel}: {e}")
+
+
+def release_background(db, post: Post) -> None:
+    """Post silinirken arka planı başka post kullanmıyorsa siler (best effort)."""
+    release_background_path(db, getattr(post, "background_path", None), exclude_post_id=post.id)
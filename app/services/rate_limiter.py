@@ -0,0 +1,316 @@
+"""Shared rate limiter for OpenAI calls (token buckets + concurrency cap + priority queue).
+
+Model başına dakikalık istek (rpm) ve token (tpm) bütçeleri token bucket olarak
+SQLite'ta (RATE_LIMIT_DB) tutulur; API process'i, automation thread'i ve Celery
+worker'ları aynı dosyayı kullanır. Her güncelleme BEGIN IMMEDIATE transaction'ı
+içinde yapılır (process'ler arası atomik).
+
+- Bekleme kuyruğu sınırlı (RATE_LIMIT_MAX_QUEUE); dolarsa veya RATE_LIMIT_MAX_WAIT
+  aşılırsa RateLimitExceeded fırlar (çağıranlar mevcut fallback'lerine düşer).
+- Öncelik (model başına kuyruk): manual (0) > automation (1) > background (2); aynı öncelikte FIFO. Önünde
+  bekleyen varsa bütçe uygun olsa bile sıra beklenir.
+- Eşzamanlılık: model başına en fazla RATE_LIMIT_MAX_CONCURRENT çağrı (process'ler arası
+  lease; çöken process'in lease'i RATE_LIMIT_LEASE_SECONDS sonra düşer).
+
+Limitler RATE_LIMITS ile: "gpt-4o-mini:rpm=500,tpm=200000;dall-e-3:rpm=5". Listede
+olmayan modeller sınırlanmaz. RATE_LIMIT_DB boşsa limiter kapalı.
+
+Provides:
+- limit(model, tokens=0) -> context manager (Lease; lease.settle(actual_tokens))
+- priority(name) -> context manager, with_priority(name) -> decorator
+- estimate_tokens(messages, max_tokens=None) -> int
+- stats() -> dict
+- RateLimitExceeded
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from app.config import (
+    RATE_LIMIT_DB,
+    RATE_LIMIT_LEASE_SECONDS,
+    RATE_LIMIT_MAX_CONCURRENT,
+    RATE_LIMIT_MAX_QUEUE,
+    RATE_LIMIT_MAX_WAIT,
+    RATE_LIMITS,
+)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+PRIORITIES = {"manual": 0, "automation": 1, "background": 2}
+_WAITER_STALE = 10.0  # heartbeat'i bu kadar eski bekleyen kuyruktan düşer
+_POLL_MAX = 1.0
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("openai_priority", default="manual")
+_lock = threading.Lock()
+_stats = {"acquired": 0, "waited": 0, "wait_ms": 0.0, "rejected_queue": 0, "rejected_timeout": 0, "errors": 0}
+_db_ready = False
+
+
+class RateLimitExceeded(Exception):
+    """Kuyruk dolu ya da bütçe RATE_LIMIT_MAX_WAIT içinde açılmadı."""
+
+
+def _parse_limits(spec: str) -> dict:
+    limits: dict = {}
+    for part in (spec or "").split(";"):
+        if ":" not in part:
+            continue
+        model, values = part.split(":", 1)
+        entry = {}
+        for kv in values.split(","):
+            if "=" in kv:
+                k, v = kv.split("=", 1)
+                try:
+                    entry[k.strip()] = float(v)
+                except ValueError:
+                    continue
+        if entry:
+            limits[model.strip()] = entry
+    return limits
+
+
+LIMITS = _parse_limits(RATE_LIMITS)
+
+
+def _count(name: str, value: float = 1) -> None:
+    with _lock:
+        _stats[name] += value
+
+
+@contextmanager
+def priority(name: str):
+    """Bu blok içindeki OpenAI çağrılarının kuyruk önceliği (manual / automation / background)."""
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(name: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with priority(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def estimate_tokens(messages: list, max_tokens: Optional[int] = None) -> int:
+    """Kaba tahmin: ~4 karakter/token + cevap payı (gerçek kullanım settle ile düzeltilir)."""
+    chars = sum(len(m.get("content") or "") for m in messages or [] if isinstance(m.get("content"), str))
+    return chars // 4 + (max_tokens or 500)
+
+
+def _connect() -> Optional[sqlite3.Connection]:
+    global _db_ready
+    if not RATE_LIMIT_DB:
+        return None
+    path = Path(RATE_LIMIT_DB)
+    if not path.is_absolute():
+        path = BASE_DIR / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=10, isolation_level=None)
+    if not _db_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS rl_buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rl_waiters "
+            "(id TEXT PRIMARY KEY, model TEXT, priority INTEGER, enqueued REAL, seen REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS rl_leases (id TEXT PRIMARY KEY, model TEXT, expires REAL)")
+        _db_ready = True
+    return conn
+
+
+def _take(conn, model: str, tokens: int, now: float) -> float:
+    """Bütçe uygunsa düşer ve 0 döner; değilse tahmini bekleme süresi (saniye)."""
+    limits = LIMITS.get(model, {})
+    if RATE_LIMIT_MAX_CONCURRENT > 0:
+        active = conn.execute("SELECT COUNT(*) FROM rl_leases WHERE model = ?", (model,)).fetchone()[0]
+        if active >= RATE_LIMIT_MAX_CONCURRENT:
+            return 0.25
+    updates = []
+    wait = 0.0
+    for kind, cost in (("rpm", 1), ("tpm", tokens)):
+        capacity = limits.get(kind)
+        if not capacity or cost <= 0:
+            continue
+        cost = min(cost, capacity)  # kapasiteden büyük istek sonsuza kadar beklemesin
+        rate = capacity / 60.0
+        name = f"{model}:{kind}"
+        row = conn.execute("SELECT tokens, updated FROM rl_buckets WHERE name = ?", (name,)).fetchone()
+        available = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+        if available < cost:
+            wait = max(wait, (cost - available) / rate)
+        updates.append((name, available - cost))
+    if wait > 0:
+        return wait
+    for name, left in updates:
+        conn.execute(
+            "INSERT OR REPLACE INTO rl_buckets (name, tokens, updated) VALUES (?, ?, ?)", (name, left, now)
+        )
+    return 0.0
+
+
+class Lease:
+    def __init__(self, model: str, tokens: int, lease_id: Optional[str]):
+        self.model = model
+        self.tokens = tokens
+        self.lease_id = lease_id
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """Tahmin ile gerçek token kullanımı arasındaki farkı tpm bucket'ına yansıtır."""
+        if self.lease_id is None or actual_tokens is None or "tpm" not in LIMITS.get(self.model, {}):
+            return
+        try:
+            conn = _connect()
+            if conn is None:
+                return
+            try:
+                capacity = LIMITS[self.model]["tpm"]
+                conn.execute(
+                    "UPDATE rl_buckets SET tokens = MIN(?, tokens + ?) WHERE name = ?",
+                    (capacity, self.tokens - actual_tokens, f"{self.model}:tpm"),
+                )
+            finally:
+                conn.close()
+        except Exception:
+            _count("errors")
+
+
+def _acquire(model: str, tokens: int) -> Optional[str]:
+    conn = _connect()
+    if conn is None:
+        return None
+    prio = PRIORITIES.get(_priority.get(), 0)
+    waiter = uuid.uuid4().hex
+    enqueued = time.time()
+    deadline = enqueued + RATE_LIMIT_MAX_WAIT
+    queued = False
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                conn.execute("DELETE FROM rl_waiters WHERE seen < ?", (now - _WAITER_STALE,))
+                conn.execute("DELETE FROM rl_leases WHERE expires < ?", (now,))
+                if not queued:
+                    size = conn.execute("SELECT COUNT(*) FROM rl_waiters").fetchone()[0]
+                    if size >= RATE_LIMIT_MAX_QUEUE:
+                        conn.execute("COMMIT")
+                        _count("rejected_queue")
+                        raise RateLimitExceeded(f"OpenAI wait queue full ({size}) for {model}")
+                    conn.execute(
+                        "INSERT INTO rl_waiters (id, model, priority, enqueued, seen) VALUES (?, ?, ?, ?, ?)",
+                        (waiter, model, prio, enqueued, now),
+                    )
+                    queued = True
+                else:
+                    conn.execute("UPDATE rl_waiters SET seen = ? WHERE id = ?", (now, waiter))
+                ahead = conn.execute(
+                    "SELECT COUNT(*) FROM rl_waiters "
+                    "WHERE model = ? AND (priority < ? OR (priority = ? AND enqueued < ?))",
+                    (model, prio, prio, enqueued),
+                ).fetchone()[0]
+                wait = 0.1
+                if ahead == 0:
+                    wait = _take(conn, model, tokens, now)
+                    if wait == 0:
+                        lease_id = uuid.uuid4().hex
+                        conn.execute(
+                            "INSERT INTO rl_leases (id, model, expires) VALUES (?, ?, ?)",
+                            (lease_id, model, now + RATE_LIMIT_LEASE_SECONDS),
+                        )
+                        conn.execute("DELETE FROM rl_waiters WHERE id = ?", (waiter,))
+                        conn.execute("COMMIT")
+                        queued = False
+                        waited_ms = (now - enqueued) * 1000
+                        _count("acquired")
+                        if waited_ms > 50:
+                            _count("waited")
+                            _count("wait_ms", waited_ms)
+                        return lease_id
+                conn.execute("COMMIT")
+            except RateLimitExceeded:
+                raise
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if time.time() + min(wait, _POLL_MAX) > deadline:
+                _count("rejected_timeout")
+                raise RateLimitExceeded(f"OpenAI rate limit wait exceeded {RATE_LIMIT_MAX_WAIT:.0f}s for {model}")
+            time.sleep(min(max(wait, 0.05), _POLL_MAX))
+    finally:
+        if queued:
+            try:
+                conn.execute("DELETE FROM rl_waiters WHERE id = ?", (waiter,))
+            except Exception:
+                pass
+        conn.close()
+
+
+def _release(lease_id: Optional[str]) -> None:
+    if lease_id is None:
+        return
+    try:
+        conn = _connect()
+        if conn is not None:
+            try:
+                conn.execute("DELETE FROM rl_leases WHERE id = ?", (lease_id,))
+            finally:
+                conn.close()
+    except Exception:
+        _count("errors")
+
+
+@contextmanager
+def limit(model: str, tokens: int = 0):
+    """
+    OpenAI çağrısını model bütçesine göre sıraya koyar; blok bitince eşzamanlılık lease'i bırakılır.
+    Limiter DB'si kullanılamazsa çağrı beklemeden çalışır.
+    """
+    lease_id = None
+    if model in LIMITS or RATE_LIMIT_MAX_CONCURRENT > 0:
+        try:
+            lease_id = _acquire(model, tokens)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            _count("errors")
+            print(f"[RATE_LIMIT] Limiter unavailable, calling without pacing: {e}")
+    try:
+        yield Lease(model, tokens, lease_id)
+    finally:
+        _release(lease_id)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+    out["limits"] = LIMITS
+    out["max_concurrent"] = RATE_LIMIT_MAX_CONCURRENT
+    out["queue"] = 0
+    try:
+        conn = _connect()
+        if conn is not None:
+            try:
+                out["queue"] = conn.execute("SELECT COUNT(*) FROM rl_waiters").fetchone()[0]
+                out["leases"] = conn.execute("SELECT COUNT(*) FROM rl_leases").fetchone()[0]
+            finally:
+                conn.close()
+    except Exception:
+        pass
+    return out
@@ -0,0 +1,393 @@
+"""Process-pool render executor.
+
+Pillow render işleri (metin layout + çizim + encode) API process'inde GIL'i
+tutmasın diye ayrı worker process'lerde çalışır. Worker'lar açılışta fontları
+yükler (pre-warm). Görsel buffer'ları process sınırını shared memory ile geçer;
+pickle ile sadece küçük metadata taşınır.
+
+Ayarlar (app.config):
+- RENDER_POOL_SIZE: worker sayısı (0 = pool kapalı, işler çağıran process'te çalışır)
+- RENDER_POOL_MAX_QUEUE: aynı anda kabul edilen iş (çalışan + bekleyen) üst sınırı
+- RENDER_POOL_QUEUE_WAIT: kuyruk doluyken yer açılması için beklenecek saniye (sonra RenderPoolBusy)
+- RENDER_JOB_TIMEOUT: iş başına sonuç bekleme süresi (saniye, sonra RenderTimeout). Sadece
+  çağıranın beklemesini keser; worker işi bitirene kadar kuyruk slotunu tutar.
+
+Provides:
+- start() / shutdown() / stats()
+- render_bytes(background, text, signature, ...) -> RenderResult
+- render_batch(background, variants, ...) -> BatchRenderResult
+- story_from_post(image_path_or_url, ...) -> RenderResult
+- call(name, *args, **kwargs) -> image_render.<name>(...) sonucu (upload dahil helper'lar için)
+"""
+from __future__ import annotations
+
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Any
+
+from app.config import (
+    RENDER_JOB_TIMEOUT,
+    RENDER_POOL_MAX_QUEUE,
+    RENDER_POOL_QUEUE_WAIT,
+    RENDER_POOL_SIZE,
+)
+from app.services import image_render
+from app.services.image_render import RenderResult
+
+# font sizes touched by almost every render (story/square search start, signature)
+_WARM_FONT_SIZES = (21, 28, 40, 64, 84, 110, 140)
+
+
+class RenderPoolBusy(RuntimeError):
+    """Kuyruk dolu: RENDER_POOL_QUEUE_WAIT içinde yer açılmadı."""
+
+
+class RenderTimeout(TimeoutError):
+    """İş RENDER_JOB_TIMEOUT içinde bitmedi."""
+
+
+_lock = threading.Lock()
+_executor: ProcessPoolExecutor | None = None
+_slots = threading.BoundedSemaphore(max(1, RENDER_POOL_MAX_QUEUE))
+_stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timeouts": 0, "inline": 0, "in_flight": 0}
+
+
+# ---------------------------------------------------------------- shared memory helpers
+
+
+def _to_shm(data: bytes) -> tuple[str, int]:
+    shm = SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[: len(data)] = data
+        return shm.name, len(data)
+    finally:
+        shm.close()
+
+
+def _from_shm(ref: tuple[str, int], unlink: bool) -> bytes:
+    name, size = ref
+    shm = SharedMemory(name=name)
+    try:
+        return bytes(shm.buf[:size])
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+
+
+def _unlink_shm(ref: tuple[str, int] | None) -> None:
+    if not ref:
+        return
+    try:
+        shm = SharedMemory(name=ref[0])
+        shm.close()
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+# ---------------------------------------------------------------- worker side
+
+
+def _warm_worker() -> None:
+    """Worker açılışı: Ctrl+C'yi parent'a bırak, fontları cache'e yükle."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for size in _WARM_FONT_SIZES:
+        try:
+            image_render._load_font(size, "main")
+            image_render._load_emoji_font(size)
+        except Exception:
+            pass
+
+
+def _ping() -> int:
+    import os
+
+    return os.getpid()
+
+
+def _pack(result: RenderResult) -> dict:
+    return {
+        "shm": _to_shm(result.data),
+        "width": result.width,
+        "height": result.height,
+        "filename": result.filename,
+        "format": result.format,
+        "content_type": result.content_type,
+        "timings_ms": result.timings_ms,
+    }
+
+
+def _job_render(background: tuple[str, int] | str, text: str, signature: str, style: str, target: str, full_height: bool, profile: str | None) -> dict:
+    # background: shared memory ref (encoded bytes) or a file path the worker reads itself
+    source = _from_shm(background, unlink=False) if isinstance(background, tuple) else background
+    return _pack(image_render.render_image_bytes(source, text, signature, style, target, full_height, profile=profile))
+
+
+def _job_batch(background: tuple[str, int] | str, variants: list[dict], profile: str | None) -> dict:
+    source = _from_shm(background, unlink=False) if isinstance(background, tuple) else background
+    batch = image_render.render_batch(source, variants, profile=profile)
+    return {
+        "variants": [_pack(r) for r in batch.variants],
+        "decode_ms": batch.decode_ms,
+        "prepare_ms": batch.prepare_ms,
+    }
+
+
+def _job_story_from_post(image_path_or_url: str, bg_mode: str, solid_color: str, upscale: bool, profile: str | None) -> dict:
+    return _pack(image_render.build_story_canvas(image_path_or_url, bg_mode, solid_color, upscale=upscale, profile=profile))
+
+
+def _job_call(name: str, args: tuple, kwargs: dict) -> Any:
+    return getattr(image_render, name)(*args, **kwargs)
+
+
+# ---------------------------------------------------------------- parent side
+
+
+def _get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if RENDER_POOL_SIZE <= 0:
+        return None
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    """Worker çökmesinden (BrokenProcessPool) sonra pool'u yeniden kurdurur."""
+    global _executor
+    with _lock:
+        broken, _executor = _executor, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def start() -> None:
+    """Pool'u açar ve her worker'ı ayağa kaldırıp fontlarını yükletir (startup'ta çağrılır)."""
+    executor = _get_executor()
+    if executor is None:
+        return
+    try:
+        pids = {f.result(timeout=RENDER_JOB_TIMEOUT) for f in [executor.submit(_ping) for _ in range(RENDER_POOL_SIZE)]}
+        print(f"[RENDER_POOL] started {len(pids)} worker(s), pool size {RENDER_POOL_SIZE}")
+    except Exception as e:
+        print(f"[RENDER_POOL] warm-up failed: {e}")
+
+
+def shutdown(wait: bool = True) -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+    out["pool_size"] = RENDER_POOL_SIZE
+    out["max_queue"] = RENDER_POOL_MAX_QUEUE
+    return out
+
+
+def _count(key: str, delta: int = 1) -> None:
+    with _lock:
+        _stats[key] += delta
+
+
+def _submit(fn, args: tuple, unpack, input_ref: tuple[str, int] | None = None) -> Future:
+    """
+    İşi pool'a verir, çağırana ayrı bir Future döner.
+    Pool future'ı bittiğinde (çağıran timeout ile vazgeçmiş olsa bile) shared memory
+    blokları temizlenir ve kuyruk slotu bırakılır.
+    """
+    executor = _get_executor()
+    if not _slots.acquire(timeout=max(0.0, RENDER_POOL_QUEUE_WAIT)):
+        _unlink_shm(input_ref)
+        _count("rejected")
+        raise RenderPoolBusy(f"render queue full ({RENDER_POOL_MAX_QUEUE} jobs in flight)")
+    outer: Future = Future()
+    try:
+        try:
+            inner = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            _reset_executor()
+            inner = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        _unlink_shm(input_ref)
+        raise
+    _count("submitted")
+    _count("in_flight")
+
+    def _done(f: Future) -> None:
+        try:
+            exc = f.exception()
+            if exc is not None:
+                if isinstance(exc, BrokenProcessPool):
+                    _reset_executor()
+                _count("failed")
+                outer.set_exception(exc)
+            else:
+                value = unpack(f.result())
+                _count("completed")
+                outer.set_result(value)
+        except Exception as e:  # unpack failure
+            _count("failed")
+            outer.set_exception(e)
+        finally:
+            _unlink_shm(input_ref)
+            _count("in_flight", -1)
+            _slots.release()
+
+    inner.add_done_callback(_done)
+    return outer
+
+
+def _wait(fut: Future, timeout: float | None) -> Any:
+    timeout = RENDER_JOB_TIMEOUT if timeout is None else timeout
+    try:
+        return fut.result(timeout=timeout if timeout and timeout > 0 else None)
+    except FutureTimeoutError:
+        # the worker keeps running until the job ends; its slot and buffers are freed then
+        _count("timeouts")
+        raise RenderTimeout(f"render job did not finish within {timeout}s")
+
+
+def _unpack_result(persist: bool):
+    def unpack(meta: dict) -> RenderResult:
+        data = _from_shm(meta["shm"], unlink=True)
+        result = RenderResult(
+            data=data,
+            width=meta["width"],
+            height=meta["height"],
+            filename=meta["filename"],
+            format=meta["format"],
+            content_type=meta["content_type"],
+            timings_ms=meta["timings_ms"],
+        )
+        if persist:
+            result.rel_path = f"media/{result.filename}"
+            result.abs_path = str(image_render.MEDIA_DIR / result.filename)
+            result.persisted = image_render.save_media_async(result.data, result.filename)
+        return result
+
+    return unpack
+
+
+def submit_render(
+    background: bytes | str | Path,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    full_height: bool = True,
+    persist: bool = False,
+    profile: str | None = None,
+) -> Future:
+    """render_image_bytes işini kuyruğa alır; Future[RenderResult] döner."""
+    if _get_executor() is None:
+        return _inline(image_render.render_image_bytes, background, text, signature, style, target, full_height, persist=persist, profile=profile)
+    started = time.perf_counter()
+    input_ref = _to_shm(bytes(background)) if isinstance(background, (bytes, bytearray, memoryview)) else None
+    unpack = _unpack_result(persist)
+
+    def unpack_timed(meta: dict) -> RenderResult:
+        result = unpack(meta)
+        result.timings_ms["pool_total"] = (time.perf_counter() - started) * 1000
+        return result
+
+    args = (input_ref or str(background), text, signature, style, target, full_height, profile)
+    return _submit(_job_render, args, unpack_timed, input_ref)
+
+
+def render_bytes(
+    background: bytes | str | Path,
+    text: str,
+    signature: str,
+    style: str = "minimal_dark",
+    target: str = "square",
+    full_height: bool = True,
+    persist: bool = False,
+    profile: str | None = None,
+    timeout: float | None = None,
+) -> RenderResult:
+    """render_image_bytes'ın pool'da çalışan hali (bloklar, timeout ile)."""
+    return _wait(submit_render(background, text, signature, style, target, full_height, persist, profile), timeout)
+
+
+def render_batch(
+    background: bytes | str | Path,
+    variants: list[dict],
+    persist: bool = False,
+    profile: str | None = None,
+    timeout: float | None = None,
+) -> image_render.BatchRenderResult:
+    """image_render.render_batch'in pool'da çalışan hali (tüm varyantlar tek worker'da, arka plan bir kez decode)."""
+    if _get_executor() is None:
+        fut = _inline(image_render.render_batch, background, variants, persist=persist, profile=profile)
+    else:
+        input_ref = _to_shm(bytes(background)) if isinstance(background, (bytes, bytearray, memoryview)) else None
+        unpack_one = _unpack_result(persist)
+
+        def unpack(meta: dict) -> image_render.BatchRenderResult:
+            return image_render.BatchRenderResult(
+                variants=[unpack_one(m) for m in meta["variants"]],
+                decode_ms=meta["decode_ms"],
+                prepare_ms=meta["prepare_ms"],
+            )
+
+        fut = _submit(_job_batch, (input_ref or str(background), variants, profile), unpack, input_ref)
+    return _wait(fut, timeout)
+
+
+def story_from_post(
+    image_path_or_url: str,
+    bg_mode: str = "blur",
+    solid_color: str = "#111",
+    upscale: bool = False,
+    persist: bool = False,
+    profile: str | None = None,
+    timeout: float | None = None,
+) -> RenderResult:
+    """build_story_canvas'ın pool'da çalışan hali (kaynak cache'i her worker'da ayrıdır)."""
+    if _get_executor() is None:
+        fut = _inline(image_render.build_story_canvas, image_path_or_url, bg_mode, solid_color, upscale=upscale, persist=persist, profile=profile)
+    else:
+        fut = _submit(_job_story_from_post, (str(image_path_or_url), bg_mode, solid_color, upscale, profile), _unpack_result(persist))
+    return _wait(fut, timeout)
+
+
+def call(name: str, *args, timeout: float | None = None, **kwargs) -> Any:
+    """image_render.<name>(*args, **kwargs)'ı pool'da çalıştırır (ör. make_story_from_post, render_story_image)."""
+    if not callable(getattr(image_render, name, None)):
+        raise ValueError(f"Unknown image_render function: {name}")
+    if _get_executor() is None:
+        fut = _inline(getattr(image_render, name), *args, **kwargs)
+    else:
+        fut = _submit(_job_call, (name, args, kwargs), lambda value: value)
+    return _wait(fut, timeout)
+
+
+def _inline(fn, *args, **kwargs) -> Future:
+    """Pool kapalıyken (RENDER_POOL_SIZE=0) işi çağıran thread'de çalıştırır."""
+    fut: Future = Future()
+    _count("inline")
+    try:
+        fut.set_result(fn(*args, **kwargs))
+    except Exception as e:
+        fut.set_exception(e)
+    return fut
@@ -6,6 +6,8 @@ from datetime import datetime, timezone
 from app.database import SessionLocal
 from app.models import Post, Account, PostStatus
 from app.services.instagram import publish_image, publish_story
+from app.services import image_dedup, post_render
+from app.config import IMAGE_DEDUP_ENABLED
 from app.models import PostType
 import json
 
@@ -79,6 +81,29 @@ def run_scheduled_publish():
                 if env_token:
                     access_token = env_token
 
+                # Lazy render: final görsel yoksa yayından hemen önce üret
+                try:
+                    post_render.materialize(post, db)
+                except Exception as e:
+                    errors.append(f"Post {post.id}: Final image render failed: {e}")
+                    continue
+                # Refuse near-identical re-posts (perceptual hash index, see image_dedup)
+                try:
+                    image_dedup.check(
+                        db,
+                        post.account_id if post.account_id is not None else account.id,
+                        image_dedup.ensure_hash(db, post) if IMAGE_DEDUP_ENABLED else None,
+                        exclude_post_id=post.id,
+                        published_only=True,
+                    )
+                except image_dedup.DuplicateImageError as e:
+                    post.status = PostStatus.FAILED
+                    post.error_message = str(e)
+                    db.add(post)
+                    db.commit()
+                    errors.append(f"Post {post.id}: {e}")
+                    print(f"[SCHEDULED] Post {post.id}: Skipped, {e}")
+                    continue
                 image_url = post.image_url
                 if not image_url:
                     errors.append(f"Post {post.id}: No image_url")
@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta, timezone
 from app.services.trend_radar import get_trending_topics
-from app.services.content_ai import generate_caption, generate_hashtags, generate_image_prompt
-from app.services.image_backend import generate_image_url, generate_image_bytes, render_from_bytes
+from app.services.image_backend import generate_image_url
+from app.services import background_library, content_ai, draft_buffer, hashtag_index, image_dedup, post_render, rate_limiter
+from app.config import DRAFT_BUFFER_SIZE, IMAGE_DEDUP_ENABLED, LAZY_FINAL_RENDER
 from app.services.monetization import attach_affiliate
 from worker.tasks import publish_post
 from app.database import SessionLocal
@@ -16,6 +17,21 @@ def next_post_time():
     return datetime.utcnow() + timedelta(minutes=30)
 
 
+def _release_run_claim(setting_id, run_date):
+    """Drop the automation_runs row so the slot is not used up by a draft that was not created."""
+    db_claim = SessionLocal()
+    try:
+        db_claim.execute(
+            text("DELETE FROM automation_runs WHERE setting_id = :sid AND run_date = :rd"),
+            {"sid": setting_id, "rd": run_date},
+        )
+        db_claim.commit()
+    except Exception as e:
+        print(f"[AUTOMATION] Failed to release run claim for setting id={setting_id}: {e}")
+    finally:
+        db_claim.close()
+
+
 def daily_post_cycle(accounts):
     # Deprecated publishing path: do not publish directly from startup.
     # Keep function for backward compatibility but do nothing — use run_automation_check instead.
@@ -26,6 +42,7 @@ def daily_post_cycle(accounts):
             pass
 
 
+@rate_limiter.with_priority("automation")
 def run_automation_check():
     """
     Check automation settings and generate drafts when needed.
@@ -153,46 +170,84 @@ def run_automation_check():
                 except Exception:
                     # If claim fails for any reason, continue but rely on other dedupe checks.
                     pass
-                try:
-                    caption = generate_caption(topic)
-                except Exception:
-                    caption = f"Auto draft: {topic}"
-                try:
-                    hashtags = generate_hashtags(topic, caption=caption, count=10)
-                except Exception:
-                    hashtags = []
-                try:
-                    image_prompt = generate_image_prompt(topic)
-                    png_bytes = generate_image_bytes(image_prompt)
-                    # Do not persist the text-less background to storage/R2.
-                    # Render from bytes (temporary file handled by render_from_bytes).
-                    rel_bg = None
-                    public_bg = None
-                except Exception:
-                    public_bg = "https://images.pexels.com/photos/1032650/pexels-photo-1032650.jpeg"
-                    rel_bg = None
-                # render final image (best effort)
-                public_url = public_bg
-                # If we have a temporary background file, render text on it and upload final only
-                # If we have background bytes, render final image and upload final only
-                try:
-                    rel_final, abs_final = render_from_bytes(png_bytes, caption, "ince düşlerim", "minimal_dark")
-                    with open(abs_final, "rb") as f:
-                        final_bytes = f.read()
-                    filename = os.path.basename(abs_final)
-                    public_url = upload_to_remote_server(final_bytes, filename, prefix="ig/post")
-                except Exception:
-                    public_url = public_bg
+                # Warm buffer: a draft pre-generated during idle time (draft_buffer.refill) skips the OpenAI calls.
+                buffered = None
+                if DRAFT_BUFFER_SIZE > 0:
+                    try:
+                        buffered = draft_buffer.claim(db, s.account_id, topic)
+                    except Exception as e:
+                        print(f"[AUTOMATION] Draft buffer claim failed for setting id={s.id}: {e}")
+                image_prompt = None
+                png_bytes = None
+                if buffered is not None:
+                    topic = buffered.topic or topic
+                    caption, image_prompt = buffered.caption, buffered.image_prompt
+                    try:
+                        hashtags = json.loads(buffered.hashtags) if buffered.hashtags else []
+                    except Exception:
+                        hashtags = []
+                    print(f"[AUTOMATION] Using buffered draft id={buffered.id} for setting id={s.id}")
+                else:
+                    # caption -> hashtags and image prompt -> background run concurrently;
+                    # the background comes from the library when this account has never used it (else a new image)
+                    try:
+                        draft = background_library.draft_content(db, topic, s.account_id, caption_fallback=f"Auto draft: {topic}")
+                        caption, hashtags = draft.caption, draft.hashtags
+                        image_prompt, png_bytes = draft.image_prompt, draft.image_bytes
+                    except Exception:
+                        caption, hashtags = f"Auto draft: {topic}", []
+                # The text-less background is not uploaded to R2; it goes to the local content-addressed store.
+                public_bg = None if png_bytes or buffered is not None else "https://images.pexels.com/photos/1032650/pexels-photo-1032650.jpeg"
                 post = Post(
                     account_id=s.account_id,
                     topic=topic,
                     caption=caption,
                     hashtags=json.dumps(hashtags),
-                    image_prompt=image_prompt if "image_prompt" in locals() else None,
-                    image_url=public_url,
+                    image_prompt=image_prompt,
+                    image_url=public_bg,
                     status=PostStatus.APPROVED if auto_approve else PostStatus.DRAFT,
                     created_at=datetime.utcnow(),
                 )
+                # Lazy render: drafts only keep the render inputs; the final image is
+                # rendered + uploaded on approve/schedule/publish (below when auto-approved).
+                if buffered is not None:
+                    post.background_path = buffered.background_path
+                    post.render_params = buffered.render_params
+                elif png_bytes:
+                    try:
+                        post_render.attach_render_inputs(post, png_bytes, caption, "ince düşlerim", "minimal_dark")
+                    except Exception as e:
+                        print(f"[AUTOMATION] Failed to store render inputs for setting id={s.id}: {e}")
+                # Near-duplicate guard: skip drafts whose image is near-identical to one of this account's posts
+                # (buffered drafts were already checked by draft_buffer.claim with their stored hash)
+                draft_hash = None
+                if buffered is not None:
+                    draft_hash = image_dedup.to_unsigned(buffered.dhash) if buffered.dhash is not None else None
+                elif IMAGE_DEDUP_ENABLED and post_render.has_render_inputs(post):
+                    # one retry with a freshly generated background; if that is a near-duplicate too,
+                    # the day's run claim is released so a later check can try again
+                    for attempt in range(2):
+                        try:
+                            draft_hash = post_render.draft_hash(post)
+                            image_dedup.check(db, s.account_id, draft_hash)
+                            break
+                        except image_dedup.DuplicateImageError as e:
+                            post_render.release_background(db, post)
+                            draft_hash = None
+                            if attempt == 0:
+                                print(f"[AUTOMATION] Near-duplicate draft for setting id={s.id}, new background: {e}")
+                                try:
+                                    png_bytes = content_ai.generate_image_png_bytes(image_prompt or topic)
+                                    post_render.attach_render_inputs(post, png_bytes, caption, "ince düşlerim", "minimal_dark")
+                                    continue
+                                except Exception as gen_err:
+                                    print(f"[AUTOMATION] New background failed for setting id={s.id}: {gen_err}")
+                            print(f"[AUTOMATION] Skipping draft for setting id={s.id}: {e}")
+                            _release_run_claim(s.id, run_date)
+                            return
+                        except Exception as e:
+                            print(f"[AUTOMATION] Duplicate check failed for setting id={s.id}: {e}")
+                            break
                 # Second safety check (re-query just before commit to reduce race windows).
                 try:
                     cutoff2 = datetime.utcnow() - timedelta(minutes=recent_threshold_minutes)
@@ -202,19 +257,41 @@ def run_automation_check():
                             print(f"[AUTOMATION] Aborting commit for draft generation for setting id={s.id} - recent drafts found ({recent_cnt2}) just before commit.")
                         except Exception:
                             pass
+                        if buffered is not None:
+                            try:
+                                draft_buffer.unclaim(db, buffered)
+                            except Exception:
+                                pass
+                        else:
+                            post_render.release_background(db, post)
                         return
                 except Exception:
                     pass
 
                 db.add(post)
+                if buffered is not None:
+                    draft_buffer.consume(db, buffered)
                 # store last_run_at in UTC
                 s.last_run_at = datetime.utcnow()
                 db.add(s)
                 db.commit()
+                hashtag_index.add_post(post)
+                if draft_hash is not None:
+                    try:
+                        image_dedup.record(db, post.id, draft_hash, "preview")
+                        db.commit()
+                    except Exception as e:
+                        print(f"[DEDUP] Failed to record hash for draft id={post.id}: {e}")
                 try:
                     print(f"[AUTOMATION] Generated draft id={post.id} for setting id={s.id} topic={topic}")
                 except Exception:
                     pass
+                public_url = post.image_url
+                if auto_approve or auto_publish_post or auto_publish_story or not LAZY_FINAL_RENDER:
+                    try:
+                        public_url = post_render.materialize(post, db)
+                    except Exception as e:
+                        print(f"[AUTOMATION] Final render failed for draft id={post.id}: {e}")
                 # If auto publish requested, dispatch publish tasks
                 try:
                     from worker.tasks import publish_post, publish_story_task
@@ -0,0 +1,233 @@
+"""Request coalescing (single-flight) for expensive OpenAI calls.
+
+Aynı anahtarla eşzamanlı gelen çağrılar (dashboard çift submit, automation ile
+manuel /api/generate çakışması) tek bir OpenAI isteğini paylaşır:
+
+- Process içi: ilk çağıran (leader) çalıştırır, diğer thread'ler aynı sonucu / hatayı bekler.
+- Process'ler arası (API + Celery worker'lar): leader inflight_calls tablosuna satır ekler
+  (primary key = anahtar); diğer process'ler satırı görürse sonuç yazılana kadar bekler
+  (SINGLE_FLIGHT_POLL aralığıyla). Sonuç sadece o sırada bekleyenler için kısa süre
+  (_DONE_GRACE) tutulur; çağrı bittikten sonra gelen yeni çağıran sonucu almaz, kendisi
+  çalıştırır (bu modül cache değildir). Leader çökerse kilit SINGLE_FLIGHT_LEASE_SECONDS sonunda düşer ve bekleyenlerden biri devralır.
+  Leader hata alırsa satır silinir, diğer process'ler çağrıyı kendileri tekrar dener.
+
+DB kullanılamazsa (tablo yok, kilitli vb.) çağrı doğrudan çalışır; coalescing en iyi çabadır.
+
+Provides:
+- make_key(*parts) -> str
+- do(namespace, key, fn, *args, **kwargs) -> fn sonucu (bytes / JSON'a çevrilebilir değer)
+- stats() -> dict
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from app.config import (
+    SINGLE_FLIGHT_DB,
+    SINGLE_FLIGHT_ENABLED,
+    SINGLE_FLIGHT_LEASE_SECONDS,
+    SINGLE_FLIGHT_WAIT_SECONDS,
+)
+
+SINGLE_FLIGHT_POLL = 0.25
+# biten çağrının sonucu, o sırada poll eden process'ler okuyabilsin diye bu kadar saniye kalır
+_DONE_GRACE = 4 * SINGLE_FLIGHT_POLL
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+_lock = threading.Lock()
+_calls: dict[str, "_Call"] = {}
+_stats = {"leader": 0, "shared_thread": 0, "shared_process": 0, "takeover": 0, "db_errors": 0}
+_table_ready = False
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def make_key(*parts) -> str:
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def _encode(value) -> tuple[str, bytes]:
+    if isinstance(value, (bytes, bytearray)):
+        return "bytes", bytes(value)
+    return "json", json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _decode(kind: str, data: bytes):
+    return data if kind == "bytes" else json.loads(data.decode("utf-8"))
+
+
+def _session():
+    global _table_ready
+    from app.database import SessionLocal, engine
+    from app.models import InflightCall
+
+    if not _table_ready:
+        with _lock:  # iki thread aynı anda CREATE TABLE denemesin
+            if not _table_ready:
+                InflightCall.__table__.create(bind=engine, checkfirst=True)
+                _table_ready = True
+    return SessionLocal()
+
+
+def _claim(key: str, waiting: bool = False):
+    """
+    ("owner", None) | ("done", sonuç) | ("running", None).
+    Biten çağrının sonucu sadece çağrı sürerken beklemeye başlamış olanlara (waiting) verilir;
+    yeni gelen çağıran biten satırı silip kendisi owner olur.
+    """
+    from app.models import InflightCall
+
+    db = _session()
+    try:
+        now = datetime.utcnow()
+        expired = InflightCall.expires_at < now
+        if not waiting:
+            expired = expired | ((InflightCall.key == key) & (InflightCall.status == "done"))
+        db.query(InflightCall).filter(expired).delete(synchronize_session=False)
+        db.commit()
+        try:
+            db.add(
+                InflightCall(
+                    key=key,
+                    owner=_OWNER,
+                    status="running",
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=SINGLE_FLIGHT_LEASE_SECONDS),
+                )
+            )
+            db.commit()
+            return "owner", None
+        except IntegrityError:
+            db.rollback()
+        row = db.query(InflightCall).filter(InflightCall.key == key).first()
+        if waiting and row is not None and row.status == "done" and row.result is not None:
+            return "done", _decode(row.result_kind, row.result)
+        return "running", None
+    finally:
+        db.close()
+
+
+def _finish(key: str, result=None, failed: bool = False) -> None:
+    from app.models import InflightCall
+
+    db = _session()
+    try:
+        q = db.query(InflightCall).filter(InflightCall.key == key, InflightCall.owner == _OWNER)
+        if failed:
+            q.delete(synchronize_session=False)
+        else:
+            kind, data = _encode(result)
+            q.update(
+                {
+                    InflightCall.status: "done",
+                    InflightCall.result_kind: kind,
+                    InflightCall.result: data,
+                    InflightCall.expires_at: datetime.utcnow() + timedelta(seconds=_DONE_GRACE),
+                },
+                synchronize_session=False,
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _run_shared(key: str, fn: Callable, args, kwargs):
+    """Process'ler arası katman: tabloda leader olan çalıştırır, diğerleri sonucu bekler."""
+    if not SINGLE_FLIGHT_DB:
+        return fn(*args, **kwargs)
+    deadline = time.monotonic() + SINGLE_FLIGHT_WAIT_SECONDS
+    waited = False
+    while True:
+        try:
+            state, value = _claim(key, waiting=waited)
+        except Exception as e:
+            _count("db_errors")
+            print(f"[SINGLE_FLIGHT] Lock table unavailable, running directly: {e}")
+            return fn(*args, **kwargs)
+        if state == "done":
+            _count("shared_process")
+            return value
+        if state == "owner":
+            if waited:
+                _count("takeover")
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                try:
+                    _finish(key, failed=True)
+                except Exception:
+                    _count("db_errors")
+                raise
+            try:
+                _finish(key, result)
+            except Exception as e:
+                _count("db_errors")
+                print(f"[SINGLE_FLIGHT] Could not store result: {e}")
+            return result
+        if time.monotonic() > deadline:
+            print("[SINGLE_FLIGHT] Timed out waiting for another worker, running directly")
+            return fn(*args, **kwargs)
+        waited = True
+        time.sleep(SINGLE_FLIGHT_POLL)
+
+
+def do(namespace: str, key: str, fn: Callable, *args, **kwargs):
+    """
+    fn(*args, **kwargs)'ı namespace + key için tek sefer çalıştırır; eşzamanlı çağıranlar sonucu paylaşır.
+    Sonuç bytes veya JSON'a çevrilebilir olmalı (process'ler arası paylaşım için).
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return fn(*args, **kwargs)
+    full = f"{namespace}:{key}"
+    with _lock:
+        call = _calls.get(full)
+        leader = call is None
+        if leader:
+            call = _calls[full] = _Call()
+    if not leader:
+        if call.event.wait(SINGLE_FLIGHT_WAIT_SECONDS):
+            _count("shared_thread")
+            if call.error is not None:
+                raise call.error
+            return call.result
+        return fn(*args, **kwargs)
+    _count("leader")
+    try:
+        call.result = _run_shared(hashlib.sha256(full.encode("utf-8")).hexdigest(), fn, args, kwargs)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        call.event.set()
+        with _lock:
+            _calls.pop(full, None)
+
+
+def stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+        out["in_flight"] = len(_calls)
+    out["enabled"] = SINGLE_FLIGHT_ENABLED
+    out["cross_process"] = SINGLE_FLIGHT_DB
+    return out
@@ -1,11 +1,11 @@
 """Unified storage backend combining R2 and legacy upload methods.
 
 Provides a single API used by the rest of the app:
-- upload_bytes(png_bytes, filename, prefix) -> public_url
+- upload_bytes(png_bytes, filename, prefix, content_type=None) -> public_url
 - delete_key(key) -> bool
 - url_for_key(key) -> str
 - generate_presigned_get_from_url(image_url, expires=300) -> Optional[str]
-- upload_to_remote_server(png_bytes, filename, prefix) -> public_url
+- upload_to_remote_server(png_bytes, filename, prefix, content_type=None) -> public_url
 - save_png_bytes_to_generated(png_bytes) -> (relative_path, public_url)
 - delete_remote_file(image_url) -> bool
 """
@@ -96,14 +96,19 @@ def generate_presigned_get_from_url(image_url: str, expires: int = 300) -> Optio
     return None
 
 
-def upload_bytes(png_bytes: bytes, filename: str, prefix: str = "ig/post") -> str:
+def _content_type_for(filename: str, content_type: str | None = None) -> str:
+    if content_type:
+        return content_type
+    guessed, _ = mimetypes.guess_type(filename)
+    return guessed or "application/octet-stream"
+
+
+def upload_bytes(png_bytes: bytes, filename: str, prefix: str = "ig/post", content_type: str | None = None) -> str:
     client = _get_s3_client()
     if not client:
         raise RuntimeError("R2 configuration missing")
     key = str(PurePosixPath(prefix) / filename)
-    content_type, _ = mimetypes.guess_type(filename)
-    if not content_type:
-        content_type = "application/octet-stream"
+    content_type = _content_type_for(filename, content_type)
     client.put_object(
         Bucket=R2_BUCKET_NAME,
         Key=key,
@@ -125,11 +130,12 @@ def delete_key(key: str) -> bool:
         return False
 
 
-def upload_to_remote_server(png_bytes: bytes, filename: str, prefix: str = "ig/post") -> str:
+def upload_to_remote_server(png_bytes: bytes, filename: str, prefix: str = "ig/post", content_type: str | None = None) -> str:
+    # content_type: encoder profile'ın content type'ı (jpeg/webp); None ise dosya adından tahmin edilir
     # Try R2 first
     if R2_ACCOUNT_ID and R2_BUCKET_NAME:
         try:
-            return upload_bytes(png_bytes, filename, prefix=prefix)
+            return upload_bytes(png_bytes, filename, prefix=prefix, content_type=content_type)
         except Exception:
             pass
 
@@ -137,7 +143,7 @@ def upload_to_remote_server(png_bytes: bytes, filename: str, prefix: str = "ig/p
     if UPLOAD_API_URL and UPLOAD_API_KEY:
         try:
             headers = {"Authorization": f"Bearer {UPLOAD_API_KEY}"} if UPLOAD_API_KEY else {}
-            files = {"file": (filename, png_bytes, "image/png")}
+            files = {"file": (filename, png_bytes, _content_type_for(filename, content_type))}
             data = {"path": "ig", "filename": filename}
             resp = requests.post(UPLOAD_API_URL, files=files, data=data, headers=headers, timeout=30)
             resp.raise_for_status()
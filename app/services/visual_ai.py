@@ -1,5 +1,6 @@
 """Görsel üretimi (OpenAI Images API üzerinden)."""
 
+from app.services import rate_limiter
 from app.services.content_ai import get_client
 
 
@@ -16,13 +17,14 @@ def generate_image(prompt: str) -> str:
     """
     try:
         client = get_client()
-        resp = client.images.generate(
-            model="dall-e-3",  # gpt-image-1 yok, dall-e-3 kullan
-            prompt=f"Square 1:1 Instagram post image, high quality, {prompt}",
-            size="1024x1024",
-            n=1,
-            response_format="url",  # DALL-E 3 için tek desteklenen format
-        )
+        with rate_limiter.limit("dall-e-3"):
+            resp = client.images.generate(
+                model="dall-e-3",  # gpt-image-1 yok, dall-e-3 kullan
+                prompt=f"Square 1:1 Instagram post image, high quality, {prompt}",
+                size="1024x1024",
+                n=1,
+                response_format="url",  # bu yol URL döndürür (bytes için content_ai.generate_image_png_bytes)
+            )
         # openai>=1.x response
         url = resp.data[0].url  # type: ignore[attr-defined]
         if not url:
@@ -8,18 +8,22 @@ Behavior:
      - copy ig_post_id_story -> ig_post_id_post
      - clear ig_post_id_story
      - set published_at_post/published_at if missing and status=PUBLISHED
-- 2) For posts with identical image_url created within DUPLICATE_WINDOW seconds:
-     - keep the earliest (by created_at) and mark others as FAILED with error_message noting duplicate removal
+- 2) Duplicate images: delegated to the perceptual-hash index (app/services/image_dedup.py)
+     via tools/backfill_image_hashes.py --mark-failed: old posts are hashed, and per account
+     the earliest post of each near-duplicate group is kept; unpublished copies are marked
+     FAILED with error_message noting duplicate removal. New duplicates are refused up front.
 
 This is non-reversible except via the DB backup created at start.
 """
 import sqlite3
 import shutil
+import sys
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 
 ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "tools"))
 DB = ROOT / "autosocial.db"
 BACKUP = ROOT / f"autosocial.db.bak.{int(time.time())}"
 
@@ -42,45 +46,6 @@ def fix_story_to_post(conn):
                     (story_id, published_at_story or now, published_at_story or now, post_id))
     conn.commit()
 
-def remove_close_duplicates(conn, window_seconds=120):
-    cur = conn.cursor()
-    # find image_urls with multiple posts
-    cur.execute("SELECT image_url, COUNT(*) as c FROM posts WHERE image_url IS NOT NULL GROUP BY image_url HAVING c > 1")
-    groups = cur.fetchall()
-    print("Duplicate image_url groups:", len(groups))
-    removed = 0
-    for image_url, cnt in groups:
-        cur.execute("SELECT id, created_at FROM posts WHERE image_url = ? ORDER BY created_at ASC", (image_url,))
-        rows = cur.fetchall()
-        # keep first, consider others duplicates if within window_seconds of first
-        if not rows:
-            continue
-        keep_id, keep_created = rows[0]
-        try:
-            keep_dt = datetime.fromisoformat(str(keep_created))
-        except Exception:
-            keep_dt = None
-        for r in rows[1:]:
-            pid, created = r
-            is_dup = False
-            if keep_dt:
-                try:
-                    cur_dt = datetime.fromisoformat(str(created))
-                    delta = (cur_dt - keep_dt).total_seconds()
-                    if abs(delta) <= window_seconds:
-                        is_dup = True
-                except Exception:
-                    is_dup = True
-            else:
-                is_dup = True
-            if is_dup:
-                note = f"duplicate_removed; kept_post_id={keep_id}"
-                print(f" - Marking post {pid} as FAILED (duplicate of {keep_id})")
-                cur.execute("UPDATE posts SET status = 'failed', error_message = COALESCE(error_message, '') || ? WHERE id = ?", (f"; {note}", pid))
-                removed += 1
-    conn.commit()
-    print("Duplicates marked failed:", removed)
-
 def main():
     if not DB.exists():
         print("DB not found:", DB)
@@ -89,10 +54,12 @@ def main():
     conn = sqlite3.connect(str(DB))
     try:
         fix_story_to_post(conn)
-        remove_close_duplicates(conn, window_seconds=120)
-        print("Cleanup complete.")
     finally:
         conn.close()
+    import backfill_image_hashes
+
+    backfill_image_hashes.run(mark=True)
+    print("Cleanup complete.")
 
 if __name__ == "__main__":
     main()
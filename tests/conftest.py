@@ -0,0 +1,49 @@
+"""Shared fixtures: isolated SQLite files in a temp dir, no OpenAI / render pool."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_TMP = Path(tempfile.mkdtemp(prefix="autosocial-tests-"))
+os.environ["LLM_CACHE_DB"] = ""
+os.environ["RATE_LIMIT_DB"] = str(_TMP / "rate_limits.db")
+os.environ["RENDER_POOL_SIZE"] = "0"
+
+# app.database always opens sqlite:///./autosocial.db; the path is resolved when the engine is created
+_cwd = os.getcwd()
+os.chdir(_TMP)
+try:
+    from app.database import Base, SessionLocal, engine  # noqa: E402
+    from app import models  # noqa: E402,F401
+finally:
+    os.chdir(_cwd)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def empty_hashtag_index(monkeypatch):
+    """Boş, DB'den refresh etmeyen hashtag_index."""
+    from app.services import hashtag_index
+
+    monkeypatch.setattr(hashtag_index, "_tag_ids", {})
+    monkeypatch.setattr(hashtag_index, "_tag_names", [])
+    monkeypatch.setattr(hashtag_index, "_topic_counts", None)
+    monkeypatch.setattr(hashtag_index, "_cooc", None)
+    monkeypatch.setattr(hashtag_index, "_last_post_id", 0)
+    monkeypatch.setattr(hashtag_index, "_last_refresh", float("inf"))
+    return hashtag_index
@@ -0,0 +1,43 @@
+import json
+
+from app.services import content_ai, hashtag_index, llm_cache
+
+
+def test_draft_uses_hashtag_index_without_llm_hashtag_call(monkeypatch, empty_hashtag_index):
+    tags = [f"#etiket{i}" for i in range(12)]
+    for _ in range(3):
+        hashtag_index.add("aşk", tags)
+
+    prompts = []
+
+    def fake_chat(messages, model, cache=True, ttl=None, **params):
+        prompts.append((messages[0]["content"], params))
+        return json.dumps({"caption": "Sevgi emek ister.", "image_prompt": "soft sunset"})
+
+    monkeypatch.setattr(llm_cache, "chat", fake_chat)
+    monkeypatch.setattr(content_ai, "HASHTAG_MODE", "index")
+
+    draft = content_ai.generate_draft_content("aşk", with_image=False, combined=True)
+
+    assert len(prompts) == 1  # sadece combined istek
+    prompt, params = prompts[0]
+    assert "hashtags" not in params["response_format"]["json_schema"]["schema"]["properties"]
+    assert "- hashtags:" not in prompt
+    assert draft.caption == "Sevgi emek ister."
+    assert len(draft.hashtags) == 10 and set(draft.hashtags) <= set(tags)
+
+
+def test_combined_keeps_hashtags_in_llm_mode(monkeypatch):
+    seen = {}
+
+    def fake_chat(messages, model, cache=True, ttl=None, **params):
+        seen["schema"] = params["response_format"]["json_schema"]["schema"]
+        return json.dumps({"caption": "c", "hashtags": ["#a", "#b"], "image_prompt": "p"})
+
+    monkeypatch.setattr(llm_cache, "chat", fake_chat)
+    monkeypatch.setattr(content_ai, "HASHTAG_MODE", "llm")
+
+    result = content_ai.generate_combined("aşk", count=2)
+
+    assert "hashtags" in seen["schema"]["required"]
+    assert result["hashtags"] == ["#a", "#b"]
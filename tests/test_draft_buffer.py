@@ -0,0 +1,70 @@
+import threading
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal
+from app.models import DraftBuffer
+from app.services import draft_buffer
+
+
+def _buffered(db, tmp_path, account_id=1, topic="aşk"):
+    bg = tmp_path / f"bg-{topic}.png"
+    bg.write_bytes(b"png")
+    now = datetime.utcnow()
+    item = DraftBuffer(
+        account_id=account_id,
+        topic=topic,
+        caption="c",
+        hashtags="[]",
+        background_path=str(bg),  # mutlak yol: BASE_DIR / yol -> yolun kendisi
+        created_at=now,
+        expires_at=now + timedelta(hours=1),
+    )
+    db.add(item)
+    db.commit()
+    return item
+
+
+def test_concurrent_claim_hands_out_an_item_once(db, tmp_path):
+    item = _buffered(db, tmp_path)
+    barrier = threading.Barrier(4)
+    won = []
+
+    def worker():
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            claimed = draft_buffer.claim(session, 1)
+            if claimed is not None:
+                won.append(claimed.id)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert won == [item.id]
+    assert draft_buffer.buffered_count(db, 1) == 0
+
+
+def test_claim_prefers_matching_topic_and_unclaim_returns_item(db, tmp_path):
+    _buffered(db, tmp_path, topic="dram")
+    wanted = _buffered(db, tmp_path, topic="aşk")
+
+    claimed = draft_buffer.claim(db, 1, topic="aşk")
+    assert claimed.id == wanted.id
+    assert draft_buffer.buffered_count(db, 1) == 1
+
+    draft_buffer.unclaim(db, claimed)
+    assert draft_buffer.buffered_count(db, 1) == 2
+
+
+def test_expire_drops_stale_rows(db, tmp_path):
+    item = _buffered(db, tmp_path)
+    item.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+
+    assert draft_buffer.expire(db) == 1
+    assert db.query(DraftBuffer).count() == 0
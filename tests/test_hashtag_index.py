@@ -0,0 +1,26 @@
+def test_add_skips_fallback_and_topic_word_tags(empty_hashtag_index):
+    index = empty_hashtag_index
+    for _ in range(3):
+        index.add("platonik aşk", ["#AI", "#Platonik", "#Motivation", "#kalpsızısı", "#gizlisevda"])
+
+    assert index.stats()["tags"] == 2
+    ranked = index.rank("platonik aşk", min_support=1)
+    assert ranked == ["#kalpsızısı", "#gizlisevda"]
+    assert not {"#AI", "#Platonik", "#Motivation"} & set(ranked)
+
+
+def test_add_ignores_post_with_only_filler(empty_hashtag_index):
+    empty_hashtag_index.add("aşk", ["#AI", "#Technology"])
+
+    assert empty_hashtag_index.stats()["tags"] == 0
+    assert empty_hashtag_index.rank("aşk", min_support=1) == []
+
+
+def test_rank_orders_by_topic_frequency_and_min_support(empty_hashtag_index):
+    index = empty_hashtag_index
+    for _ in range(3):
+        index.add("aşk", ["#sevgi", "#kalp"])
+    index.add("aşk", ["#sevgi", "#nadir"])
+
+    assert index.rank("aşk", min_support=1) == ["#sevgi", "#kalp", "#nadir"]
+    assert index.rank("aşk", min_support=2) == ["#sevgi", "#kalp"]
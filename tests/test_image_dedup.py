@@ -0,0 +1,46 @@
+import pytest
+
+from app.models import Post, PostStatus
+from app.services import image_dedup
+
+BASE = 0xF0F0_1234_ABCD_8001  # >= 2**63: SQLite'ta negatif saklanır
+
+
+def _flip(h, *bits):
+    for b in bits:
+        h ^= 1 << b
+    return h
+
+
+def _post_with_hash(db, h, account_id=1, status=PostStatus.DRAFT):
+    post = Post(account_id=account_id, caption="c", status=status)
+    db.add(post)
+    db.commit()
+    image_dedup.record(db, post.id, h)
+    db.commit()
+    return post
+
+
+def test_find_near_band_boundary(db):
+    near3 = _post_with_hash(db, _flip(BASE, 0, 16, 32))  # üç bantta birer bit: bir bant ortak
+    far4 = _post_with_hash(db, _flip(BASE, 1, 17, 33, 49))  # her bantta bir bit: ortak bant yok
+
+    assert image_dedup.find_near(db, 1, BASE, max_distance=3) == [(near3.id, 3)]
+    # 3'ten büyük mesafede bant garantisi yok: hesabın tüm hash'leri taranır
+    assert image_dedup.find_near(db, 1, BASE, max_distance=4) == [(near3.id, 3), (far4.id, 4)]
+
+
+def test_find_near_is_scoped_to_account_and_skips_failed(db):
+    _post_with_hash(db, BASE, account_id=2)
+    _post_with_hash(db, BASE, account_id=1, status=PostStatus.FAILED)
+
+    assert image_dedup.find_near(db, 1, BASE) == []
+
+
+def test_check_raises_and_stored_hash_round_trips(db):
+    post = _post_with_hash(db, BASE)
+
+    assert image_dedup.ensure_hash(db, post) == BASE
+    with pytest.raises(image_dedup.DuplicateImageError) as exc:
+        image_dedup.check(db, 1, _flip(BASE, 5))
+    assert (exc.value.post_id, exc.value.distance) == (post.id, 1)
@@ -0,0 +1,57 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from app.services import content_ai, llm_cache
+
+
+class _FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, messages, **params):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(0.3)  # istek sürerken diğer çağıranlar gelir
+        message = SimpleNamespace(content=f"cevap {n}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=SimpleNamespace(total_tokens=10))
+
+
+def _fake_client(monkeypatch):
+    completions = _FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(content_ai, "get_client", lambda: client)
+    return completions
+
+
+def test_concurrent_identical_uncached_chat_calls_share_one_request(db, monkeypatch):
+    completions = _fake_client(monkeypatch)
+    messages = [{"role": "user", "content": "caption yaz"}]
+    barrier = threading.Barrier(5)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(llm_cache.chat(messages, model="gpt-4o-mini", cache=False))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert completions.calls == 1
+    assert results == ["cevap 1"] * 5
+
+
+def test_uncached_call_after_completion_gets_a_new_answer(db, monkeypatch):
+    completions = _fake_client(monkeypatch)
+    messages = [{"role": "user", "content": "caption yaz"}]
+
+    first = llm_cache.chat(messages, model="gpt-4o-mini", cache=False)
+    second = llm_cache.chat(messages, model="gpt-4o-mini", cache=False)
+
+    assert completions.calls == 2
+    assert first != second
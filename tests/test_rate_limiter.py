@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from app.services import rate_limiter
+
+
+@pytest.fixture
+def limiter(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_DB", str(tmp_path / "rate_limits.db"))
+    monkeypatch.setattr(rate_limiter, "_db_ready", False)
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_MAX_CONCURRENT", 1)
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_MAX_QUEUE", 10)
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_MAX_WAIT", 20)
+    monkeypatch.setattr(rate_limiter, "LIMITS", {})
+    return rate_limiter
+
+
+def _wait_queue(limiter, size, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while limiter.stats()["queue"] < size:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.01)
+
+
+def _queue_behind_hold(limiter, names):
+    """Model meşgulken names sırasıyla bekleyen ekler, sonra bırakır; giriş sırasını döner."""
+    order = []
+
+    def worker(name):
+        with limiter.priority(name.split("-")[0]):
+            with limiter.limit("gpt-test"):
+                order.append(name)
+                time.sleep(0.05)
+
+    with limiter.limit("gpt-test"):
+        threads = []
+        for i, name in enumerate(names, start=1):
+            t = threading.Thread(target=worker, args=(name,))
+            t.start()
+            threads.append(t)
+            _wait_queue(limiter, i)  # enqueued zamanları kesin sıralı olsun
+    for t in threads:
+        t.join()
+    return order
+
+
+def test_higher_priority_waiters_go_first(limiter):
+    order = _queue_behind_hold(limiter, ["background", "automation", "manual"])
+
+    assert order == ["manual", "automation", "background"]
+
+
+def test_same_priority_is_fifo(limiter):
+    order = _queue_behind_hold(limiter, ["automation-1", "automation-2", "manual", "automation-3"])
+
+    assert order == ["manual", "automation-1", "automation-2", "automation-3"]
+
+
+def test_full_queue_rejects(limiter, monkeypatch):
+    monkeypatch.setattr(limiter, "RATE_LIMIT_MAX_QUEUE", 0)
+
+    with pytest.raises(limiter.RateLimitExceeded):
+        with limiter.limit("gpt-test"):
+            pass
+    assert limiter.stats()["rejected_queue"] >= 1
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from app.services import single_flight
+
+
+@pytest.fixture
+def sf(db, monkeypatch):
+    # db fixture tabloları yeniden kurar; inflight_calls da yeniden oluşturulsun
+    monkeypatch.setattr(single_flight, "_table_ready", False)
+    return single_flight
+
+
+def _run_threads(n, target):
+    barrier = threading.Barrier(n)
+    results, errors = [], []
+
+    def worker():
+        barrier.wait()
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+def _slow(calls, value="ok", error=None):
+    def fn():
+        calls.append(1)
+        time.sleep(0.3)
+        if error is not None:
+            raise error
+        return value
+
+    return fn
+
+
+def test_concurrent_calls_share_one_execution(sf):
+    calls = []
+    fn = _slow(calls, {"caption": "c"})
+
+    results, errors = _run_threads(5, lambda: sf.do("test", "k", fn))
+
+    assert errors == []
+    assert len(calls) == 1
+    assert results == [{"caption": "c"}] * 5
+    assert sf.stats()["in_flight"] == 0
+
+
+def test_error_reaches_every_waiter(sf):
+    calls = []
+    fn = _slow(calls, error=ValueError("boom"))
+
+    results, errors = _run_threads(4, lambda: sf.do("test", "err", fn))
+
+    assert results == []
+    assert len(calls) == 1
+    assert len(errors) == 4 and all(isinstance(e, ValueError) for e in errors)
+
+
+def test_finished_call_is_not_reused(sf):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return len(calls)
+
+    assert sf.do("test", "seq", fn) == 1
+    assert sf.do("test", "seq", fn) == 2
+
+
+def test_lock_table_shares_result_across_leaders(sf, monkeypatch):
+    # farklı process'leri taklit: iki thread process içi katmanı atlayıp aynı tablo anahtarını kullanır
+    monkeypatch.setattr(sf, "SINGLE_FLIGHT_POLL", 0.05)
+    calls = []
+    fn = _slow(calls, b"png-bytes")
+
+    results, errors = _run_threads(2, lambda: sf._run_shared("shared-key", fn, (), {}))
+
+    assert errors == []
+    assert len(calls) == 1
+    assert results == [b"png-bytes", b"png-bytes"]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Index existing posts in the perceptual-hash table (image_hashes).
+
+Posts created before the near-duplicate guard have no hash; this computes one
+from the local media file (image_path) or the stored image_url, and lists
+near-duplicate groups per account so they can be reviewed. With --mark-failed
+the later, unpublished members of each group are marked FAILED (the earliest
+post and published posts are kept).
+
+Usage: python tools/backfill_image_hashes.py [--report-only] [--mark-failed]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import ImageHash, Post, PostStatus  # noqa: E402
+from app.services import image_dedup  # noqa: E402
+
+
+def backfill(db, report_only=False):
+    """post_id -> hash; report_only ise sadece kayıtlı hash'ler okunur."""
+    posts = db.query(Post).order_by(Post.created_at.asc(), Post.id.asc()).all()
+    hashes = {}
+    for post in posts:
+        if report_only:
+            row = db.query(ImageHash).filter(ImageHash.post_id == post.id).first()
+            h = image_dedup.to_unsigned(row.dhash) if row else None
+        else:
+            h = image_dedup.ensure_hash(db, post)
+        if h is not None:
+            hashes[post.id] = h
+    print(f"Indexed {len(hashes)} / {len(posts)} posts")
+    return posts, hashes
+
+
+def duplicate_groups(db, posts, hashes):
+    """[(kept_post, [(post_id, distance), ...])]; en eski post tutulur."""
+    groups = []
+    seen = set()
+    for post in posts:
+        if post.id not in hashes or post.id in seen:
+            continue
+        near = image_dedup.find_near(db, post.account_id, hashes[post.id], exclude_post_id=post.id)
+        near = [(pid, d) for pid, d in near if pid not in seen]
+        if near:
+            seen.add(post.id)
+            seen.update(pid for pid, _ in near)
+            groups.append((post, near))
+    return groups
+
+
+def mark_failed(db, groups):
+    """Grupların yayınlanmamış kopyalarını FAILED yapar; işaretlenen sayıyı döner."""
+    marked = 0
+    for kept, near in groups:
+        for pid, distance in near:
+            post = db.get(Post, pid)
+            if post is None or post.status == PostStatus.PUBLISHED:
+                continue
+            note = f"duplicate_removed; kept_post_id={kept.id}; distance={distance}"
+            print(f" - Marking post {pid} as FAILED (near-duplicate of {kept.id})")
+            post.status = PostStatus.FAILED
+            post.error_message = f"{post.error_message}; {note}" if post.error_message else note
+            db.add(post)
+            marked += 1
+    db.commit()
+    print("Duplicates marked failed:", marked)
+    return marked
+
+
+def run(report_only=False, mark=False):
+    Base.metadata.create_all(bind=engine, tables=[ImageHash.__table__])
+    db = SessionLocal()
+    try:
+        posts, hashes = backfill(db, report_only)
+        groups = duplicate_groups(db, posts, hashes)
+        for kept, near in groups:
+            others = ", ".join(f"{pid} (d={d})" for pid, d in near)
+            print(f"Account {kept.account_id}: post {kept.id} ~ {others}")
+        if mark:
+            mark_failed(db, groups)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report-only", action="store_true", help="do not hash new posts, only report duplicates")
+    parser.add_argument("--mark-failed", action="store_true", help="mark unpublished near-duplicates as FAILED")
+    args = parser.parse_args()
+    run(report_only=args.report_only, mark=args.mark_failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Microbenchmark: emoji run splitting, per-character loop vs compiled regex + memo.
+
+Usage: python tools/bench_emoji_runs.py [iterations]
+
+Simulates the layout search: the same caption lines are classified once per
+candidate font size (measure + draw), which is what render_image does.
+"""
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.services.image_render import (  # noqa: E402
+    _has_emoji,
+    _is_emoji_char,
+    _split_line_runs,
+)
+
+CAPTIONS = [
+    "Aşk 💕 bazen ✨ bir bakışta ✨ başlar 🌙🌙 ve hiç bitmez ❤️",
+    "🌸🌸🌸 Güzel günler 🌞 gelecek, sabret ☕️ ve gülümse 😊😊",
+    "Bazen en güzel şeyler sessizce gelir 🌙 ve kalbine yerleşir 💫",
+    "Dostluk 🤝 en kıymetli hazinedir 💎💎 — kaybetme 🙏",
+]
+
+
+def legacy_split(line):
+    runs = []
+    current = []
+    current_emoji = None
+    for c in line:
+        em = _is_emoji_char(c)
+        if current_emoji is None:
+            current_emoji = em
+            current.append(c)
+        elif current_emoji == em:
+            current.append(c)
+        else:
+            runs.append(("".join(current), current_emoji))
+            current = [c]
+            current_emoji = em
+    if current:
+        runs.append(("".join(current), current_emoji))
+    return runs
+
+
+def bench(label, has_emoji, split, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for line in CAPTIONS:
+            if has_emoji(line):
+                split(line)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / (iterations * len(CAPTIONS)) * 1e6
+    print(f"{label:<10} {elapsed * 1000:8.1f} ms total  {per_call:6.2f} us/line")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for line in CAPTIONS:
+        assert list(_split_line_runs(line)) == legacy_split(line), line
+    legacy = bench(
+        "legacy", lambda s: any(_is_emoji_char(c) for c in s), legacy_split, iterations
+    )
+    current = bench("regex", _has_emoji, _split_line_runs, iterations)
+    print(f"speedup    {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
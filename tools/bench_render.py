@@ -0,0 +1,277 @@
+"""Render benchmark suite: image_render on realistic caption corpora, fully offline.
+
+Usage:
+    python tools/bench_render.py [--iterations N] [--out bench_render.json]
+                                 [--compare baseline.json] [--threshold 10]
+                                 [--only wrap,square,story,render_story_image,make_story_from_post]
+                                 [--layout-cache] [--profile ig_jpeg]
+
+Bundled fonts (app/assets/fonts) and synthetic backgrounds are used; network
+steps of render_story_image / make_story_from_post (AI background, upload) are
+replaced by in-memory stand-ins so only the Pillow work is timed.
+
+Per case it reports p50/p95 wall time (ms), per-stage p50 (load, resize,
+layout, draw, composite, encode where the code path exposes them) and the
+process peak RSS after the case. By default the layout cache is cleared before
+every render so each iteration measures a fresh caption; --layout-cache keeps it.
+--profile selects the encoder profile (default: RENDER_ENCODER_PROFILE).
+
+--out writes a JSON baseline; --compare prints p50/p95 deltas against an older
+baseline and exits with status 1 if any case regressed more than --threshold %.
+"""
+import argparse
+import io
+import json
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import PIL  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from app.services import content_ai, image_encoders, image_render, layout_cache, storage_backend  # noqa: E402
+
+CORPORA = {
+    "short_tr": [
+        "Bugün kendine iyi bak.",
+        "Sabır, en güzel duadır.",
+        "Gülümse, yarın yeni bir gün.",
+        "Kalbin neredeyse evin orası.",
+    ],
+    "long_tr": [
+        "Bazen hayat bizi hiç beklemediğimiz yollara sürükler; o yollarda kaybolduğumuzu sanırken "
+        "aslında kendimizi buluruz. Sabırla yürü, her adımın bir anlamı var ve her düşüş seni "
+        "biraz daha güçlü kılıyor. Unutma, en karanlık gece bile sabaha kavuşur.",
+        "İnsan bazen en çok kendine yabancılaşır; kalabalıkların içinde yalnız, sessizliğin içinde "
+        "kalabalık. Kendine dönmek için önce durmayı öğrenmelisin, sonra nefes almayı, sonra da "
+        "affetmeyi. Geçmişi taşımak zorunda değilsin, ondan öğrendiklerini yanına alman yeterli.",
+    ],
+    "emoji_heavy": [
+        "Aşk 💕 bazen ✨ bir bakışta ✨ başlar 🌙🌙 ve hiç bitmez ❤️",
+        "🌸🌸🌸 Güzel günler 🌞 gelecek, sabret ☕️ ve gülümse 😊😊",
+        "Dostluk 🤝 en kıymetli hazinedir 💎💎 — kaybetme 🙏 🌟🌟🌟",
+    ],
+    "long_words": [
+        "Çekoslovakyalılaştıramadıklarımızdanmışsınızcasına",
+        "Muvaffakiyetsizleştiricileştiriveremeyebileceklerimizdenmişsinizcesine bir gün",
+        "a" * 120,
+    ],
+}
+
+
+def synthetic_background(size: tuple[int, int] = (1024, 1024), seed: int = 7) -> bytes:
+    """Gradients + shapes + noise, encoded as PNG (what the AI backend returns)."""
+    rnd = random.Random(seed)
+    w, h = size
+    base = Image.linear_gradient("L").resize(size)
+    img = Image.merge("RGB", (base, base.rotate(90), Image.new("L", size, 90)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y, r = rnd.randrange(w), rnd.randrange(h), rnd.randrange(20, 160)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rnd.randrange(256) for _ in range(3)))
+    img = Image.blend(img, Image.effect_noise(size, 40).convert("RGB"), 0.12)
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def peak_rss_kb() -> int:
+    # Linux reports KiB, macOS bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+class Case:
+    def __init__(self, name: str):
+        self.name = name
+        self.walls: list[float] = []
+        self.stages: dict[str, list[float]] = {}
+
+    def add(self, wall_ms: float, stages: dict | None = None) -> None:
+        self.walls.append(wall_ms)
+        for k, v in (stages or {}).items():
+            self.stages.setdefault(k, []).append(v)
+
+    def summary(self) -> dict:
+        return {
+            "n": len(self.walls),
+            "p50_ms": round(percentile(self.walls, 50), 3),
+            "p95_ms": round(percentile(self.walls, 95), 3),
+            "mean_ms": round(statistics.fmean(self.walls), 3) if self.walls else 0.0,
+            "stages_p50_ms": {k: round(percentile(v, 50), 3) for k, v in self.stages.items()},
+            "peak_rss_kb": peak_rss_kb(),
+        }
+
+
+def _fresh_layout(keep_cache: bool) -> None:
+    if not keep_cache:
+        layout_cache.clear()
+
+
+def bench_wrap(iterations: int, keep_cache: bool) -> dict[str, Case]:
+    font = image_render._load_font(64, "main")
+    cases = {}
+    for corpus, captions in CORPORA.items():
+        case = Case(f"wrap/{corpus}")
+        for _ in range(iterations):
+            for text in captions:
+                image_render._WORD_METRICS.pop(font, None)
+                t = time.perf_counter()
+                image_render._wrap_text(text, font, 840)
+                case.add((time.perf_counter() - t) * 1000)
+        cases[case.name] = case
+    return cases
+
+
+def bench_render(target: str, bg: bytes, iterations: int, keep_cache: bool, profile: str | None) -> dict[str, Case]:
+    cases = {}
+    for corpus, captions in CORPORA.items():
+        case = Case(f"{target}/{corpus}")
+        for _ in range(iterations):
+            for text in captions:
+                _fresh_layout(keep_cache)
+                t = time.perf_counter()
+                result = image_render.render_image_bytes(bg, text, "ince düşlerim", target=target, profile=profile)
+                wall = (time.perf_counter() - t) * 1000
+                stages = dict(result.timings_ms)
+                stages = {"load": stages.pop("decode", 0.0), **stages}
+                case.add(wall, stages)
+        cases[case.name] = case
+    return cases
+
+
+def bench_render_story_image(bg: bytes, iterations: int, keep_cache: bool, profile: str | None) -> dict[str, Case]:
+    cases = {}
+    for corpus, captions in CORPORA.items():
+        case = Case(f"render_story_image/{corpus}")
+        for _ in range(iterations):
+            for text in captions:
+                _fresh_layout(keep_cache)
+                t = time.perf_counter()
+                image_render.render_story_image(text, profile=profile)
+                case.add((time.perf_counter() - t) * 1000)
+        cases[case.name] = case
+    return cases
+
+
+def bench_make_story(post_path: Path, iterations: int, profile: str | None) -> dict[str, Case]:
+    cases = {}
+    for mode in ("blur", "solid"):
+        case = Case(f"make_story_from_post/{mode}")
+        for _ in range(iterations):
+            image_render._SOURCE_CACHE.clear()  # measure download/decode as well
+            t = time.perf_counter()
+            image_render.make_story_from_post(str(post_path), bg_mode=mode, profile=profile)
+            case.add((time.perf_counter() - t) * 1000)
+        cases[case.name] = case
+    return cases
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(current: dict, baseline_path: Path, threshold: float) -> int:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    print(f"\ncompare against {baseline_path} (commit {baseline.get('commit')})")
+    regressions = 0
+    for name, cur in current["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if not old:
+            print(f"  {name:40s} new")
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms"):
+            delta = (cur[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            parts.append(f"{key[:3]} {old[key]:8.2f} -> {cur[key]:8.2f} ({delta:+6.1f}%)")
+            if key == "p50_ms" and delta > threshold:
+                regressions += 1
+                parts.append("REGRESSION")
+        print(f"  {name:40s} " + "  ".join(parts))
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--out", default=None, help="write JSON baseline to this path")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p50 regression threshold in percent")
+    parser.add_argument("--only", default="wrap,square,story,render_story_image,make_story_from_post")
+    parser.add_argument("--layout-cache", action="store_true", help="keep the layout cache between renders")
+    parser.add_argument("--profile", default=None, help="encoder profile (archival_png, fast_png, ig_jpeg, webp_preview)")
+    args = parser.parse_args()
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+
+    bg = synthetic_background()
+    # offline stand-ins for the network steps
+    content_ai.generate_image_prompt = lambda text: f"soft background for {text[:20]}"
+    content_ai.generate_image_png_bytes = lambda prompt: bg
+    uploads = []
+    storage_backend.upload_to_remote_server = lambda data, filename, prefix="ig/post", content_type=None: uploads.append(len(data)) or f"memory://{prefix}/{filename}"
+
+    # warm fonts once so the first case does not pay for font loading
+    image_render.render_image_bytes(bg, "warm up 🌙", "ince düşlerim")
+
+    cases: dict[str, Case] = {}
+    if "wrap" in only:
+        cases.update(bench_wrap(args.iterations, args.layout_cache))
+    for target in ("square", "story"):
+        if target in only:
+            cases.update(bench_render(target, bg, args.iterations, args.layout_cache, args.profile))
+    if "render_story_image" in only:
+        cases.update(bench_render_story_image(bg, args.iterations, args.layout_cache, args.profile))
+    if "make_story_from_post" in only:
+        with tempfile.TemporaryDirectory() as tmp:
+            post_path = Path(tmp) / "post.png"
+            post_path.write_bytes(synthetic_background((1080, 1080), seed=11))
+            cases.update(bench_make_story(post_path, args.iterations, args.profile))
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "iterations": args.iterations,
+        "layout_cache": args.layout_cache,
+        "encoder_profile": image_encoders.get_profile(args.profile).name,
+        "cases": {name: case.summary() for name, case in cases.items()},
+    }
+
+    print(f"{'case':40s} {'n':>4s} {'p50 ms':>9s} {'p95 ms':>9s} {'peak RSS MB':>12s}  stages p50 (ms)")
+    for name, s in report["cases"].items():
+        stages = " ".join(f"{k}={v:.1f}" for k, v in s["stages_p50_ms"].items())
+        print(f"{name:40s} {s['n']:4d} {s['p50_ms']:9.2f} {s['p95_ms']:9.2f} {s['peak_rss_kb'] / 1024:12.1f}  {stages}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nbaseline written to {args.out}")
+    if args.compare:
+        return compare(report, Path(args.compare), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Benchmark: blurred story background, full-resolution blur vs downscale-blur-upscale.
+
+Usage: python tools/bench_story_blur.py [image_path] [iterations]
+
+Without an image a synthetic 1080x1080 post (gradients, shapes, noise) is used.
+For each STORY_BLUR_MODE (quality, fast, numpy) prints the median wall time of
+the background step and its similarity to the quality output (mean absolute
+error, max error, PSNR in dB).
+"""
+import math
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat  # noqa: E402
+
+from app.services.image_render import _blurred_cover  # noqa: E402
+
+WIDTH, HEIGHT = 1080, 1920
+MODES = ("quality", "fast", "numpy")
+
+
+def synthetic_post(size: int = 1080) -> Image.Image:
+    rnd = random.Random(7)
+    img = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    img = Image.merge("RGB", (img.getchannel(0), img.rotate(90).getchannel(0), Image.new("L", (size, size), 90)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x, y = rnd.randrange(size), rnd.randrange(size)
+        r = rnd.randrange(20, 180)
+        col = tuple(rnd.randrange(256) for _ in range(3))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=col)
+    noise = Image.effect_noise((size, size), 40).convert("RGB")
+    return Image.blend(img, noise, 0.15).convert("RGBA")
+
+
+def similarity(a: Image.Image, b: Image.Image) -> tuple[float, int, float]:
+    diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+    stat = ImageStat.Stat(diff)
+    mae = sum(stat.mean) / 3
+    max_err = max(hi for _, hi in diff.getextrema())
+    mse = sum(stat.rms[i] ** 2 for i in range(3)) / 3
+    psnr = float("inf") if mse == 0 else 10 * math.log10(255 * 255 / mse)
+    return mae, max_err, psnr
+
+
+def main():
+    src = Image.open(sys.argv[1]).convert("RGBA") if len(sys.argv) > 1 else synthetic_post()
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"source {src.width}x{src.height}, target {WIDTH}x{HEIGHT}, {iterations} iterations")
+
+    reference = _blurred_cover(src, WIDTH, HEIGHT, mode="quality")
+    base_ms = None
+    for mode in MODES:
+        times = []
+        for _ in range(iterations):
+            t = time.perf_counter()
+            out = _blurred_cover(src, WIDTH, HEIGHT, mode=mode)
+            times.append((time.perf_counter() - t) * 1000)
+        median = statistics.median(times)
+        base_ms = base_ms or median
+        mae, max_err, psnr = similarity(reference, out)
+        print(
+            f"{mode:8s} median {median:8.1f} ms  speedup x{base_ms / median:5.1f}  "
+            f"MAE {mae:5.2f}  max {max_err:3d}  PSNR {psnr:6.2f} dB"
+        )
+
+
+if __name__ == "__main__":
+    main()
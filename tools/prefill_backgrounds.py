@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Bulk-fill the background library (background_assets) for every allowed topic.
+
+Meant for off-peak runs (cron); the app also prefills in small batches during
+BACKGROUND_PREFILL_HOURS. Each generated image costs one image API call.
+
+Usage: python tools/prefill_backgrounds.py [--per-topic N] [--max-new N] [--stats]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import BackgroundAsset  # noqa: E402
+from app.services import background_library  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--per-topic", type=int, default=None, help="target backgrounds per topic")
+    parser.add_argument("--max-new", type=int, default=None, help="stop after generating this many images")
+    parser.add_argument("--stats", action="store_true", help="only print library stats")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[BackgroundAsset.__table__])
+    if not args.stats:
+        created = background_library.prefill(per_topic=args.per_topic, max_new=args.max_new)
+        print(f"Generated {created} background(s)")
+    db = SessionLocal()
+    try:
+        print(json.dumps(background_library.stats(db), indent=2, ensure_ascii=False))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,17 +11,12 @@ from dotenv import load_dotenv
 
 load_dotenv(ROOT / ".env")
 
-from app.services.content_ai import (
-    generate_caption,
-    generate_hashtags,
-    generate_image_prompt,
-    generate_image_png_bytes,
-)
+from app.services.content_ai import generate_draft_content
 from app.services.storage_service import (
     save_png_bytes_to_generated,
     upload_to_remote_server,
 )
-from app.services.image_render import render_image
+from app.services.image_render import render_image_bytes
 
 DB = ROOT / "autosocial.db"
 
@@ -38,31 +33,14 @@ def regen_post(post_id: int):
     _, topic = row
     print(f"Regenerating post {post_id} topic='{topic}'")
 
-    try:
-        caption = generate_caption(topic)
-    except Exception as e:
-        print("Caption generation failed:", e)
-        caption = f"Test post about {topic}. #AI #Automation"
-
-    try:
-        hashtags = generate_hashtags(topic, caption=caption, count=10)
-    except Exception as e:
-        print("Hashtag generation failed:", e)
-        hashtags = ["#AI", "#Automation"]
-
-    try:
-        image_prompt = generate_image_prompt(topic)
-    except Exception as e:
-        print("Image prompt generation failed:", e)
-        image_prompt = (
-            f"Square 1:1 Instagram post image, high quality, modern style, {topic}"
-        )
-
-    # Generate image bytes
-    try:
-        png_bytes = generate_image_png_bytes(image_prompt)
-    except Exception as e:
-        print("Image generation failed:", e)
+    # caption -> hashtags and image prompt -> image bytes run concurrently
+    draft = generate_draft_content(topic, caption_fallback=f"Test post about {topic}. #AI #Automation")
+    caption = draft.caption
+    hashtags = draft.hashtags or ["#AI", "#Automation"]
+    image_prompt = draft.image_prompt
+    png_bytes = draft.image_bytes
+    if png_bytes is None:
+        print("Image generation failed:", draft.errors.get("image"))
         conn.close()
         return
 
@@ -72,27 +50,29 @@ def regen_post(post_id: int):
 
     # Render final image (text on background)
     try:
-        BASE_DIR = ROOT
-        background_full = BASE_DIR / "storage" / rel_bg
         signature = "ince düşlerim"
-        rel_final, abs_final = render_image(
-            background_path=str(background_full),
+        # background bytes are already in memory; media/ copy is written in the background
+        rendered = render_image_bytes(
+            png_bytes,
             text=caption,
             signature=signature,
             style="minimal_dark",
             target="square",
+            persist=True,
         )
-        with open(abs_final, "rb") as f:
-            final_bytes = f.read()
+        final_bytes = rendered.data
+        rel_final = rendered.rel_path
     except Exception as e:
         print("Render failed:", e)
         conn.close()
         return
 
     # Upload final image remote
-    filename_final = os.path.basename(abs_final)
+    filename_final = rendered.filename
     try:
-        public_final = upload_to_remote_server(final_bytes, filename_final, prefix="ig/post")
+        public_final = upload_to_remote_server(
+            final_bytes, filename_final, prefix="ig/post", content_type=rendered.content_type
+        )
     except Exception as e:
         print("Upload final failed:", e)
         public_final = f"/media/{filename_final}"